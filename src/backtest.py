@@ -0,0 +1,156 @@
+import os
+import sys
+import time
+import hashlib
+import logging
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import model as forecast_model
+from model import build_series_matrix, MIN_POINTS
+from forecasters import get_forecaster, available_forecasters
+
+# Rolling-origin evaluation of the forecast models over the SNIC history
+CACHE_DIR = "data/.cache/backtest"
+REPORT_PATH = "data/reports/backtest.csv"
+HORIZON = int(os.getenv("SNIC_BACKTEST_HORIZON", 3))
+WORKERS = int(os.getenv("SNIC_BACKTEST_WORKERS", os.cpu_count() or 1))
+# Registered models evaluated by default: the cheap ones (see forecasters.Forecaster.cost)
+MAX_COST = 50
+# Grains evaluated: name -> series keys
+GRAINS = {
+    'total': [],
+    'provincia': ['provincia_nombre'],
+    'delito': ['codigo_delito_snic_nombre'],
+    'provincia_delito': ['provincia_nombre', 'codigo_delito_snic_nombre'],
+}
+
+def grain_matrix(df: pd.DataFrame, keys):
+    """(series x years) matrix of cantidad_hechos for a grain; the 'total' grain is a single series."""
+    if not keys:
+        df = df.assign(serie='total')
+        keys = ['serie']
+    grouped = df.groupby(list(keys) + ['anio'], observed=True)['cantidad_hechos'].sum().reset_index()
+    return build_series_matrix(grouped, list(keys))
+
+@functools.lru_cache(maxsize=None)
+def forecaster_version(model):
+    """
+    Hash of a forecaster's implementation: the source of the module defining it and of
+    model.py (shared fitting code) plus its settings, as dag.py keys stages by module source.
+    """
+    forecaster = get_forecaster(model)
+    h = hashlib.sha256(repr((forecaster.min_points, forecaster.requires)).encode())
+    for module in dict.fromkeys([sys.modules[forecaster.fn.__module__], forecast_model]):
+        with open(module.__file__, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()[:16]
+
+def _fold_digest(model, grain, origin, horizon, years, Y):
+    # A change to the model's code or parameters invalidates its cached folds
+    h = hashlib.sha256(f"{model}|{forecaster_version(model)}|{grain}|{origin}|{horizon}".encode())
+    h.update(np.ascontiguousarray(years).tobytes())
+    h.update(np.ascontiguousarray(Y).tobytes())
+    return h.hexdigest()[:16]
+
+def evaluate_fold(model, grain, matrix: pd.DataFrame, origin_idx, horizon=HORIZON, cache_dir=CACHE_DIR):
+    """
+    Fits model on the years up to matrix.columns[origin_idx] and scores the next `horizon` years.
+    Only series observed at the origin with at least MIN_POINTS training years (and the
+    model's own minimum) are scored.
+    Results are cached on disk by model (and its implementation), grain, origin and data content.
+    Returns (errors DataFrame, number of series fitted, or None on a cache hit).
+    """
+    years = matrix.columns.to_numpy(dtype=float)
+    Y = matrix.to_numpy(dtype=float)[:, :origin_idx + horizon + 1]
+    origin = int(years[origin_idx])
+
+    path = None
+    if cache_dir:
+        path = os.path.join(cache_dir, f"{_fold_digest(model, grain, origin, horizon, years[:Y.shape[1]], Y)}.parquet")
+        if os.path.exists(path):
+            return pd.read_parquet(path), None
+
+    train, test = Y[:, :origin_idx + 1], Y[:, origin_idx + 1:]
+    eligible = ~np.isnan(train[:, -1]) & ((~np.isnan(train)).sum(axis=1) >= MIN_POINTS)
+    # Center the years on the training window for conditioning
+    x = years[:origin_idx + 1]
+    origin_x = x.mean()
+    future_x = years[origin_idx + 1:origin_idx + 1 + test.shape[1]] - origin_x
+    preds = get_forecaster(model).predict(x - origin_x, train[eligible], future_x)
+
+    actual = test[eligible]
+    steps = np.broadcast_to(np.arange(1, test.shape[1] + 1), actual.shape)
+    scored = ~np.isnan(actual) & ~np.isnan(preds)
+    errors = pd.DataFrame({
+        'modelo': model,
+        'grano': grain,
+        'origen': origin,
+        'horizonte': steps[scored].astype('int8'),
+        'real': actual[scored],
+        'prediccion': preds[scored],
+    })
+
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        errors.to_parquet(path, index=False)
+    return errors, int((~np.isnan(preds[:, 0])).sum())
+
+def summarize(errors: pd.DataFrame):
+    """MAE and MAPE (over non-zero actuals, in %) per model and grain."""
+    abs_error = (errors['prediccion'] - errors['real']).abs()
+    errors = errors.assign(abs_error=abs_error, ape=abs_error / errors['real'].where(errors['real'] > 0) * 100)
+    report = errors.groupby(['grano', 'modelo']).agg(
+        MAE=('abs_error', 'mean'),
+        MAPE=('ape', 'mean'),
+        predicciones=('abs_error', 'size'),
+        folds=('origen', 'nunique'),
+    ).reset_index()
+    return report.sort_values(['grano', 'MAE']).reset_index(drop=True)
+
+def run_backtest(df: pd.DataFrame, models=None, grains=None, horizon=HORIZON, min_train=MIN_POINTS,
+                 workers=WORKERS, cache_dir=CACHE_DIR):
+    """
+    Rolling-origin backtest: every origin with at least min_train years of history, every
+    model and grain, folds evaluated in parallel (each fold scores all series of its grain at once).
+    Returns (report, errors, stats) where stats has the fold counts and fit throughput.
+    """
+    models = list(models or [f.name for f in available_forecasters(max_cost=MAX_COST)])
+    grains = {name: GRAINS[name] for name in (grains or GRAINS)}
+    matrices = {name: grain_matrix(df, keys) for name, keys in grains.items()}
+
+    tasks = [
+        (model, grain, matrix, origin_idx)
+        for grain, matrix in matrices.items()
+        for model in models
+        for origin_idx in range(min_train - 1, matrix.shape[1] - 1)
+    ]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = list(pool.map(lambda t: evaluate_fold(*t, horizon=horizon, cache_dir=cache_dir), tasks))
+    elapsed = time.perf_counter() - start
+
+    errors = pd.concat([r for r, _ in results], ignore_index=True)
+    fits = sum(n for _, n in results if n is not None)
+    computed = sum(1 for _, n in results if n is not None)
+    stats = {
+        'folds': len(tasks),
+        'folds_calculados': computed,
+        'folds_en_cache': len(tasks) - computed,
+        'ajustes': fits,
+        'segundos': round(elapsed, 3),
+        'ajustes_por_segundo': round(fits / elapsed, 1) if elapsed > 0 else None,
+    }
+    return summarize(errors), errors, stats
+
+if __name__ == "__main__":
+    from load import FINAL_DATA_PATH
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    report, _, stats = run_backtest(pd.read_parquet(FINAL_DATA_PATH))
+    os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+    report.to_csv(REPORT_PATH, index=False)
+    logging.info(f"Backtest: {stats}")
+    print(report.to_string(index=False))
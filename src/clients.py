@@ -0,0 +1,68 @@
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Shared HTTP session and cloud clients: created once per process and reused by the
+# pipeline stages and the dashboard, so repeated calls skip connection and auth setup.
+# (connect, read) timeout in seconds, applied when a request does not set its own
+HTTP_TIMEOUT = (float(os.getenv("SNIC_HTTP_CONNECT_TIMEOUT", 10)), float(os.getenv("SNIC_HTTP_READ_TIMEOUT", 60)))
+HTTP_RETRIES = int(os.getenv("SNIC_HTTP_RETRIES", 3))
+# Exponential backoff between retries: 0.5s, 1s, 2s...
+HTTP_BACKOFF = 0.5
+HTTP_POOL_SIZE = int(os.getenv("SNIC_HTTP_POOL_SIZE", 16))
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+_clients = {}
+_lock = threading.Lock()
+
+class _TimeoutSession(requests.Session):
+    """Session that applies HTTP_TIMEOUT to requests without an explicit timeout."""
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', HTTP_TIMEOUT)
+        return super().request(method, url, **kwargs)
+
+def _shared(name, factory):
+    with _lock:
+        if name not in _clients:
+            _clients[name] = factory()
+        return _clients[name]
+
+def _new_session():
+    session = _TimeoutSession()
+    retry = Retry(
+        total=HTTP_RETRIES,
+        backoff_factor=HTTP_BACKOFF,
+        status_forcelist=RETRY_STATUS,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        # The last response is returned as is; callers decide with raise_for_status()
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def http_session():
+    """Shared requests session: keep-alive connection pool, retries with backoff and default timeouts."""
+    return _shared('http', _new_session)
+
+def storage_client():
+    """Shared Cloud Storage client (honours STORAGE_EMULATOR_HOST for a local fake GCS server)."""
+    from google.cloud import storage
+    return _shared('storage', storage.Client)
+
+def bigquery_client():
+    """Shared BigQuery client."""
+    from google.cloud import bigquery
+    return _shared('bigquery', bigquery.Client)
+
+def reset_clients():
+    """Drops the shared clients (e.g. after a fork or a credentials change)."""
+    with _lock:
+        session = _clients.pop('http', None)
+        _clients.clear()
+    if session is not None:
+        session.close()
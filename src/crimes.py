@@ -0,0 +1,239 @@
+import pandas as pd
+from schema import map_categories
+
+# Crime dimension: display names, plain-language descriptions and categories.
+# Resolved once in the ETL, so the dashboard reads them as dictionary-encoded columns.
+CRIME_COLUMN = 'codigo_delito_snic_nombre'
+ATTRIBUTE_COLUMNS = ['descripcion_delito', 'categoria_delito']
+DEFAULT_DESCRIPTION = "Descripción no disponible."
+DEFAULT_CATEGORY = "Otros"
+
+# Mapeo de nombres cortos para mejor visualización
+SHORT_NAMES = {
+    # Homicidios
+    "Homicidios dolosos": "Homicidios Dolosos",
+    "Homicidios dolosos en grado de tentativa": "Tent. Homicidio",
+    "Homicidios culposos por otros hechos": "Hom. Culposos (Otros)",
+    "Suicidios (consumados)": "Suicidios",
+    
+    # Viales
+    "Muertes en accidentes viales": "Muertes Viales",
+    "Lesiones culposas en Accidentes Viales": "Lesiones Viales",
+    
+    # Lesiones
+    "Lesiones dolosas": "Lesiones Dolosas",
+    "Lesiones culposas por otros hechos": "Lesiones Culp. (Otras)",
+    "Otros delitos contra las personas": "Otros (Personas)",
+    
+    # Sexuales
+    "Abusos sexuales con acceso carnal (violaciones)": "Abuso Sexual (Acceso)",
+    "Tentativa de abuso sexual con acceso carnal": "Tent. Abuso (Acceso)",
+    "Abuso sexual simple": "Abuso Sexual Simple",
+    "Abuso sexual agravado": "Abuso Sexual Agrav.",
+    "Otros delitos contra la integridad sexual": "Otros (Sexual)",
+    "Ciberdelitos sexuales vinculados a menores": "Ciberdelitos Menores",
+    
+    # Propiedad (Robo/Hurto)
+    "Robos (excluye los agravados por el resultado de lesiones y/o muertes)": "Robos",
+    "Tentativas de robo (excluye las agravadas por el res. de lesiones y/o muerte)": "Tent. Robo",
+    "Robos agravados por el resultado de lesiones y/o muertes": "Robo Agrav. (Muerte/Lesión)",
+    "Robos agravados por el resultado de lesiones y/o muertes ": "Robo Agrav. (Muerte/Lesión)", # Duplicate with space
+    "Tentativas de robo agravado por el resultado de lesiones y/o muertes": "Tent. Robo Agrav.",
+    "Hurtos": "Hurtos",
+    "Tentativas de hurto": "Tent. Hurto",
+    "Otros delitos contra la propiedad": "Otros (Propiedad)",
+    "Daños (no incluye informáticos)": "Daños",
+    
+    # Estafas y Tecnológicos
+    "Estafas y defraudaciones (no incluye virtuales) y usura": "Estafas (Tradicional)",
+    "Estafas y defraudaciones asistidas virtualmente": "Estafas Virtuales",
+    "Acceso ilegal a sistemas informáticos y daños informáticos": "Delitos Informáticos",
+    
+    # Armas
+    "Tenencia ilegal de armas de fuego": "Tenencia Ilegal Armas",
+    "Portación ilegal de armas de fuego": "Portación Ilegal Armas",
+    "Entrega y comercialización ilegal de armas de fuego": "Comercio Ilegal Armas",
+    "Acopio y fabricación ilegal de armas piezas y municiones": "Acopio/Fabr. Armas",
+    "Fabricación adquisición transferencia y tenencia de explosivos y otros materiales peligrosos": "Explosivos",
+    "Omisión adulteración y supresión de marcaje": "Adulteración Armas",
+    
+    # Drogas (Ley 23.737)
+    "Ley 23.737 (estupefacientes)": "Ley Drogas",
+    "Tenencia simple de estupefacientes": "Tenencia Simple",
+    "Tenencia simple atenuada para uso personal de estupefacientes": "Tenencia Uso Personal",
+    "Comercialización y entrega de estupefacientes": "Comercialización Drogas",
+    "Siembra y producción de estupefacientes": "Siembra/Prod. Drogas",
+    "Organización y financiación de estupefacientes": "Org/Financ. Drogas",
+    "Confabulación de estupefacientes": "Confabulación Drogas",
+    "Contrabando de estupefacientes": "Contrabando Drogas",
+    "Otros delitos previstos en la ley 23.737": "Otros (Ley Drogas)",
+    
+    # Libertad / Trata / Otros
+    "Amenazas": "Amenazas",
+    "Otros delitos contra la libertad": "Otros (Libertad)",
+    "Trata de personas simple": "Trata Personas",
+    "Trata de personas agravado": "Trata Personas Agrav.",
+    "Extorsiones": "Extorsiones",
+    "Secuestros extorsivos": "Secuestros",
+    
+    # Contrabando y Aduana
+    "Contrabando Simple": "Contrabando",
+    "Contrabando simple": "Contrabando",
+    "Contrabando Agravado": "Contrabando Agrav.",
+    "Contrabando agravado": "Contrabando Agrav.",
+    "Obstrucción del código aduanero": "Obstrucción Aduana",
+    "Delitos migratorios": "Delitos Migratorios",
+    
+    # Otros Títulos
+    "Delitos contra la seguridad pública": "Seguridad Pública",
+    "Otros delitos contra la seguridad pública": "Seguridad Pública (Otros)",
+    "Delitos contra el orden público": "Orden Público",
+    "Delitos contra la seguridad de la nación": "Seguridad Nación",
+    "Delitos contra los poderes públicos y el orden constitucional": "Orden Constitucional",
+    "Delitos contra la administración pública": "Adm. Pública",
+    "Delitos contra la fe pública": "Fe Pública",
+    "Delitos contra el honor": "Honor",
+    "Delitos contra el orden económico y financiero": "Orden Económico",
+    "Delitos contra el estado civil": "Estado Civil",
+    "Otros delitos previstos en leyes especiales": "Leyes Especiales",
+    "Otros delitos previstos en leyes especiales n.c.p": "Leyes Especiales (NCP)",
+    "Contravenciones": "Contravenciones",
+    "Ley de fauna": "Ley Fauna",
+    "Ley de residuos peligrosos": "Residuos Peligrosos"
+}
+
+# Descripciones para Tooltips (Lenguaje llano)
+CRIME_DESCRIPTIONS = {
+    "Homicidios dolosos": "Muerte causada intencionalmente a otra persona.",
+    "Homicidios dolosos en grado de tentativa": "Intento de matar a otra persona que no se concretó.",
+    "Homicidios culposos por otros hechos": "Muerte causada sin intención, por negligencia o imprudencia (no vial).",
+    "Suicidios (consumados)": "Muerte autoinfligida intencionalmente.",
+    "Muertes en accidentes viales": "Fallecimientos derivados de siniestros de tránsito.",
+    "Lesiones culposas en Accidentes Viales": "Heridas no intencionales producidas en siniestros de tránsito.",
+    "Lesiones dolosas": "Heridas causadas intencionalmente a otra persona.",
+    "Lesiones culposas por otros hechos": "Heridas causadas sin intención (no vial).",
+    "Otros delitos contra las personas": "Otros daños físicos no categorizados anteriormente.",
+    "Abusos sexuales con acceso carnal (violaciones)": "Agresión sexual que implica penetración.",
+    "Tentativa de abuso sexual con acceso carnal": "Intento de agresión sexual con penetración.",
+    "Abuso sexual simple": "Tocamientos indebidos sin penetración.",
+    "Abuso sexual agravado": "Abuso sexual con circunstancias que aumentan su gravedad (ej. vínculo, armas).",
+    "Otros delitos contra la integridad sexual": "Delitos sexuales no encuadrados en los anteriores (ej. exhibicionismo).",
+    "Ciberdelitos sexuales vinculados a menores": "Grooming o producción/distribución de material de abuso infantil.",
+    "Robos (excluye los agravados por el resultado de lesiones y/o muertes)": "Apoderamiento de cosa ajena con fuerza o violencia (sin matar/lesionar gravemente).",
+    "Tentativas de robo (excluye las agravadas por el res. de lesiones y/o muerte)": "Intento de robo no consumado.",
+    "Robos agravados por el resultado de lesiones y/o muertes": "Robo donde la víctima resultó herida gravemente o fallecida.",
+    "Robos agravados por el resultado de lesiones y/o muertes ": "Robo donde la víctima resultó herida gravemente o fallecida.",
+    "Tentativas de robo agravado por el resultado de lesiones y/o muertes": "Intento de robo con resultado de lesiones graves o muerte.",
+    "Hurtos": "Apoderamiento de cosa ajena SIN fuerza sobre las cosas ni violencia física.",
+    "Tentativas de hurto": "Intento de hurto no consumado.",
+    "Otros delitos contra la propiedad": "Daños, usurpaciones, etc.",
+    "Daños (no incluye informáticos)": "Destrucción o inutilización de propiedad ajena.",
+    "Estafas y defraudaciones (no incluye virtuales) y usura": "Engaño económico tradicional (cuento del tío, cheques sin fondo).",
+    "Estafas y defraudaciones asistidas virtualmente": "Engaños económicos por internet/teléfono (phishing, vishing).",
+    "Acceso ilegal a sistemas informáticos y daños informáticos": "Hacking, robo de identidad digital o sabotaje informático.",
+    "Tenencia ilegal de armas de fuego": "Poseer un arma sin la autorización legal correspondiente.",
+    "Portación ilegal de armas de fuego": "Llevar un arma cargada y lista para usar en lugares públicos sin permiso.",
+    "Entrega y comercialización ilegal de armas de fuego": "Venta o entrega de armas fuera del circuito legal.",
+    "Acopio y fabricación ilegal de armas piezas y municiones": "Reunir grandes cantidades de armas/municiones o fabricarlas ilegalmente.",
+    "Fabricación adquisición transferencia y tenencia de explosivos y otros materiales peligrosos": "Manejo ilegal de explosivos.",
+    "Omisión adulteración y supresión de marcaje": "Borrar números de serie de armas.",
+    "Ley 23.737 (estupefacientes)": "Delitos generales de drogas.",
+    "Tenencia simple de estupefacientes": "Posesión de drogas sin fines de comercialización evidentes.",
+    "Tenencia simple atenuada para uso personal de estupefacientes": "Posesión de pequeña cantidad de droga para consumo propio.",
+    "Comercialización y entrega de estupefacientes": "Venta o distribución de drogas (Narcomenudeo/Narcotráfico).",
+    "Siembra y producción de estupefacientes": "Cultivo o fabricación de drogas.",
+    "Organización y financiación de estupefacientes": "Jefes o financistas de organizaciones narco.",
+    "Confabulación de estupefacientes": "Acuerdo entre personas para cometer delitos de drogas.",
+    "Contrabando de estupefacientes": "Ingreso/Egreso ilegal de drogas por frontera.",
+    "Otros delitos previstos en la ley 23.737": "Otros delitos de la ley de drogas.",
+    "Amenazas": "Intimidación a una persona con causarle un mal futuro.",
+    "Otros delitos contra la libertad": "Privación ilegítima de la libertad, etc.",
+    "Trata de personas simple": "Captación/transporte de personas con fines de explotación (sexual/laboral).",
+    "Trata de personas agravado": "Trata de personas con agravantes (menores, violencia, etc.).",
+    "Extorsiones": "Obligar a alguien a hacer/dar algo mediante intimidación.",
+    "Secuestros extorsivos": "Retener a una persona para pedir rescate.",
+    "Contrabando Simple": "Ingreso/Egreso ilegal de mercadería.",
+    "Contrabando simple": "Ingreso/Egreso ilegal de mercadería.",
+    "Contrabando Agravado": "Contrabando con violencia, de sustancias peligrosas, o por funcionarios.",
+    "Contrabando agravado": "Contrabando con violencia, de sustancias peligrosas, o por funcionarios.",
+    "Obstrucción del código aduanero": "Impedir el control aduanero.",
+    "Delitos migratorios": "Tráfico ilegal de inmigrantes.",
+    "Delitos contra la seguridad pública": "Peligros comunes (incendios, explosiones).",
+    "Otros delitos contra la seguridad pública": "Otros peligros comunes.",
+    "Delitos contra el orden público": "Instigación a cometer delitos, asociación ilícita.",
+    "Delitos contra la seguridad de la nación": "Traición, espionaje.",
+    "Delitos contra los poderes públicos y el orden constitucional": "Rebelión, sedición.",
+    "Delitos contra la administración pública": "Corrupción, abuso de autoridad, cohecho.",
+    "Delitos contra la fe pública": "Falsificación de documentos o moneda.",
+    "Delitos contra el honor": "Injurias y calumnias.",
+    "Delitos contra el orden económico y financiero": "Lavado de dinero, delitos tributarios.",
+    "Delitos contra el estado civil": "Matrimonios ilegales, supresión de identidad.",
+    "Otros delitos previstos en leyes especiales": "Leyes no codificadas.",
+    "Otros delitos previstos en leyes especiales n.c.p": "Leyes no codificadas.",
+    "Contravenciones": "Faltas menores (no llegan a delito).",
+    "Ley de fauna": "Caza ilegal, tráfico de animales.",
+    "Ley de residuos peligrosos": "Mal manejo de sustancias tóxicas."
+}
+
+# Categorías de Delitos (Para Filtros Jerárquicos)
+CRIME_CATEGORIES = {
+    "Homicidios": [
+        "Homicidios Dolosos", "Tent. Homicidio", "Hom. Culposos (Otros)", "Suicidios", 
+        "Muertes Viales"
+    ],
+    "Lesiones": [
+        "Lesiones Viales", "Lesiones Dolosas", "Lesiones Culp. (Otras)", "Otros (Personas)"
+    ],
+    "Delitos Sexuales": [
+        "Abuso Sexual (Acceso)", "Tent. Abuso (Acceso)", "Abuso Sexual Simple", 
+        "Abuso Sexual Agrav.", "Otros (Sexual)", "Ciberdelitos Menores"
+    ],
+    "Robos y Hurtos": [
+        "Robos", "Tent. Robo", "Robo Agrav. (Muerte/Lesión)", "Tent. Robo Agrav.",
+        "Hurtos", "Tent. Hurto", "Otros (Propiedad)", "Daños"
+    ],
+    "Estafas y Tecnología": [
+        "Estafas (Tradicional)", "Estafas Virtuales", "Delitos Informáticos"
+    ],
+    "Armas y Explosivos": [
+        "Tenencia Ilegal Armas", "Portación Ilegal Armas", "Comercio Ilegal Armas", 
+        "Acopio/Fabr. Armas", "Explosivos", "Adulteración Armas"
+    ],
+    "Narcotráfico (Ley 23.737)": [
+        "Ley Drogas", "Tenencia Simple", "Tenencia Uso Personal", "Comercialización Drogas",
+        "Siembra/Prod. Drogas", "Org/Financ. Drogas", "Confabulación Drogas", 
+        "Contrabando Drogas", "Otros (Ley Drogas)"
+    ],
+    "Libertad y Trata": [
+        "Amenazas", "Otros (Libertad)", "Trata Personas", "Trata Personas Agrav.",
+        "Extorsiones", "Secuestros"
+    ],
+    "Contrabando y Aduana": [
+        "Contrabando", "Contrabando Agrav.", "Obstrucción Aduana", "Delitos Migratorios"
+    ],
+    "Seguridad y Orden Público": [
+        "Seguridad Pública", "Seguridad Pública (Otros)", "Orden Público", "Seguridad Nación",
+        "Orden Constitucional", "Adm. Pública", "Fe Pública", "Honor", "Orden Económico",
+        "Estado Civil", "Leyes Especiales", "Leyes Especiales (NCP)", "Contravenciones",
+        "Ley Fauna", "Residuos Peligrosos"
+    ]
+}
+
+# Attributes by display (short) name
+_DESCRIPTIONS = {SHORT_NAMES.get(name, name): desc for name, desc in CRIME_DESCRIPTIONS.items()}
+_CATEGORIES = {crime: cat for cat, crimes in CRIME_CATEGORIES.items() for crime in crimes}
+
+def resolve_crime_names(df: pd.DataFrame):
+    """
+    Replaces the SNIC crime names by their display names and adds the description and
+    category columns. Mapping is done on the categories, not on every row; frames that
+    already carry the attributes are returned as is.
+    """
+    if df is None or CRIME_COLUMN not in df.columns or all(c in df.columns for c in ATTRIBUTE_COLUMNS):
+        return df
+    # Descriptions are keyed by the original name, so they are resolved before renaming
+    description = map_categories(df[CRIME_COLUMN], lambda c: CRIME_DESCRIPTIONS.get(c, _DESCRIPTIONS.get(c, DEFAULT_DESCRIPTION)))
+    df[CRIME_COLUMN] = map_categories(df[CRIME_COLUMN], lambda c: SHORT_NAMES.get(c, c))
+    df['descripcion_delito'] = description
+    df['categoria_delito'] = map_categories(df[CRIME_COLUMN], lambda c: _CATEGORIES.get(c, DEFAULT_CATEGORY))
+    return df
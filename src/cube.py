@@ -0,0 +1,92 @@
+import os
+import logging
+import pandas as pd
+from schema import apply_schema
+from population import RATE_COLUMNS, add_rates, department_population, population_for
+from crimes import CRIME_COLUMN, resolve_crime_names
+from dimensions import add_geo_ids, write_departments
+
+# Pre-aggregated cube served to the dashboard: one Parquet file per grain
+CUBE_PATH = "data/final/snic_cube"
+# Departments are keyed by their integer ID; the name is carried for display
+DIMENSIONS = ['anio', 'provincia_nombre', 'departamento_id', 'departamento_nombre', 'codigo_delito_snic_nombre']
+MEASURES = ['cantidad_hechos', 'cantidad_victimas']
+# Rates per 100k inhabitants of each row. They do not add up across population units:
+# grouped queries recompute them from the summed counts (population.add_group_rates)
+RATES = list(RATE_COLUMNS.values())
+
+# Rollups at the grains the dashboard queries, coarsest last
+GRAINS = {
+    'base': DIMENSIONS,
+    'anio_provincia_delito': ['anio', 'provincia_nombre', 'codigo_delito_snic_nombre'],
+    'anio_provincia': ['anio', 'provincia_nombre'],
+    'anio_delito': ['anio', 'codigo_delito_snic_nombre'],
+    'anio': ['anio'],
+}
+
+def build_cube(df: pd.DataFrame):
+    """
+    Aggregates hechos/víctimas over (anio, provincia, departamento, delito) plus the rollups in GRAINS.
+    Each rollup is computed from the base aggregate, not from the row-level frame.
+    Returns a dict grain name -> DataFrame.
+    """
+    df = add_geo_ids(apply_schema(df))
+    measures = [m for m in MEASURES if m in df.columns]
+
+    cube = {}
+    base_dims = [d for d in DIMENSIONS if d in df.columns]
+    base = df.groupby(base_dims, observed=True)[measures].sum().reset_index()
+    for name, dims in GRAINS.items():
+        dims = [d for d in dims if d in base.columns]
+        if name == 'base':
+            cube[name] = base
+        else:
+            cube[name] = base.groupby(dims, observed=True)[measures].sum().reset_index()
+    return add_cube_rates(add_crime_attributes(cube))
+
+def add_crime_attributes(cube: dict):
+    """Adds the crime dimension attributes (description, category) to every grain with a crime."""
+    for name, frame in cube.items():
+        if CRIME_COLUMN in frame.columns:
+            cube[name] = resolve_crime_names(frame)
+    return cube
+
+def add_cube_rates(cube: dict, departments: pd.DataFrame = None):
+    """
+    Adds row-level tasa_* columns to every grain with a province: department population
+    for the base grain when it is available, province census population otherwise.
+    Grains that already carry rates are left as is.
+    """
+    if departments is None:
+        departments = department_population()
+    for frame in cube.values():
+        if 'provincia_nombre' in frame.columns and not any(r in frame.columns for r in RATES):
+            keys, population = population_for(frame.columns, departments)
+            add_rates(frame, keys=keys, population=population)
+    return cube
+
+def write_cube(df: pd.DataFrame, root: str = CUBE_PATH):
+    """
+    Builds the cube from the row-level data and writes every grain to root/<grain>.parquet,
+    plus the department dimension table.
+    """
+    try:
+        cube = build_cube(df)
+        os.makedirs(root, exist_ok=True)
+        for name, frame in cube.items():
+            frame.to_parquet(os.path.join(root, f"{name}.parquet"), index=False)
+        write_departments(df, root)
+    except Exception as e:
+        logging.error(f"Fallo al generar el cubo de agregados: {e}")
+        return False
+
+    sizes = ", ".join(f"{name}={len(frame):,}" for name, frame in cube.items())
+    logging.info(f"Cubo de agregados guardado en {root} ({sizes} filas)")
+    return True
+
+def read_cube(root: str = CUBE_PATH):
+    """Reads all grains of the cube. Returns None if any grain is missing."""
+    paths = {name: os.path.join(root, f"{name}.parquet") for name in GRAINS}
+    if not all(os.path.exists(p) for p in paths.values()):
+        return None
+    return add_cube_rates(add_crime_attributes({name: apply_schema(pd.read_parquet(p)) for name, p in paths.items()}))
@@ -0,0 +1,215 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from instrument import step, profiled, path_bytes
+
+# Declarative stage graph with content-hash caching of stage outputs
+STATE_PATH = "data/.cache/pipeline/state.json"
+WORKERS = int(os.getenv("SNIC_PIPELINE_WORKERS", 4))
+
+# Stage results
+DONE = "ok"
+CACHED = "en caché"
+FAILED = "fallida"
+BLOCKED = "omitida"
+# Returned by a stage function that had nothing to do (e.g. a destination not configured)
+SKIPPED = "no configurada"
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    One pipeline step. fn(context) returns True/False, or SKIPPED when it did no work. The stage is skipped when its cache
+    key (content of inputs, code of the listed modules, values of params) matches the last
+    successful run and all its outputs exist. cache=False stages always run. A failed
+    optional stage still blocks its dependents but does not fail the run.
+    """
+    name: str
+    fn: object
+    deps: tuple = ()
+    inputs: tuple = ()
+    outputs: tuple = ()
+    # Modules whose source is part of the key (a code change invalidates the cache)
+    code: tuple = ()
+    # Environment variables whose values are part of the key
+    params: tuple = ()
+    cache: bool = True
+    optional: bool = False
+
+class Fingerprints:
+    """SHA-256 of files and directories, memoized by (size, mtime) across runs."""
+
+    def __init__(self, known: dict = None):
+        self.known = dict(known or {})
+        self.used = set()
+        self._lock = threading.Lock()
+
+    def file(self, path: str):
+        stat = os.stat(path)
+        with self._lock:
+            cached = self.known.get(path)
+            self.used.add(path)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        with self._lock:
+            self.known[path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def path(self, path: str):
+        """Fingerprint of a file, of every file under a directory, or None if it does not exist."""
+        if os.path.isfile(path):
+            return self.file(path)
+        if not os.path.isdir(path):
+            return None
+        digest = hashlib.sha256()
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                full = os.path.join(root, name)
+                digest.update(os.path.relpath(full, path).encode())
+                digest.update(self.file(full).encode())
+        return digest.hexdigest()
+
+def stage_key(stage: Stage, fingerprints: Fingerprints):
+    h = hashlib.sha256(stage.name.encode())
+    for path in stage.inputs:
+        h.update(f"{path}={fingerprints.path(path)}".encode())
+    for module in stage.code:
+        h.update(fingerprints.file(module.__file__).encode())
+    for name in stage.params:
+        h.update(f"{name}={os.getenv(name)}".encode())
+    return h.hexdigest()
+
+def read_state(path: str = STATE_PATH):
+    if not os.path.exists(path):
+        return {'stages': {}, 'files': {}}
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Estado del pipeline ilegible, se ignora: {e}")
+        return {'stages': {}, 'files': {}}
+
+def write_state(state: dict, path: str = STATE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+
+def downstream(stages, names):
+    """names plus every stage that depends on them, directly or not."""
+    selected = set(names)
+    changed = True
+    while changed:
+        changed = False
+        for stage in stages:
+            if stage.name not in selected and selected.intersection(stage.deps):
+                selected.add(stage.name)
+                changed = True
+    return selected
+
+def select_stages(stages, start=None, only=None):
+    """
+    Stages to run and stages forced to run. start: that stage and its descendants (the
+    start stage is forced, the rest use the cache); only: just those stages, forced.
+    """
+    names = [s.name for s in stages]
+    for name in [start] + list(only or []):
+        if name is not None and name not in names:
+            raise ValueError(f"Etapa desconocida: {name}")
+    if only:
+        return set(only), set(only)
+    if start:
+        return downstream(stages, [start]), {start}
+    return set(names), set()
+
+def run_graph(stages, context=None, start=None, only=None, force=False, workers=WORKERS, state_path=STATE_PATH,
+              profile=()):
+    """
+    Runs the selected stages in dependency order, independent stages concurrently.
+    Dependencies outside the selection are assumed up to date. A failed stage blocks
+    its dependents only. Every stage is recorded as an instrument step; stages named in
+    profile ('all' for every stage) run under cProfile, one at a time so each profile
+    only covers its own stage. Returns dict stage -> (result, seconds).
+    """
+    if profile:
+        workers = 1
+    selected, forced = select_stages(stages, start, only)
+    context = {} if context is None else context
+    state = read_state(state_path)
+    fingerprints = Fingerprints(state.get('files'))
+    results = {}
+    lock = threading.Lock()
+
+    def run(stage):
+        with step(stage.name) as record:
+            record['result'] = execute(stage)
+            if record['result'] == FAILED:
+                record['status'] = 'error'
+            # Cached and skipped stages did no work: nothing read or written
+            worked = record['result'] in (DONE, FAILED)
+            record['bytes_read'] = sum(path_bytes(p) for p in stage.inputs) if worked else 0
+            record['bytes_written'] = sum(path_bytes(p) for p in stage.outputs) if record['result'] == DONE else 0
+        return record['result'], record['wall_seconds']
+
+    def execute(stage):
+        key = stage_key(stage, fingerprints) if stage.cache else None
+        up_to_date = (
+            stage.cache and not force and stage.name not in forced
+            and state['stages'].get(stage.name) == key
+            and all(os.path.exists(p) for p in stage.outputs)
+        )
+        if up_to_date:
+            return CACHED
+
+        logging.info(f"Etapa {stage.name}: iniciando...")
+        try:
+            with profiled(stage.name, stage.name in profile or 'all' in profile):
+                ok = stage.fn(context)
+        except Exception as e:
+            logging.error(f"Etapa {stage.name}: error inesperado: {e}")
+            ok = False
+        if ok and stage.cache:
+            # The key was taken before running: it describes the inputs this run consumed
+            with lock:
+                state['stages'][stage.name] = key
+        if ok == SKIPPED:
+            return SKIPPED
+        return DONE if ok else FAILED
+
+    pending = [s for s in stages if s.name in selected]
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        while pending or running:
+            progress = False
+            for stage in list(pending):
+                deps = [d for d in stage.deps if d in selected]
+                if any(results.get(d, (None,))[0] in (FAILED, BLOCKED) for d in deps):
+                    results[stage.name] = (BLOCKED, 0.0)
+                    pending.remove(stage)
+                    progress = True
+                elif all(d in results for d in deps):
+                    running[pool.submit(run, stage)] = stage
+                    pending.remove(stage)
+                    progress = True
+            if not running:
+                if pending and not progress:
+                    raise ValueError(f"Dependencias cíclicas entre etapas: {', '.join(s.name for s in pending)}")
+                continue
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage = running.pop(future)
+                results[stage.name] = future.result()
+                result, seconds = results[stage.name]
+                logging.info(f"Etapa {stage.name}: {result} ({seconds:.1f}s)")
+
+    # Only files seen in this run are kept, so removed partitions do not pile up
+    state['files'] = {p: v for p, v in fingerprints.known.items() if p in fingerprints.used}
+    write_state(state, state_path)
+    return {s.name: results[s.name] for s in stages if s.name in results}
@@ -0,0 +1,131 @@
+import os
+import shutil
+import logging
+import itertools
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from schema import apply_schema
+
+# Hive-partitioned Parquet dataset: <root>/anio=YYYY/provincia_nombre=.../part-0.parquet
+DATASET_PATH = "data/final/snic_analytics"
+PARTITION_SCHEMA = pa.schema([('anio', pa.int16()), ('provincia_nombre', pa.string())])
+ROW_GROUP_SIZE = int(os.getenv("SNIC_ROW_GROUP_SIZE", 64 * 1024))
+COMPRESSION = os.getenv("SNIC_PARQUET_COMPRESSION", "zstd")
+
+def _partitioning():
+    return ds.partitioning(PARTITION_SCHEMA, flavor='hive')
+
+def _partition_columns(table):
+    # Partition values live in the directory names, as plain types
+    for field in PARTITION_SCHEMA:
+        idx = table.schema.get_field_index(field.name)
+        table = table.set_column(idx, field.name, table.column(field.name).cast(field.type))
+    return table
+
+def _chunk_batches(chunks, prepare=lambda table: table):
+    """
+    Schema and record batches of a stream of DataFrame chunks, converted one at a time.
+    Categorical columns are widened to int32 dictionary indices so every chunk fits the
+    schema taken from the first one.
+    """
+    tables = (prepare(pa.Table.from_pandas(c, preserve_index=False)) for c in chunks)
+    first_table = next(tables, None)
+    if first_table is None:
+        raise ValueError("Sin datos para escribir")
+    schema = pa.schema(
+        [pa.field(f.name, pa.dictionary(pa.int32(), pa.large_string())) if pa.types.is_dictionary(f.type) else f
+         for f in first_table.schema],
+        metadata=first_table.schema.metadata,
+    )
+
+    def batches():
+        for table in itertools.chain([first_table], tables):
+            yield from table.cast(schema).to_batches()
+    return schema, batches()
+
+def write_parquet_chunks(chunks, path: str):
+    """Writes a stream of DataFrame chunks as one Parquet file (one row group per batch)."""
+    schema, batches = _chunk_batches(chunks)
+    with pq.ParquetWriter(path, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+    return path
+
+def write_partitioned(data, root: str = DATASET_PATH, row_group_size: int = ROW_GROUP_SIZE, compression: str = COMPRESSION):
+    """
+    Writes data as a year/province partitioned Parquet dataset with column statistics.
+    data is a DataFrame, or an iterable of DataFrame chunks streamed to disk one at a time.
+    The dataset is built next to root and swapped in by renames: the previous dataset is
+    moved aside first and deleted only after the new one is in place, so readers never see
+    a partial write and a crash leaves either version on disk. Returns the list of written files.
+    """
+    if isinstance(data, pd.DataFrame):
+        source, schema = _partition_columns(pa.Table.from_pandas(data, preserve_index=False)), None
+    else:
+        schema, source = _chunk_batches(data, _partition_columns)
+
+    tmp_root, old_root = root + ".tmp", root + ".old"
+    for leftover in (tmp_root, old_root):
+        if os.path.exists(leftover):
+            shutil.rmtree(leftover)
+
+    written = []
+    file_format = ds.ParquetFileFormat()
+    try:
+        ds.write_dataset(
+            source,
+            tmp_root,
+            schema=schema,
+            format=file_format,
+            partitioning=_partitioning(),
+            file_options=file_format.make_write_options(compression=compression, write_statistics=True),
+            max_rows_per_group=row_group_size,
+            min_rows_per_group=min(row_group_size, 1024),
+            file_visitor=lambda f: written.append(f.path),
+        )
+    except BaseException:
+        shutil.rmtree(tmp_root, ignore_errors=True)
+        raise
+
+    if os.path.exists(root):
+        os.replace(root, old_root)
+    os.replace(tmp_root, root)
+    if os.path.exists(old_root):
+        shutil.rmtree(old_root)
+
+    logging.info(f"Dataset particionado guardado en {root} ({len(written)} archivos)")
+    return [os.path.join(root, os.path.relpath(path, tmp_root)) for path in written]
+
+def newest_output(dataset_path: str, file_path: str):
+    """
+    The most recently written analytics output, partitioned dataset or single Parquet file
+    (None if neither exists). Switching SNIC_PARTITIONED_OUTPUT leaves the other one behind.
+    """
+    candidates = [p for p in (dataset_path, file_path) if os.path.exists(p)]
+    if not candidates:
+        return None
+    return max(candidates, key=_written_at)
+
+def _written_at(path: str):
+    if os.path.isfile(path):
+        return os.path.getmtime(path)
+    times = [os.path.getmtime(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names]
+    return max(times, default=os.path.getmtime(path))
+
+def read_partitioned(root: str = DATASET_PATH, years=None, provinces=None, crimes=None, columns=None):
+    """
+    Reads the partitioned dataset into a DataFrame with the compact schema.
+    years/provinces prune whole partitions; crimes is pushed down to the row-group statistics.
+    """
+    dataset = ds.dataset(root, format='parquet', partitioning=_partitioning())
+
+    expr = None
+    for name, values in (('anio', years), ('provincia_nombre', provinces), ('codigo_delito_snic_nombre', crimes)):
+        if values is not None:
+            cond = ds.field(name).isin(list(values))
+            expr = cond if expr is None else expr & cond
+
+    table = dataset.to_table(columns=columns, filter=expr)
+    return apply_schema(table.to_pandas())
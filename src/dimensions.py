@@ -0,0 +1,68 @@
+import os
+import pandas as pd
+
+# Geographic dimension: integer province/department IDs (INDEC codes in the SNIC source)
+# and a small table with their display labels. Filters work on the IDs.
+DEPARTMENTS_FILE = "departamentos.parquet"
+ID_COLUMNS = {'provincia_id': 'provincia_nombre', 'departamento_id': 'departamento_nombre'}
+DEPARTMENT_COLUMNS = ['provincia_id', 'provincia_nombre', 'departamento_id', 'departamento_nombre']
+# Surrogate ID column -> name columns it is numbered over
+SURROGATE_KEYS = {'provincia_id': ['provincia_nombre'], 'departamento_id': ['provincia_nombre', 'departamento_nombre']}
+
+def add_geo_ids(df: pd.DataFrame, keys: dict = None):
+    """
+    Ensures the provincia_id / departamento_id columns. The SNIC source carries them;
+    data without them (e.g. mock data) gets surrogate IDs numbered in group order.
+    keys (see surrogate_keys) takes the IDs from tables numbered once over the whole
+    data, so the chunks of one file get the same IDs.
+    """
+    for id_col, columns in SURROGATE_KEYS.items():
+        if id_col in df.columns or not set(columns) <= set(df.columns):
+            continue
+        if keys and id_col in keys:
+            df[id_col] = _lookup_ids(df, keys[id_col], columns, id_col)
+        else:
+            df[id_col] = _surrogate_ids(df, columns)
+    return df
+
+def surrogate_keys(df: pd.DataFrame):
+    """Surrogate ID tables {id column: distinct name keys and their ID} numbered over df."""
+    keys = {}
+    for id_col, columns in SURROGATE_KEYS.items():
+        if id_col not in df.columns and set(columns) <= set(df.columns):
+            distinct = df[columns].drop_duplicates().reset_index(drop=True)
+            distinct[id_col] = _surrogate_ids(distinct, columns)
+            keys[id_col] = distinct
+    return keys
+
+def _surrogate_ids(df: pd.DataFrame, columns):
+    return (df.groupby(columns, observed=True, sort=True, dropna=False).ngroup() + 1).astype('int32')
+
+def _lookup_ids(df: pd.DataFrame, table: pd.DataFrame, columns, id_col: str):
+    index = pd.MultiIndex.from_frame(table[columns].astype(str))
+    positions = index.get_indexer(pd.MultiIndex.from_frame(df[columns].astype(str)))
+    if (positions < 0).any():
+        raise ValueError(f"Claves geográficas sin {id_col} asignado")
+    return pd.Series(table[id_col].to_numpy()[positions], index=df.index, dtype='int32')
+
+def build_departments(df: pd.DataFrame):
+    """
+    Department dimension table: IDs, names and the "Department (Province)" label shown
+    by the sidebar. Built from the distinct departments only, not from every row.
+    """
+    columns = [c for c in DEPARTMENT_COLUMNS if c in df.columns]
+    departments = df[columns].drop_duplicates('departamento_id').astype({c: str for c in ID_COLUMNS.values() if c in columns})
+    departments['etiqueta'] = departments['departamento_nombre'] + " (" + departments['provincia_nombre'] + ")"
+    return departments.sort_values('etiqueta').reset_index(drop=True)
+
+def write_departments(df: pd.DataFrame, root: str):
+    path = os.path.join(root, DEPARTMENTS_FILE)
+    build_departments(df).to_parquet(path, index=False)
+    return path
+
+def read_departments(root: str):
+    """Reads the department dimension table, or None if it has not been built."""
+    path = os.path.join(root, DEPARTMENTS_FILE)
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path)
@@ -0,0 +1,41 @@
+import io
+import os
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# On-demand export of the filtered rows (Datos tab), written in bounded chunks
+EXPORT_CHUNK_ROWS = int(os.getenv("SNIC_EXPORT_CHUNK_ROWS", 100000))
+# Label -> (file extension, MIME type)
+FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'Parquet': ('parquet', 'application/octet-stream'),
+}
+
+def iter_csv_chunks(df, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """Yields the UTF-8 CSV encoding of df, chunk_rows rows at a time (header in the first chunk)."""
+    for start in range(0, max(len(df), 1), chunk_rows):
+        yield df.iloc[start:start + chunk_rows].to_csv(index=False, header=start == 0).encode('utf-8')
+
+def write_export(df, sink, fmt: str = 'csv', chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """Writes df to a binary file-like sink as CSV or Parquet (one row group per chunk)."""
+    if fmt == 'csv':
+        for chunk in iter_csv_chunks(df, chunk_rows):
+            sink.write(chunk)
+        return
+
+    writer = None
+    try:
+        for start in range(0, max(len(df), 1), chunk_rows):
+            table = pa.Table.from_pandas(df.iloc[start:start + chunk_rows], preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(sink, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+def export_bytes(df, fmt: str = 'csv', chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """The export file of df as bytes (what the download button serves)."""
+    buffer = io.BytesIO()
+    write_export(df, buffer, fmt, chunk_rows)
+    return buffer.getvalue()
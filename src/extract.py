@@ -1,8 +1,13 @@
 import requests
 import os
+import json
+import time
+import hashlib
 import logging
 import pandas as pd
 import random
+from clients import http_session
+from instrument import step
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -10,6 +15,14 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 # Configuration
 DATA_URL = os.getenv("SNIC_DATA_URL", "https://cloud-snic.minseg.gob.ar/Bases/SNIC/snic-departamentos-anual.csv") 
 RAW_DATA_PATH = "data/raw/snic_data.csv"
+CHUNK_SIZE = int(os.getenv("SNIC_DOWNLOAD_CHUNK_SIZE", 1024 * 1024))  # 1 MiB
+MAX_RETRIES = int(os.getenv("SNIC_DOWNLOAD_RETRIES", 3))
+MANIFEST_SUFFIX = ".manifest.json"
+
+# Download status values returned by download_if_changed
+DOWNLOAD_UPDATED = "updated"
+DOWNLOAD_NOT_MODIFIED = "not_modified"
+DOWNLOAD_MOCK = "mock"
 
 def generate_mock_data(output_path: str):
     """Generates mock SNIC data and saves it to output_path."""
@@ -29,12 +42,185 @@ def generate_mock_data(output_path: str):
     df.to_csv(output_path, index=False)
     logging.info(f"Datos simulados guardados en {output_path}")
 
-def download_data(url: str, output_path: str):
-    """Downloads data from URL and saves to output_path. Falls back to mock data on failure."""
+def _read_part_validators(meta_path: str):
+    """Validators (ETag / Last-Modified) of the response a '.part' file was started from."""
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _discard_part(tmp_path: str, meta_path: str):
+    for path in (tmp_path, meta_path):
+        if os.path.exists(path):
+            os.remove(path)
+
+def _same_version(saved: dict, validators: dict):
+    """True if the response validators prove it is the version the '.part' file came from."""
+    if saved.get('etag') and validators.get('etag'):
+        return saved['etag'] == validators['etag']
+    if saved.get('last_modified') and validators.get('last_modified'):
+        return saved['last_modified'] == validators['last_modified']
+    return False
+
+def _expected_size(response):
+    """Full size of the resource announced by the response (Content-Range or Content-Length)."""
+    total = response.headers.get('Content-Range', '').rpartition('/')[2]
+    if total.isdigit():
+        return int(total)
+    length = response.headers.get('Content-Length', '')
+    # A compressed body is decoded on the fly: its length is not the file size
+    if response.status_code == 200 and length.isdigit() and response.headers.get('Content-Encoding', 'identity') == 'identity':
+        return int(length)
+    return None
+
+def stream_download(url: str, output_path: str, chunk_size: int = CHUNK_SIZE, max_retries: int = MAX_RETRIES,
+                    headers: dict = None):
+    """
+    Streams url to output_path in fixed-size chunks through a '.part' temp file.
+    Interrupted transfers are resumed with HTTP Range requests and the temp file
+    is renamed atomically once complete. Returns transfer statistics.
+
+    The validators of the response a '.part' file was started from are kept next to it
+    and sent as If-Range when resuming: if the source changed in between, the partial
+    file is discarded and the download restarts, so versions are never spliced. A '.part'
+    file without validators is not resumed. 'validated' in the stats is False when a
+    resume could not be matched to the original version.
+
+    Extra headers (e.g. conditional If-None-Match) are sent with every request;
+    a 304 answer leaves output_path untouched and sets 'not_modified' in the stats.
+    """
+    tmp_path = output_path + ".part"
+    meta_path = tmp_path + ".json"
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+
+    resumed_from = os.path.getsize(tmp_path) if os.path.exists(tmp_path) else 0
+    transferred = 0
+    attempt = 0
+    validators = {}
+    validated = True
+    expected = None
+    start = time.perf_counter()
+
+    while True:
+        offset = os.path.getsize(tmp_path) if os.path.exists(tmp_path) else 0
+        saved = _read_part_validators(meta_path) if offset else {}
+        if_range = saved.get('etag') or saved.get('last_modified')
+        if offset and not if_range:
+            logging.info("Archivo parcial sin validadores. Descargando desde el inicio.")
+            _discard_part(tmp_path, meta_path)
+            offset = resumed_from = 0
+        request_headers = dict(headers or {})
+        if offset:
+            request_headers.update({'Range': f'bytes={offset}-', 'If-Range': if_range})
+
+        try:
+            with http_session().get(url, stream=True, headers=request_headers) as response:
+                if response.status_code == 304:
+                    # The local file is current: a partial newer transfer is of no use
+                    _discard_part(tmp_path, meta_path)
+                    return {
+                        'not_modified': True,
+                        'bytes_transferred': 0,
+                        'elapsed_seconds': time.perf_counter() - start,
+                        'throughput_mb_s': 0.0,
+                    }
+
+                current = {
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                }
+
+                if response.status_code == 416:
+                    # Range not satisfiable: the part file is either complete or stale
+                    total = response.headers.get('Content-Range', '').rpartition('/')[2]
+                    changed = (current['etag'] or current['last_modified']) and not _same_version(saved, current)
+                    if total.isdigit() and int(total) == offset and not changed:
+                        validators = saved
+                        validated = _same_version(saved, current)
+                        expected = int(total)
+                        break
+                    logging.warning("Archivo parcial inconsistente con el servidor. Reiniciando descarga.")
+                    _discard_part(tmp_path, meta_path)
+                    resumed_from = 0
+                    continue
+
+                response.raise_for_status()
+
+                # Only append if the server honoured the Range (If-Range matched) from our offset
+                content_range = response.headers.get('Content-Range', '')
+                resuming = offset > 0 and response.status_code == 206 and content_range.startswith(f"bytes {offset}-")
+                if resuming and (current['etag'] or current['last_modified']) and not _same_version(saved, current):
+                    logging.warning("La fuente cambió desde la descarga parcial. Reiniciando descarga.")
+                    _discard_part(tmp_path, meta_path)
+                    resumed_from = 0
+                    continue
+                if offset and not resuming:
+                    logging.info("La fuente cambió o no soporta reanudación. Descargando desde el inicio.")
+                    resumed_from = 0
+
+                if resuming:
+                    # Validators missing from a partial response: the splice cannot be verified
+                    validated = validated and _same_version(saved, current)
+                    validators = saved
+                else:
+                    validators = current
+                    validated = True
+                    with open(meta_path, 'w', encoding='utf-8') as f:
+                        json.dump(validators, f)
+
+                expected = _expected_size(response)
+                with open(tmp_path, 'ab' if resuming else 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        if chunk:
+                            f.write(chunk)
+                            transferred += len(chunk)
+            break
+
+        except (requests.exceptions.ConnectionError,
+                requests.exceptions.ChunkedEncodingError,
+                requests.exceptions.Timeout) as e:
+            attempt += 1
+            if attempt > max_retries:
+                raise
+            logging.warning(f"Descarga interrumpida ({e}). Reintento {attempt}/{max_retries}...")
+
+    os.replace(tmp_path, output_path)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    elapsed = time.perf_counter() - start
+    return {
+        'not_modified': False,
+        'etag': validators.get('etag'),
+        'last_modified': validators.get('last_modified'),
+        'validated': validated,
+        'bytes_transferred': transferred,
+        'resumed_from': resumed_from,
+        'total_bytes': os.path.getsize(output_path),
+        'expected_bytes': expected,
+        'elapsed_seconds': elapsed,
+        'throughput_mb_s': (transferred / 1024 / 1024) / elapsed if elapsed > 0 else 0.0,
+    }
+
+def download_data(url: str, output_path: str, stream: bool = False):
+    """
+    Downloads data from URL and saves to output_path. Falls back to mock data on failure.
+    With stream=True the file is written in chunks with resume support (see stream_download).
+    """
     logging.info(f"Intentando descargar desde {url}...")
     
     try:
-        response = requests.get(url, timeout=10)
+        if stream:
+            stats = stream_download(url, output_path)
+            logging.info(
+                f"Descarga completada. Guardado en {output_path} "
+                f"({stats['bytes_transferred']:,} bytes en {stats['elapsed_seconds']:.1f}s, "
+                f"{stats['throughput_mb_s']:.2f} MB/s)"
+            )
+            return True
+
+        response = http_session().get(url)
         response.raise_for_status()
         
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
@@ -51,5 +237,103 @@ def download_data(url: str, output_path: str):
         generate_mock_data(output_path)
         return True
 
+def file_sha256(path: str, chunk_size: int = CHUNK_SIZE):
+    """Computes the SHA-256 hex digest of a file without loading it in memory."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def read_manifest(output_path: str):
+    """Reads the sidecar manifest of a previous download. Returns None if missing or invalid."""
+    manifest_path = output_path + MANIFEST_SUFFIX
+    if not (os.path.exists(manifest_path) and os.path.exists(output_path)):
+        return None
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Manifiesto ilegible, se ignora: {e}")
+        return None
+
+def write_manifest(output_path: str, manifest: dict):
+    """Writes the sidecar manifest (ETag, Last-Modified, size, SHA-256) next to output_path."""
+    with open(output_path + MANIFEST_SUFFIX, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+def download_if_changed(url: str, output_path: str):
+    """
+    Conditionally (re)downloads url into output_path using the sidecar manifest.
+
+    Sends If-None-Match / If-Modified-Since from the last download and also compares
+    the SHA-256 of the new content, so sources without validators are detected too.
+    The ETag / Last-Modified are only stored when the file size matches the one the server
+    announced and a resumed transfer was verified to be the same version.
+    Returns DOWNLOAD_UPDATED, DOWNLOAD_NOT_MODIFIED or DOWNLOAD_MOCK.
+    """
+    manifest = read_manifest(output_path)
+    headers = {}
+    if manifest and manifest.get('url') == url:
+        if manifest.get('etag'):
+            headers['If-None-Match'] = manifest['etag']
+        if manifest.get('last_modified'):
+            headers['If-Modified-Since'] = manifest['last_modified']
+    else:
+        manifest = None
+
+    logging.info(f"Verificando cambios en {url}...")
+
+    try:
+        with step('extract.download') as record:
+            stats = stream_download(url, output_path, headers=headers)
+            record['bytes_written'] = stats['bytes_transferred']
+    except requests.exceptions.RequestException as e:
+        logging.warning(f"Error descargando datos: {e}")
+        if manifest:
+            logging.warning("Se conserva la última descarga válida.")
+            return DOWNLOAD_NOT_MODIFIED
+        logging.warning("Revertiendo a generación de datos simulados.")
+        generate_mock_data(output_path)
+        return DOWNLOAD_MOCK
+
+    if stats['not_modified']:
+        logging.info("Fuente sin cambios (HTTP 304). Se reutiliza el archivo local.")
+        return DOWNLOAD_NOT_MODIFIED
+
+    # Validators are only kept for a file known to be the complete version they describe:
+    # otherwise every later run would get a 304 and keep a bad file
+    trusted = stats['validated']
+    if stats['expected_bytes'] is not None and stats['expected_bytes'] != stats['total_bytes']:
+        logging.warning(
+            f"Tamaño descargado ({stats['total_bytes']:,} bytes) distinto del anunciado por el servidor "
+            f"({stats['expected_bytes']:,} bytes). No se guardan los validadores."
+        )
+        trusted = False
+    elif not trusted:
+        logging.warning("No se pudo verificar la versión de la descarga reanudada. No se guardan los validadores.")
+
+    with step('extract.sha256', bytes_read=os.path.getsize(output_path)):
+        sha256 = file_sha256(output_path)
+    write_manifest(output_path, {
+        'url': url,
+        'etag': stats['etag'] if trusted else None,
+        'last_modified': stats['last_modified'] if trusted else None,
+        'size': stats['total_bytes'],
+        'sha256': sha256,
+        'downloaded_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    })
+
+    if manifest and manifest.get('sha256') == sha256:
+        logging.info("Contenido idéntico a la descarga anterior (SHA-256).")
+        return DOWNLOAD_NOT_MODIFIED
+
+    logging.info(
+        f"Descarga completada. Guardado en {output_path} "
+        f"({stats['bytes_transferred']:,} bytes en {stats['elapsed_seconds']:.1f}s, "
+        f"{stats['throughput_mb_s']:.2f} MB/s)"
+    )
+    return DOWNLOAD_UPDATED
+
 if __name__ == "__main__":
-    download_data(DATA_URL, RAW_DATA_PATH)
+    download_if_changed(DATA_URL, RAW_DATA_PATH)
@@ -0,0 +1,94 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# Dimensions with more distinct values than this keep sorted row-id arrays instead of bitmaps
+BITMAP_MAX_CARDINALITY = 64
+# Resolved (dimension, selection) bitmaps kept for reuse across tabs and reruns
+MASK_CACHE_SIZE = 256
+
+class FilterIndex:
+    """
+    Precomputed filter index over the dimension columns of a frame.
+
+    Each dimension value maps to a packed row bitmap (low cardinality) or a sorted
+    row-id array (high cardinality, e.g. departments). A selection is resolved with
+    bitwise ORs inside a dimension and ANDs across dimensions, without comparing strings.
+    """
+
+    def __init__(self, frame: pd.DataFrame, dimensions):
+        self.n_rows = len(frame)
+        self._bitmaps = {}
+        self._row_ids = {}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+        for dim in dimensions:
+            codes, uniques = pd.factorize(frame[dim])
+            valid = codes >= 0
+            order = np.argsort(codes[valid], kind='stable')
+            rows = np.flatnonzero(valid)[order].astype(np.int32)
+            counts = np.bincount(codes[valid], minlength=len(uniques))
+            groups = dict(zip(uniques, np.split(rows, np.cumsum(counts)[:-1])))
+
+            if len(uniques) <= BITMAP_MAX_CARDINALITY:
+                self._bitmaps[dim] = {value: self._pack(ids) for value, ids in groups.items()}
+            else:
+                self._row_ids[dim] = groups
+
+    def _pack(self, row_ids):
+        bits = np.zeros(self.n_rows, dtype=bool)
+        bits[row_ids] = True
+        return np.packbits(bits)
+
+    def _groups(self, dim):
+        return self._bitmaps[dim] if dim in self._bitmaps else self._row_ids[dim]
+
+    def values(self, dim):
+        """Distinct values indexed for dim."""
+        return list(self._groups(dim).keys())
+
+    def _resolve(self, dim, values):
+        """Packed bitmap of the rows matching any of values in dim, or None if it selects everything."""
+        selected = set(values)
+        groups = self._groups(dim)
+        if selected.issuperset(groups.keys()):
+            return None
+
+        key = (dim, frozenset(selected))
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        hits = [groups[v] for v in selected if v in groups]
+        if dim in self._bitmaps:
+            packed = np.bitwise_or.reduce(hits) if hits else np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+        else:
+            packed = self._pack(np.concatenate(hits) if hits else np.empty(0, dtype=np.int32))
+
+        with self._lock:
+            self._cache[key] = packed
+            if len(self._cache) > MASK_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return packed
+
+    def mask(self, filters: dict):
+        """
+        Boolean row mask for filters {dimension: values}. A None or empty-filter entry
+        is skipped; a scalar is treated as a single value.
+        """
+        packed = None
+        for dim, values in filters.items():
+            if values is None:
+                continue
+            if np.isscalar(values):
+                values = [values]
+            bitmap = self._resolve(dim, values)
+            if bitmap is not None:
+                packed = bitmap if packed is None else packed & bitmap
+
+        if packed is None:
+            return np.ones(self.n_rows, dtype=bool)
+        return np.unpackbits(packed, count=self.n_rows).astype(bool)
@@ -0,0 +1,117 @@
+import os
+import json
+import logging
+from datetime import datetime, timezone
+import pandas as pd
+from model import build_series_matrix, forecast_matrix, MIN_POINTS, QUADRATIC_MIN_POINTS, N_BOOTSTRAP, INTERVAL_LEVEL
+
+# Precomputed forecasts served by the Predicciones tab
+FORECAST_PATH = "data/final/snic_forecasts"
+FORECAST_FILE = "forecasts.parquet"
+METADATA_FILE = "metadata.json"
+# Longest horizon offered by the dashboard slider
+MAX_HORIZON = 5
+# Series keys of the store; ALL stands for "every value" of a dimension
+STORE_KEYS = ['provincia_nombre', 'codigo_delito_snic_nombre']
+ALL = "(todas)"
+# Aggregation levels precomputed: total, by province, by crime, by province x crime
+LEVELS = [[], ['provincia_nombre'], ['codigo_delito_snic_nombre'], STORE_KEYS]
+# Fixed bootstrap seed: rebuilding the store from the same data gives the same intervals
+BOOTSTRAP_SEED = 0
+
+def build_forecasts(df: pd.DataFrame, years_ahead: int = MAX_HORIZON):
+    """
+    Forecasts every series of the aggregation LEVELS with the batched forecaster.
+    Returns a long DataFrame: STORE_KEYS, anio, horizonte, cantidad_hechos,
+    limite_inferior, limite_superior, grado, n_puntos.
+    """
+    base = df.groupby(STORE_KEYS + ['anio'], observed=True)['cantidad_hechos'].sum().reset_index()
+    base[STORE_KEYS] = base[STORE_KEYS].astype(str)
+
+    frames = []
+    for keys in LEVELS:
+        level = base.groupby(keys + ['anio'])['cantidad_hechos'].sum().reset_index()
+        for col in STORE_KEYS:
+            if col not in keys:
+                level[col] = ALL
+
+        matrix = build_series_matrix(level, STORE_KEYS)
+        forecast = forecast_matrix(matrix, years_ahead, intervals=True, seed=BOOTSTRAP_SEED)
+
+        n_points = matrix.notna().sum(axis=1).rename('n_puntos').reset_index()
+        last_year = forecast.groupby(STORE_KEYS)['anio'].transform('min') - 1
+        forecast['horizonte'] = (forecast['anio'] - last_year).astype('int8')
+        forecast = forecast.merge(n_points, on=STORE_KEYS, how='left')
+        frames.append(forecast)
+
+    result = pd.concat(frames, ignore_index=True)
+    result['grado'] = (result['n_puntos'] >= QUADRATIC_MIN_POINTS).astype('int8') + 1
+    result['n_puntos'] = result['n_puntos'].astype('int16')
+    result['anio'] = result['anio'].astype('int16')
+    # Forecasts stay float: the count schema (int32) does not apply here
+    result[STORE_KEYS] = result[STORE_KEYS].astype('category')
+    return result
+
+def write_forecasts(df: pd.DataFrame, root: str = FORECAST_PATH, years_ahead: int = MAX_HORIZON):
+    """Writes the forecast table and its model metadata to root. Returns True/False."""
+    try:
+        forecasts = build_forecasts(df, years_ahead)
+        os.makedirs(root, exist_ok=True)
+        forecasts.to_parquet(os.path.join(root, FORECAST_FILE), index=False)
+
+        metadata = {
+            'modelo': 'Regresión polinómica (mínimos cuadrados)',
+            'grado_max': 2,
+            'min_puntos': MIN_POINTS,
+            'min_puntos_cuadratico': QUADRATIC_MIN_POINTS,
+            'horizonte_max': years_ahead,
+            'intervalo': {'metodo': 'bootstrap de residuos', 'nivel': INTERVAL_LEVEL, 'replicas': N_BOOTSTRAP},
+            'anios': [int(df['anio'].min()), int(df['anio'].max())],
+            'series': int(len(forecasts) // years_ahead),
+            'generado': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        }
+        with open(os.path.join(root, METADATA_FILE), 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, ensure_ascii=False, indent=2)
+    except Exception as e:
+        logging.error(f"Fallo al generar las predicciones: {e}")
+        return False
+
+    logging.info(f"Predicciones guardadas en {root} ({metadata['series']:,} series)")
+    return True
+
+def read_forecasts(root: str = FORECAST_PATH):
+    """Reads the forecast store. Returns (forecasts, metadata) or None if it has not been built."""
+    path = os.path.join(root, FORECAST_FILE)
+    meta_path = os.path.join(root, METADATA_FILE)
+    if not os.path.exists(path) or not os.path.exists(meta_path):
+        return None
+    with open(meta_path, encoding='utf-8') as f:
+        metadata = json.load(f)
+    return pd.read_parquet(path), metadata
+
+def series_key(selected, universe):
+    """Store key for a dimension selection: ALL, a single value, or None if the store does not cover it."""
+    selected = set(selected) if selected is not None else set(universe)
+    if selected >= set(universe):
+        return ALL
+    if len(selected) == 1:
+        return next(iter(selected))
+    return None
+
+def lookup_forecast(forecasts: pd.DataFrame, province, crime, years_ahead: int):
+    """
+    Stored forecast (anio, cantidad_hechos, limite_inferior, limite_superior) for one series of the store, or None if the
+    series is not stored or the horizon exceeds what was precomputed.
+    """
+    if province is None or crime is None:
+        return None
+    rows = forecasts[
+        (forecasts['provincia_nombre'] == province)
+        & (forecasts['codigo_delito_snic_nombre'] == crime)
+        & (forecasts['horizonte'] <= years_ahead)
+    ]
+    # Labels merged on display (e.g. short names) would mix several series
+    if len(rows) != years_ahead or rows['horizonte'].duplicated().any():
+        return None
+    columns = ['anio', 'cantidad_hechos'] + [c for c in ('limite_inferior', 'limite_superior') if c in rows.columns]
+    return rows.sort_values('anio')[columns].reset_index(drop=True)
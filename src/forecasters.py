@@ -0,0 +1,182 @@
+import importlib.util
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+from model import fit_polynomials, forecast_matrix, with_history, MIN_POINTS, QUADRATIC_MIN_POINTS
+
+# Registry of forecast models. Every model works on a batch of series:
+# predict(x, Y, future_x) with Y (n_series, n_years), NaN for missing years, returns
+# (n_series, horizon) predictions clipped at 0 (NaN for series below min_points).
+FORECASTERS = {}
+DEFAULT_FORECASTER = 'polinomial'
+
+@dataclass(frozen=True)
+class Forecaster:
+    name: str
+    label: str
+    fn: object
+    # Relative cost per series (1 = one batched least-squares solve)
+    cost: float
+    min_points: int
+    description: str = ""
+    # Optional packages the model imports when it runs
+    requires: tuple = ()
+
+    @property
+    def installed(self):
+        """True if every optional package in requires can be imported (checked without importing)."""
+        return all(importlib.util.find_spec(module) is not None for module in self.requires)
+
+    def predict(self, x, Y, future_x):
+        x = np.asarray(x, dtype=float)
+        Y = np.atleast_2d(np.asarray(Y, dtype=float))
+        future_x = np.asarray(future_x, dtype=float)
+        preds = np.full((len(Y), len(future_x)), np.nan)
+        rows = (~np.isnan(Y)).sum(axis=1) >= self.min_points
+        if rows.any():
+            preds[rows] = np.maximum(self.fn(x, Y[rows], future_x), 0)
+        return preds
+
+def register(forecaster: Forecaster):
+    FORECASTERS[forecaster.name] = forecaster
+    return forecaster
+
+def get_forecaster(name: str):
+    """Registered forecaster by name. Raises KeyError for unknown names."""
+    return FORECASTERS[name]
+
+def available_forecasters(n_points=None, max_cost=None):
+    """
+    Forecasters usable with n_points observations and within max_cost, cheapest first.
+    Models whose optional packages are not installed are left out.
+    """
+    return sorted(
+        (f for f in FORECASTERS.values()
+         if (n_points is None or n_points >= f.min_points) and (max_cost is None or f.cost <= max_cost)
+         and f.installed),
+        key=lambda f: (f.cost, f.name),
+    )
+
+def _last_observed(x, Y):
+    """Index of the last observed year of every series."""
+    observed = ~np.isnan(Y)
+    return Y.shape[1] - 1 - np.argmax(observed[:, ::-1], axis=1)
+
+def _naive(x, Y, future_x):
+    last = _last_observed(x, Y)
+    return np.repeat(Y[np.arange(len(Y)), last][:, None], len(future_x), axis=1)
+
+def _ols(degree):
+    def fn(x, Y, future_x):
+        coef = fit_polynomials(x, Y, degree)
+        return (np.vander(future_x, degree + 1, increasing=True) @ coef.T).T
+    return fn
+
+def _polynomial(x, Y, future_x):
+    """Dashboard rule: quadratic from QUADRATIC_MIN_POINTS points, linear below."""
+    n_points = (~np.isnan(Y)).sum(axis=1)
+    preds = np.empty((len(Y), len(future_x)))
+    quadratic = n_points >= QUADRATIC_MIN_POINTS
+    for degree, rows in ((1, ~quadratic), (2, quadratic)):
+        if rows.any():
+            preds[rows] = _ols(degree)(x, Y[rows], future_x)
+    return preds
+
+def _holt(alphas, betas, phis):
+    """
+    Holt's linear trend (phi=1) or damped trend (phi<1) exponential smoothing.
+    The smoothing parameters are picked per series from the grid by one-step-ahead SSE;
+    all series and grid points run in the same vectorized recursion. Missing years are skipped.
+    """
+    grid = np.array(np.meshgrid(alphas, betas, phis, indexing='ij')).reshape(3, -1)
+    alpha, beta, phi = (g[:, None] for g in grid)
+
+    def fn(x, Y, future_x):
+        n_grid, n_series = grid.shape[1], len(Y)
+        level = np.full((n_grid, n_series), np.nan)
+        trend = np.full((n_grid, n_series), np.nan)
+        sse = np.zeros((n_grid, n_series))
+
+        start_x = np.full(n_series, np.nan)
+        for t, y in enumerate(Y.T):
+            valid = ~np.isnan(y)
+            started = ~np.isnan(trend[0])
+            first = valid & np.isnan(level[0])
+            second = valid & ~np.isnan(level[0]) & ~started
+            regular = valid & started
+            # Missing years advance the state without an update
+            gap = ~valid & started
+
+            pred = level + phi * trend
+            err = np.where(regular, y - pred, 0.0)
+            sse += err ** 2
+            new_level = np.where(regular, pred + alpha * err, np.where(gap, pred, level))
+            new_trend = np.where(regular, phi * trend + beta * (new_level - level - phi * trend),
+                                 np.where(gap, phi * trend, trend))
+
+            new_trend = np.where(second, (y - level) / (x[t] - start_x), new_trend)
+            new_level = np.where(second | first, y, new_level)
+            start_x = np.where(first, x[t], start_x)
+            level, trend = new_level, new_trend
+
+        best = np.argmin(sse, axis=0)
+        cols = np.arange(n_series)
+        level, trend, damping = level[best, cols], trend[best, cols], phi[best, 0]
+
+        # The state has been carried to the last year of x
+        steps = np.broadcast_to(future_x - x[-1], (n_series, len(future_x)))
+        # Sum of phi^1..phi^h (h when phi = 1)
+        damping = damping[:, None]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            damped_steps = np.where(damping == 1, steps, damping * (1 - damping ** steps) / (1 - damping))
+        return level[:, None] + damped_steps * trend[:, None]
+    return fn
+
+def _huber(x, Y, future_x):
+    """Robust linear trend (sklearn HuberRegressor), one fit per series."""
+    from sklearn.linear_model import HuberRegressor
+
+    preds = np.empty((len(Y), len(future_x)))
+    for i, y in enumerate(Y):
+        observed = ~np.isnan(y)
+        model = HuberRegressor().fit(x[observed].reshape(-1, 1), y[observed])
+        preds[i] = model.predict(future_x.reshape(-1, 1))
+    return preds
+
+register(Forecaster('naive', "Último valor (naive)", _naive, cost=0.1, min_points=1,
+                    description="Repite el último año observado."))
+register(Forecaster('lineal', "Regresión lineal", _ols(1), cost=1, min_points=MIN_POINTS,
+                    description="Tendencia lineal por mínimos cuadrados."))
+register(Forecaster('cuadratico', "Regresión cuadrática", _ols(2), cost=1, min_points=QUADRATIC_MIN_POINTS,
+                    description="Polinomio de grado 2 por mínimos cuadrados."))
+register(Forecaster('polinomial', "Regresión polinómica (grado 2)", _polynomial, cost=1, min_points=MIN_POINTS,
+                    description="Grado 2 desde 5 años de datos, lineal con menos. Captura aceleración o desaceleración."))
+register(Forecaster('holt', "Holt (tendencia lineal)", _holt([0.2, 0.4, 0.6, 0.8], [0.1, 0.3, 0.5], [1.0]),
+                    cost=12, min_points=MIN_POINTS,
+                    description="Suavizado exponencial con tendencia; da más peso a los años recientes."))
+register(Forecaster('holt_amortiguado', "Holt amortiguado", _holt([0.2, 0.4, 0.6, 0.8], [0.1, 0.3, 0.5], [0.8, 0.9, 0.98]),
+                    cost=36, min_points=4,
+                    description="Holt con tendencia que se atenúa en el horizonte; más conservador a largo plazo."))
+register(Forecaster('huber', "Tendencia robusta (Huber)", _huber, cost=200, min_points=QUADRATIC_MIN_POINTS,
+                    description="Tendencia lineal poco sensible a años atípicos.", requires=('sklearn',)))
+
+def forecast_series(ts_data, years_ahead=2, name=DEFAULT_FORECASTER, **kwargs):
+    """
+    Forecasts one yearly series (anio, cantidad_hechos) with a registered model.
+    Same return as train_and_predict: (history + prediction frame, error message).
+    The default model goes through the batched polynomial forecaster (kwargs: intervals, seed...).
+    """
+    forecaster = get_forecaster(name)
+    if len(ts_data) < max(forecaster.min_points, MIN_POINTS):
+        return None, f"Se necesitan al menos {max(forecaster.min_points, MIN_POINTS)} años de datos para este modelo."
+
+    if name == DEFAULT_FORECASTER:
+        matrix = ts_data.set_index('anio')[['cantidad_hechos']].T
+        return with_history(ts_data, forecast_matrix(matrix, years_ahead, **kwargs)), None
+
+    years = ts_data['anio'].to_numpy(dtype=float)
+    origin = years.mean()
+    future = years.max() + np.arange(1, years_ahead + 1)
+    preds = forecaster.predict(years - origin, ts_data['cantidad_hechos'].to_numpy(dtype=float), future - origin)[0]
+    forecast = pd.DataFrame({'anio': future.astype(int), 'cantidad_hechos': preds})
+    return with_history(ts_data, forecast), None
@@ -0,0 +1,182 @@
+import os
+import json
+import math
+import logging
+import numpy as np
+from clients import http_session
+
+# Province geometry: the source GeoJSON is vendored once into GEO_DIR and the
+# dashboard reads pre-simplified levels of detail (LODs) from disk.
+GEOJSON_URL = os.getenv("SNIC_GEOJSON_URL", "https://apis.datos.gob.ar/georef/api/v2.0/provincias.geojson")
+GEO_DIR = "data/geo"
+SOURCE_FILE = "provincias.geojson"
+# LOD -> (RDP tolerance in degrees, decimals kept after quantization), coarsest first
+LODS = {
+    'low': (0.05, 2),
+    'medium': (0.01, 3),
+    'high': (0.002, 4),
+}
+# Only the properties the choropleth needs are kept
+KEEP_PROPERTIES = ['id', 'nombre']
+
+def lod_path(lod: str, root: str = GEO_DIR):
+    return os.path.join(root, f"provincias_{lod}.geojson")
+
+def fetch_geojson(url: str = GEOJSON_URL, root: str = GEO_DIR, force: bool = False):
+    """Vendors the source GeoJSON into root (downloaded only once). Returns the parsed GeoJSON or None."""
+    path = os.path.join(root, SOURCE_FILE)
+    if not os.path.exists(path) or force:
+        try:
+            response = http_session().get(url)
+            response.raise_for_status()
+            os.makedirs(root, exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(response.content)
+            logging.info(f"Geometría de provincias descargada en {path}")
+        except Exception as e:
+            logging.error(f"Error descargando la geometría de provincias: {e}")
+            return None
+
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def simplify_line(points: np.ndarray, tolerance: float):
+    """Ramer-Douglas-Peucker simplification of an (n, 2) coordinate array. Endpoints are kept."""
+    n = len(points)
+    if n < 3:
+        return points
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end <= start + 1:
+            continue
+        a, b = points[start], points[end]
+        inner = points[start + 1:end]
+        dx, dy = b - a
+        norm = math.hypot(dx, dy)
+        if norm == 0:
+            # Closed ring: distance to the shared endpoint
+            dist = np.hypot(inner[:, 0] - a[0], inner[:, 1] - a[1])
+        else:
+            dist = np.abs(dx * (inner[:, 1] - a[1]) - dy * (inner[:, 0] - a[0])) / norm
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance:
+            split = start + 1 + i
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return points[keep]
+
+def _simplify_ring(ring, tolerance: float, digits: int):
+    """Simplified and quantized ring, or None if it collapses below a valid ring (4 points)."""
+    points = simplify_line(np.asarray(ring, dtype=float)[:, :2], tolerance)
+    points = np.round(points, digits)
+    # Quantization can leave repeated consecutive vertices
+    changed = np.any(np.diff(points, axis=0) != 0, axis=1)
+    points = points[np.concatenate(([True], changed))]
+    if len(points) < 4:
+        return None
+    return points.tolist()
+
+def _simplify_polygon(polygon, tolerance: float, digits: int):
+    exterior = _simplify_ring(polygon[0], tolerance, digits)
+    if exterior is None:
+        return None
+    holes = [r for r in (_simplify_ring(h, tolerance, digits) for h in polygon[1:]) if r is not None]
+    return [exterior] + holes
+
+def simplify_geojson(geojson: dict, tolerance: float, digits: int):
+    """
+    Returns a simplified copy of a Polygon/MultiPolygon FeatureCollection with quantized coordinates.
+    Small islands and holes that collapse are dropped; a feature always keeps at least one polygon.
+    """
+    features = []
+    for feature in geojson.get('features', []):
+        geometry = feature.get('geometry') or {}
+        polygons = geometry.get('coordinates', [])
+        if geometry.get('type') == 'Polygon':
+            polygons = [polygons]
+
+        simplified = [p for p in (_simplify_polygon(p, tolerance, digits) for p in polygons) if p is not None]
+        if not simplified and polygons:
+            # Keep the largest polygon, only quantized
+            largest = max(polygons, key=lambda p: len(p[0]))
+            simplified = [[np.round(np.asarray(largest[0], dtype=float)[:, :2], digits).tolist()]]
+
+        if geometry.get('type') == 'Polygon' and len(simplified) == 1:
+            new_geometry = {'type': 'Polygon', 'coordinates': simplified[0]}
+        else:
+            new_geometry = {'type': 'MultiPolygon', 'coordinates': simplified}
+
+        properties = {k: v for k, v in (feature.get('properties') or {}).items() if k in KEEP_PROPERTIES}
+        features.append({'type': 'Feature', 'properties': properties, 'geometry': new_geometry})
+
+    return {'type': 'FeatureCollection', 'features': features}
+
+def write_lods(geojson: dict, root: str = GEO_DIR):
+    """Writes one simplified GeoJSON per LOD. Returns dict lod -> path."""
+    os.makedirs(root, exist_ok=True)
+    paths = {}
+    for lod, (tolerance, digits) in LODS.items():
+        path = lod_path(lod, root)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(simplify_geojson(geojson, tolerance, digits), f, ensure_ascii=False, separators=(',', ':'))
+        paths[lod] = path
+    return paths
+
+def build_geometry(url: str = GEOJSON_URL, root: str = GEO_DIR, force: bool = False):
+    """Pipeline step: vendors the province geometry and writes its LODs (skipped if they already exist)."""
+    if not force and all(os.path.exists(lod_path(lod, root)) for lod in LODS):
+        return True
+    geojson = fetch_geojson(url, root)
+    if geojson is None:
+        return False
+    try:
+        paths = write_lods(geojson, root)
+    except Exception as e:
+        logging.error(f"Error simplificando la geometría de provincias: {e}")
+        return False
+
+    sizes = ", ".join(f"{lod}={os.path.getsize(p) / 1024:.0f} KB" for lod, p in paths.items())
+    logging.info(f"Geometría simplificada guardada en {root} ({sizes})")
+    return True
+
+def read_lod(lod: str, root: str = GEO_DIR):
+    """Reads one LOD from disk, or None if it has not been built."""
+    path = lod_path(lod, root)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def lod_for_zoom(zoom: float):
+    """Coarsest LOD whose tolerance stays within about two pixels at the given map zoom."""
+    for lod, (tolerance, _) in LODS.items():
+        # Degrees per pixel of a 256px web-mercator tile
+        if tolerance <= 2 * 360 / (256 * 2 ** zoom):
+            return lod
+    return list(LODS)[-1]
+
+def view_for(geojson: dict, names=None):
+    """
+    Center and zoom that fit the features whose properties.nombre is in names (all if None).
+    Returns (center dict, zoom).
+    """
+    coords = []
+    for feature in geojson.get('features', []):
+        if names is not None and feature['properties'].get('nombre') not in names:
+            continue
+        geometry = feature['geometry']
+        polygons = [geometry['coordinates']] if geometry['type'] == 'Polygon' else geometry['coordinates']
+        coords.extend(np.asarray(p[0])[:, :2] for p in polygons)
+    if not coords:
+        return None, None
+
+    points = np.concatenate(coords)
+    (min_lon, min_lat), (max_lon, max_lat) = points.min(axis=0), points.max(axis=0)
+    span = max(max_lon - min_lon, (max_lat - min_lat) * 1.5, 1e-3)
+    zoom = float(np.clip(math.log2(360 / span) - 0.5, 2, 9))
+    return {"lat": (min_lat + max_lat) / 2, "lon": (min_lon + max_lon) / 2}, zoom
@@ -1,50 +1,56 @@
-import requests
-import json
-import pandas as pd
 import os
+import logging
+import pandas as pd
+from clients import http_session
 
 url = "https://infra.datos.gob.ar/catalog/modernizacion/dataset/7/distribution/7.2/download/provincias.json"
-output_csv = "data/provincias_centroids.csv"
+# Refreshed by the pipeline next to the built geometry; the git-tracked copy is the fallback
+output_csv = "data/geo/provincias_centroids.csv"
+BUNDLED_CSV = "data/provincias_centroids.csv"
 
-def get_centroids():
+def get_centroids(output_path: str = output_csv):
+    """Pipeline step: downloads the province centroids used by the map. Returns True/False."""
     try:
-        print(f"Descargando desde {url}...")
+        logging.info(f"Descargando desde {url}...")
         # Disable SSL verify for gob.ar just in case
         import urllib3
         urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-        
-        response = requests.get(url, verify=False, timeout=20)
+
+        response = http_session().get(url, verify=False)
         response.raise_for_status()
-        
+
         data = response.json()
-        
+
         # The structure is {"provincias": [{"nombre": "...", "centroide": {"lat": ..., "lon": ...}}, ...]}
-        
+
         provinces_list = []
         for p in data['provincias']:
             # Normalize names to match SNIC data if possible
             name = p['nombre']
             lat = p['centroide']['lat']
             lon = p['centroide']['lon']
-            
+
             # Manual fixes for common discrepancies known in SNIC data
             # SNIC usually has "Ciudad Autónoma de Buenos Aires", "Buenos Aires", etc.
             # Long name for TdF in SNIC might be just "Tierra del Fuego" or full.
             # We will check mapping later, but let's try to be standard.
-            if name == "Tierra del Fuego, Antártida e Islas del Atlántico Sur": 
+            if name == "Tierra del Fuego, Antártida e Islas del Atlántico Sur":
                 # Let's add ONLY the short version for now as TdF sometimes is tricky
                 provinces_list.append({'provincia_nombre': "Tierra del Fuego", 'lat': lat, 'lon': lon})
                 # And usually allow the full name too just in case
-            
+
             provinces_list.append({'provincia_nombre': name, 'lat': lat, 'lon': lon})
-            
+
         df = pd.DataFrame(provinces_list)
-        df.to_csv(output_csv, index=False)
-        print(f"✅ Centroides guardados en {output_csv}")
-        print(df.head())
-        
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        df.to_csv(output_path, index=False)
+        logging.info(f"✅ Centroides guardados en {output_path} ({len(df)} provincias)")
+        return True
+
     except Exception as e:
-        print(f"❌ Error: {e}")
+        logging.error(f"❌ Error descargando centroides: {e}")
+        return False
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     get_centroids()
@@ -0,0 +1,213 @@
+import os
+import json
+import time
+import socket
+import logging
+import cProfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Per-step instrumentation of the ETL: wall/CPU time, peak RSS, rows and bytes in/out.
+# Steps are recorded into the active run report, written as JSON at the end of the run.
+REPORT_DIR = os.getenv("SNIC_RUN_REPORT_DIR", "data/reports/pipeline")
+PROFILE_DIR = os.getenv("SNIC_PROFILE_DIR", "data/reports/profiles")
+# RSS sampling interval while a step is running
+RSS_SAMPLE_SECONDS = float(os.getenv("SNIC_RSS_SAMPLE_SECONDS", 0.05))
+COUNTERS = ('rows_in', 'rows_out', 'bytes_read', 'bytes_written')
+
+_report = None
+_stack = threading.local()
+
+def current_rss():
+    """Resident set size of the process in bytes (peak so far where /proc is not available)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return peak_rss()
+
+def peak_rss():
+    """Peak resident set size of the process in bytes, or None if unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+def path_bytes(path: str):
+    """Size of a file, or of all files under a directory (0 if it does not exist)."""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def _mb(value):
+    return None if value is None else round(value / 1024 ** 2, 1)
+
+class _RssMonitor:
+    """Background sampler tracking the peak RSS seen while each active step runs."""
+
+    def __init__(self, interval: float = RSS_SAMPLE_SECONDS):
+        self.interval = interval
+        self.peaks = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, key):
+        rss = current_rss()
+        with self._lock:
+            self.peaks[key] = rss
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="rss-monitor", daemon=True)
+                self._thread.start()
+
+    def stop(self, key):
+        rss = current_rss()
+        with self._lock:
+            peak = self.peaks.pop(key)
+        return None if rss is None else max(rss, peak or 0)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            rss = current_rss()
+            with self._lock:
+                if not self.peaks:
+                    # Idle: the next step starts a new sampler
+                    self._thread = None
+                    return
+                if rss is not None:
+                    for key, peak in self.peaks.items():
+                        self.peaks[key] = max(peak or 0, rss)
+
+_monitor = _RssMonitor()
+
+class RunReport:
+    """Steps of one pipeline run plus run-level metadata, serialisable as JSON."""
+
+    def __init__(self, **meta):
+        self.run_id = time.strftime('%Y%m%d-%H%M%S') + f"-{os.getpid()}"
+        self.meta = meta
+        self.steps = []
+        self.started_at = time.strftime('%Y-%m-%dT%H:%M:%S%z')
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+        self._lock = threading.Lock()
+
+    def elapsed(self):
+        return time.perf_counter() - self._start_wall
+
+    def add(self, record: dict):
+        with self._lock:
+            self.steps.append(record)
+
+    def to_dict(self):
+        with self._lock:
+            steps = list(self.steps)
+        return {
+            'run_id': self.run_id,
+            'started_at': self.started_at,
+            'host': socket.gethostname(),
+            'wall_seconds': round(self.elapsed(), 3),
+            'cpu_seconds': round(time.process_time() - self._start_cpu, 3),
+            'peak_rss_mb': _mb(peak_rss()),
+            **self.meta,
+            'steps': sorted(steps, key=lambda s: s['started']),
+        }
+
+    def write(self, root: str = REPORT_DIR):
+        """Writes the report as run_<id>.json under root. Returns the path."""
+        os.makedirs(root, exist_ok=True)
+        path = os.path.join(root, f"run_{self.run_id}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+        return path
+
+def start_run(**meta):
+    """Starts recording steps into a new report (one active run per process)."""
+    global _report
+    _report = RunReport(**meta)
+    return _report
+
+def finish_run(root: str = REPORT_DIR):
+    """Writes and deactivates the active report. Returns its path, or None if none was active."""
+    global _report
+    report, _report = _report, None
+    if report is None:
+        return None
+    try:
+        path = report.write(root)
+    except OSError as e:
+        logging.warning(f"No se pudo guardar el reporte de ejecución: {e}")
+        return None
+    logging.info(f"Reporte de ejecución guardado en {path}")
+    return path
+
+@contextmanager
+def step(name: str, **counters):
+    """
+    Measures a block as one step of the active run. The yielded dict takes the counters
+    (rows_in, rows_out, bytes_read, bytes_written) and any extra detail. CPU time is the
+    calling thread's, so stages running alongside are not counted (nor are library
+    threads such as Arrow's). Memory is process-wide: process_peak_rss_mb is the highest
+    RSS of the whole process sampled while the step ran, other stages included.
+    """
+    stack = _stack.__dict__.setdefault('names', [])
+    record = {'name': name, 'parent': stack[-1] if stack else None, **dict.fromkeys(COUNTERS), **counters}
+    report = _report
+    record['started'] = round(report.elapsed(), 3) if report else 0.0
+    key = object()
+    stack.append(name)
+    _monitor.start(key)
+    start_wall, start_cpu = time.perf_counter(), time.thread_time()
+    record['status'] = 'ok'
+    try:
+        yield record
+    except BaseException:
+        record['status'] = 'error'
+        raise
+    finally:
+        record['wall_seconds'] = round(time.perf_counter() - start_wall, 3)
+        record['cpu_seconds'] = round(time.thread_time() - start_cpu, 3)
+        record['process_peak_rss_mb'] = _mb(_monitor.stop(key))
+        stack.pop()
+        if report is not None:
+            report.add(record)
+
+@contextmanager
+def profiled(name: str, enabled: bool = True, root: str = None):
+    """Runs the block under cProfile and dumps the stats to <root>/<run_id>/<name>.prof."""
+    if not enabled:
+        yield None
+        return
+    root = root or PROFILE_DIR
+    run_id = _report.run_id if _report else time.strftime('%Y%m%d-%H%M%S')
+    path = os.path.join(root, run_id, f"{name}.prof")
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield path
+    finally:
+        profiler.disable()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        profiler.dump_stats(path)
+        logging.info(f"Perfil de {name} guardado en {path} (ver con: python -m pstats {path})")
+
+def log_summary(report: RunReport = None):
+    """Logs one line per top-level step of the report."""
+    report = report or _report
+    if report is None:
+        return
+    for s in report.to_dict()['steps']:
+        if s['parent'] is not None:
+            continue
+        rows = f", {s['rows_out']:,} filas" if s.get('rows_out') is not None else ""
+        result = f" ({s['result']})" if s.get('result') else ""
+        logging.info(
+            f"{s['name']}{result}: {s['wall_seconds']:.2f}s pared, {s['cpu_seconds']:.2f}s CPU, "
+            f"pico RSS del proceso {s['process_peak_rss_mb']} MB{rows}"
+        )
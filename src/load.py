@@ -1,40 +1,231 @@
 import pandas as pd
+import numpy as np
 import logging
 import os
-from google.cloud import storage, bigquery
-from google.api_core.exceptions import GoogleAPIError
+import json
+import base64
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import google_crc32c
+from google.cloud import bigquery
+from clients import storage_client, bigquery_client
+from google.api_core.exceptions import GoogleAPIError, NotFound
+from schema import apply_schema
+from dataset import write_partitioned, write_parquet_chunks
+from instrument import step
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 PROCESSED_DATA_PATH = "data/processed/snic_clean.csv"
 FINAL_DATA_PATH = "data/final/snic_analytics.parquet"
+# Write a year/province partitioned dataset (data/final/snic_analytics/) instead of a single file
+PARTITIONED = os.getenv("SNIC_PARTITIONED_OUTPUT", "0") == "1"
+# Concurrent GCS uploads and resumable upload chunk size (a multiple of 256 KB)
+GCS_UPLOAD_WORKERS = int(os.getenv("SNIC_GCS_UPLOAD_WORKERS", 8))
+GCS_CHUNK_SIZE = int(os.getenv("SNIC_GCS_CHUNK_MB", 8)) * 1024 * 1024
+# Per-file upload results
+UPLOADED = "uploaded"
+SKIPPED = "skipped"
+FAILED = "failed"
+# BigQuery: "incremental" reloads only the changed year partitions, "full" replaces the table
+BQ_LOAD_MODE = os.getenv("BQ_LOAD_MODE", "incremental")
+BQ_PARTITION_COLUMN = 'anio'
+# Integer-range partitioning of the table: one partition per year in [start, end)
+BQ_PARTITION_RANGE = (1990, 2100)
+# Partition content hashes of the last successful load, per table
+BQ_MANIFEST_PATH = "data/final/bq_partitions.json"
 
-def upload_to_gcs(file_path: str, bucket_name: str, destination_blob_name: str):
-    """Uploads a file to Google Cloud Storage."""
+def file_checksums(file_path: str, chunk_size: int = 1024 * 1024):
+    """Base64 MD5 and CRC32C of a local file, in the format of the GCS blob metadata."""
+    md5 = hashlib.md5()
+    crc = google_crc32c.Checksum()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            md5.update(chunk)
+            crc.update(chunk)
+    return base64.b64encode(md5.digest()).decode(), base64.b64encode(crc.digest()).decode()
+
+def blob_matches(blob, file_path: str):
+    """True if the remote blob already holds the bytes of file_path (CRC32C, or MD5 when present)."""
+    if blob is None or blob.size != os.path.getsize(file_path):
+        return False
+    md5, crc32c = file_checksums(file_path)
+    return blob.crc32c == crc32c or (blob.md5_hash is not None and blob.md5_hash == md5)
+
+def _upload_blob(bucket, file_path: str, blob_name: str):
+    """Chunked, resumable upload verified by CRC32C, skipped if the blob is already byte-identical."""
     try:
-        client = storage.Client()
-        bucket = client.bucket(bucket_name)
-        blob = bucket.blob(destination_blob_name)
-        blob.upload_from_filename(file_path)
-        logging.info(f"Archivo {file_path} subido a gs://{bucket_name}/{destination_blob_name}")
-        return True
+        if blob_matches(bucket.get_blob(blob_name), file_path):
+            logging.info(f"Sin cambios, se omite gs://{bucket.name}/{blob_name}")
+            return SKIPPED
+
+        blob = bucket.blob(blob_name, chunk_size=GCS_CHUNK_SIZE)
+        blob.upload_from_filename(file_path, checksum="crc32c")
+        logging.info(f"Archivo {file_path} subido a gs://{bucket.name}/{blob_name}")
+        return UPLOADED
+    except (GoogleAPIError, OSError) as e:
+        logging.error(f"Fallo al subir a GCS: {e}")
+        return FAILED
+
+def upload_to_gcs(file_path: str, bucket_name: str, destination_blob_name: str, client=None):
+    """
+    Uploads a file to Google Cloud Storage (skipped if unchanged). Returns True/False.
+    STORAGE_EMULATOR_HOST points the client to a local fake GCS server.
+    """
+    try:
+        bucket = (client or storage_client()).bucket(bucket_name)
     except GoogleAPIError as e:
         logging.error(f"Fallo al subir a GCS: {e}")
         return False
+    return _upload_blob(bucket, file_path, destination_blob_name) != FAILED
 
-def upload_to_bigquery(df: pd.DataFrame, dataset_id: str, table_id: str):
-    """Uploads a DataFrame to a BigQuery table."""
+def upload_files_to_gcs(files, bucket_name: str, base_dir: str, workers: int = GCS_UPLOAD_WORKERS):
+    """
+    Uploads files (blob names relative to base_dir) through one shared client and a bounded
+    thread pool; unchanged files are skipped. Returns the count of uploaded, skipped and failed files.
+    """
     try:
-        client = bigquery.Client()
-        table_ref = f"{client.project}.{dataset_id}.{table_id}"
-        
-        job_config = bigquery.LoadJobConfig(
-            write_disposition="WRITE_TRUNCATE", # Complete overwrite for analytics tables
+        bucket = storage_client().bucket(bucket_name)
+    except GoogleAPIError as e:
+        logging.error(f"Fallo al crear el cliente de GCS: {e}")
+        return {UPLOADED: 0, SKIPPED: 0, FAILED: len(files)}
+
+    def upload(file_path):
+        blob_name = os.path.relpath(file_path, base_dir).replace(os.sep, "/")
+        return _upload_blob(bucket, file_path, blob_name)
+
+    sizes = [os.path.getsize(f) for f in files]
+    with step('load.gcs_upload', bytes_read=sum(sizes), files=len(files)) as record:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(files)))) as pool:
+            results = list(pool.map(upload, files))
+        record['bytes_written'] = sum(size for size, status in zip(sizes, results) if status == UPLOADED)
+
+    counts = {status: results.count(status) for status in (UPLOADED, SKIPPED, FAILED)}
+    logging.info(f"GCS: {counts[UPLOADED]} subidos, {counts[SKIPPED]} sin cambios, {counts[FAILED]} fallidos")
+    return counts
+
+def partition_hashes(df: pd.DataFrame, column: str = BQ_PARTITION_COLUMN):
+    """Content hash of every partition of df (independent of row order, sensitive to the columns)."""
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    columns = ",".join(f"{c}:{t}" for c, t in df.dtypes.astype(str).items()).encode()
+    hashes = {}
+    for value, positions in df.groupby(column, observed=True).indices.items():
+        h = hashlib.sha256(columns)
+        h.update(np.sort(row_hashes[positions]).tobytes())
+        hashes[str(int(value))] = h.hexdigest()
+    return hashes
+
+def _read_manifest(path: str):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def _write_manifest(path: str, manifest: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+def _load_job_config(partitioned: bool = False):
+    job_config = bigquery.LoadJobConfig(
+        write_disposition="WRITE_TRUNCATE", # Complete overwrite of the destination (table or partition)
+        source_format=bigquery.SourceFormat.PARQUET,
+    )
+    if partitioned:
+        start, end = BQ_PARTITION_RANGE
+        job_config.range_partitioning = bigquery.RangePartitioning(
+            field=BQ_PARTITION_COLUMN, range_=bigquery.PartitionRange(start=start, end=end, interval=1)
         )
-        
-        job = client.load_table_from_dataframe(df, table_ref, job_config=job_config)
-        job.result() # Wait for job to complete
+    return job_config
+
+def ensure_partitioned_table(client, table_ref: str):
+    """
+    Makes an existing table range-partitioned by anio. Tables created by the old full load
+    are unpartitioned, and BigQuery rejects load jobs that change the partitioning spec, so
+    they are rewritten in place with CREATE OR REPLACE ... PARTITION BY RANGE_BUCKET (atomic:
+    readers keep seeing the data). Returns False if the table does not exist.
+    """
+    try:
+        table = client.get_table(table_ref)
+    except NotFound:
+        return False
+
+    partitioning = table.range_partitioning
+    if partitioning is not None and partitioning.field == BQ_PARTITION_COLUMN:
+        return True
+
+    start, end = BQ_PARTITION_RANGE
+    logging.info(f"BigQuery {table_ref}: migrando la tabla a particiones por {BQ_PARTITION_COLUMN}...")
+    client.query(
+        f"CREATE OR REPLACE TABLE `{table_ref}` "
+        f"PARTITION BY RANGE_BUCKET({BQ_PARTITION_COLUMN}, GENERATE_ARRAY({start}, {end}, 1)) "
+        f"AS SELECT * FROM `{table_ref}`"
+    ).result()
+    return True
+
+def load_changed_partitions(client, df: pd.DataFrame, table_ref: str, manifest_path: str = BQ_MANIFEST_PATH):
+    """
+    Incremental load into a table partitioned by anio (integer range). Only the years whose
+    content hash differs from the last load are sent, each replacing its partition; years no
+    longer present are deleted. Without a previous load (or table) the whole frame is loaded.
+    An existing unpartitioned table is migrated first. Returns the list of years loaded.
+    """
+    hashes = partition_hashes(df)
+    manifest = _read_manifest(manifest_path)
+    previous = manifest.get(table_ref, {})
+    # The manifest is local (a fresh machine has none), so the table itself is checked
+    if not ensure_partitioned_table(client, table_ref):
+        previous = {}
+
+    if not previous:
+        changed = sorted(hashes)
+        jobs = [client.load_table_from_dataframe(df, table_ref, job_config=_load_job_config(partitioned=True))]
+    else:
+        changed = sorted(year for year, h in hashes.items() if previous.get(year) != h)
+        # Partition loads run concurrently on the BigQuery side
+        jobs = [
+            client.load_table_from_dataframe(
+                df[df[BQ_PARTITION_COLUMN] == int(year)], f"{table_ref}${year}", job_config=_load_job_config(partitioned=True)
+            )
+            for year in changed
+        ]
+    for job in jobs:
+        job.result()
+
+    removed = sorted(year for year in previous if year not in hashes)
+    if removed:
+        client.query(f"DELETE FROM `{table_ref}` WHERE {BQ_PARTITION_COLUMN} IN ({', '.join(removed)})").result()
+
+    manifest[table_ref] = hashes
+    _write_manifest(manifest_path, manifest)
+
+    rows = int(df[BQ_PARTITION_COLUMN].isin([int(y) for y in changed]).sum())
+    logging.info(
+        f"BigQuery {table_ref}: {len(changed)} particiones cargadas ({rows} filas), "
+        f"{len(hashes) - len(changed)} sin cambios, {len(removed)} eliminadas"
+    )
+    return changed
+
+def upload_to_bigquery(df: pd.DataFrame, dataset_id: str, table_id: str, mode: str = BQ_LOAD_MODE,
+                       manifest_path: str = BQ_MANIFEST_PATH):
+    """
+    Uploads a DataFrame to a BigQuery table as Parquet. In incremental mode only the changed
+    anio partitions are loaded (see load_changed_partitions); otherwise the table is replaced.
+    """
+    try:
+        client = bigquery_client()
+        table_ref = f"{client.project}.{dataset_id}.{table_id}"
+
+        with step('load.bigquery', rows_in=len(df), mode=mode) as record:
+            if mode == "incremental" and BQ_PARTITION_COLUMN in df.columns:
+                changed = load_changed_partitions(client, df, table_ref, manifest_path)
+                record['rows_out'] = int(df[BQ_PARTITION_COLUMN].isin([int(y) for y in changed]).sum())
+                return True
+
+            job = client.load_table_from_dataframe(df, table_ref, job_config=_load_job_config())
+            job.result() # Wait for job to complete
+            record['rows_out'] = len(df)
         
         logging.info(f"Cargadas {len(df)} filas en {table_ref}")
         return True
@@ -42,34 +233,86 @@ def upload_to_bigquery(df: pd.DataFrame, dataset_id: str, table_id: str):
         logging.error(f"Fallo al subir a BigQuery: {e}")
         return False
 
-def load_data(input_path: str, output_path: str):
-    """Loads processed data into local Parquet and optionally to Cloud."""
-    logging.info(f"Cargando datos procesados desde {input_path}...")
-    
-    if not os.path.exists(input_path):
-        logging.error(f"Archivo de entrada no encontrado: {input_path}")
-        return False
-        
+def local_target(output_path: str, partitioned: bool = PARTITIONED):
+    """Local output of the load step: the Parquet file, or the partitioned dataset directory."""
+    return os.path.splitext(output_path)[0] if partitioned else output_path
+
+def local_files(output_path: str, partitioned: bool = PARTITIONED):
+    """Files of an existing local output (what gets uploaded to GCS)."""
+    target = local_target(output_path, partitioned)
+    if os.path.isfile(target):
+        return [target]
+    return sorted(os.path.join(root, name) for root, _, names in os.walk(target) for name in names)
+
+def write_local(df: pd.DataFrame, output_path: str, partitioned: bool = PARTITIONED):
+    """
+    Writes df to local Parquet (the compact schema is preserved in the Parquet metadata).
+    Returns the written files, or None on failure.
+    """
     try:
-        df = pd.read_csv(input_path, encoding='utf-8-sig')
+        df = apply_schema(df)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        target = local_target(output_path, partitioned)
+        with step('load.write_parquet', rows_in=len(df)) as record:
+            if partitioned:
+                files = write_partitioned(df, target)
+            else:
+                df.to_parquet(output_path, index=False)
+                files = [output_path]
+            record.update(bytes_written=sum(os.path.getsize(f) for f in files), files=len(files))
+        logging.info(f"Datos cargados exitosamente en {target}")
+        return files
     except Exception as e:
-        logging.error(f"Fallo al leer CSV: {e}")
-        return False
-    
-    # 1. Save to Local Parquet
+        logging.error(f"Fallo al guardar parquet local: {e}")
+        return None
+
+def write_local_chunks(chunks, output_path: str, partitioned: bool = PARTITIONED):
+    """
+    Streams DataFrame chunks (e.g. from transform.clean_chunks) into the local Parquet
+    output, one chunk in memory at a time. Returns the written files, or None on failure.
+    """
+    target = local_target(output_path, partitioned)
+    tmp_path = output_path + ".tmp"
+    rows = [0]
+
+    def counted():
+        for chunk in chunks:
+            rows[0] += len(chunk)
+            yield apply_schema(chunk)
+
     try:
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        df.to_parquet(output_path, index=False)
-        logging.info(f"Datos cargados exitosamente en {output_path}")
+        with step('load.write_parquet') as record:
+            if partitioned:
+                files = write_partitioned(counted(), target)
+            else:
+                write_parquet_chunks(counted(), tmp_path)
+                os.replace(tmp_path, output_path)
+                files = [output_path]
+            record.update(rows_in=rows[0], bytes_written=sum(os.path.getsize(f) for f in files), files=len(files))
+        logging.info(f"Datos cargados exitosamente en {target} ({rows[0]:,} filas)")
+        return files
     except Exception as e:
         logging.error(f"Fallo al guardar parquet local: {e}")
+        return None
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def load_dataframe(df: pd.DataFrame, output_path: str, partitioned: bool = PARTITIONED):
+    """
+    Writes an already transformed DataFrame to local Parquet and optionally to Cloud.
+    With partitioned=True the local output is a Hive-partitioned dataset next to output_path.
+    """
+    # 1. Save to Local Parquet (apply_schema casts df in place)
+    files = write_local(df, output_path, partitioned)
+    if files is None:
         return False
 
     # 2. Upload to GCS (if configured)
     bucket_name = os.getenv("GCS_BUCKET_NAME")
-    if bucket_name:
-        blob_name = os.path.basename(output_path)
-        upload_to_gcs(output_path, bucket_name, blob_name)
+    if bucket_name and files:
+        upload_files_to_gcs(files, bucket_name, os.path.dirname(output_path))
     
     # 3. Upload to BigQuery (if configured)
     bq_dataset = os.getenv("BQ_DATASET_ID")
@@ -79,5 +322,33 @@ def load_data(input_path: str, output_path: str):
         
     return True
 
+def read_processed(input_path: str):
+    """Reads processed data (CSV or Parquet checkpoint). Returns None on failure."""
+    if not os.path.exists(input_path):
+        logging.error(f"Archivo de entrada no encontrado: {input_path}")
+        return None
+        
+    try:
+        with step('load.read', bytes_read=os.path.getsize(input_path)) as record:
+            if input_path.endswith('.parquet'):
+                df = pd.read_parquet(input_path)
+            else:
+                df = pd.read_csv(input_path, encoding='utf-8-sig')
+            record['rows_out'] = len(df)
+        return df
+    except Exception as e:
+        logging.error(f"Fallo al leer datos procesados: {e}")
+        return None
+
+def load_data(input_path: str, output_path: str):
+    """Loads processed data (CSV or Parquet checkpoint) into local Parquet and optionally to Cloud."""
+    logging.info(f"Cargando datos procesados desde {input_path}...")
+    
+    df = read_processed(input_path)
+    if df is None:
+        return False
+    
+    return load_dataframe(df, output_path)
+
 if __name__ == "__main__":
     load_data(PROCESSED_DATA_PATH, FINAL_DATA_PATH)
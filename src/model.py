@@ -1,10 +1,19 @@
+import os
 import pandas as pd
 import numpy as np
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import PolynomialFeatures
-from sklearn.pipeline import make_pipeline
 import logging
 
+# Series with fewer points are not forecast; below QUADRATIC_MIN_POINTS the fit is linear
+MIN_POINTS = 3
+QUADRATIC_MIN_POINTS = 5
+# Default grain of the precomputed forecast table
+SERIES_KEYS = ['provincia_nombre', 'codigo_delito_snic_nombre']
+# Residual-bootstrap prediction intervals
+N_BOOTSTRAP = int(os.getenv("SNIC_BOOTSTRAP_REPLICATES", 1000))
+INTERVAL_LEVEL = 0.9
+# Replicate fits solved per batch (series x replicates), bounds the memory of a batch
+BOOTSTRAP_BATCH_ROWS = 200000
+
 def prepare_time_series(df, crime_type=None, province=None):
     """
     Prepares data for time series analysis.
@@ -22,49 +31,140 @@ def prepare_time_series(df, crime_type=None, province=None):
     ts_data = df_filtered.groupby('anio')['cantidad_hechos'].sum().reset_index()
     return ts_data
 
-def train_and_predict(ts_data, years_ahead=2):
+def build_series_matrix(df, keys, value_col='cantidad_hechos'):
+    """
+    Pivots long data into a (series x years) matrix indexed by keys, one column per year.
+    Years without data for a series are NaN (missing points, not zeros).
+    """
+    return df.pivot_table(index=keys, columns='anio', values=value_col, aggfunc='sum', observed=True)
+
+def fit_polynomials(x, Y, degree):
+    """
+    Least-squares polynomial fits for every row of Y at once.
+    x: (n_years,) abscissas, Y: (n_series, n_years) with NaN for missing points.
+    Returns coefficients (n_series, degree + 1), lowest power first.
+    """
+    observed = ~np.isnan(Y)
+    A = np.vander(x, degree + 1, increasing=True)
+    # Normal equations per series, restricted to its observed points: (A' W A) c = A' W y
+    AtWA = np.einsum('st,ti,tj->sij', observed.astype(float), A, A)
+    AtWy = np.where(observed, Y, 0.0) @ A
+    return np.linalg.solve(AtWA, AtWy[..., None])[..., 0]
+
+def bootstrap_bounds(x, Y, future_x, degree, n_boot=N_BOOTSTRAP, level=INTERVAL_LEVEL, rng=None):
+    """
+    Residual-bootstrap prediction intervals for every row of Y (NaN = missing point).
+    Each replicate resamples the series' own residuals onto its fit, is refitted, and adds
+    a resampled residual to the projection. All replicate fits of a batch of series are one
+    batched least-squares solve. future_x: (n_series, horizon) abscissas to predict.
+    Returns (lower, upper), each (n_series, horizon).
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    n_series, n_years = Y.shape
+    horizon = future_x.shape[1]
+    A = np.vander(x, degree + 1, increasing=True)
+    alpha = (1 - level) / 2
+    lower = np.empty((n_series, horizon))
+    upper = np.empty((n_series, horizon))
+
+    batch = max(1, BOOTSTRAP_BATCH_ROWS // n_boot)
+    for start in range(0, n_series, batch):
+        Yb = Y[start:start + batch]
+        observed = ~np.isnan(Yb)
+        n_points = observed.sum(axis=1)
+        fitted = fit_polynomials(x, Yb, degree) @ A.T
+
+        # Residuals inflated for the parameters used by the fit, observed ones first in each row
+        scale = np.sqrt(n_points / np.maximum(n_points - degree - 1, 1))
+        resid = np.where(observed, Yb - fitted, 0.0) * scale[:, None]
+        pool = np.take_along_axis(resid, np.argsort(~observed, axis=1, kind='stable'), axis=1)
+        draws = (rng.random((len(Yb), n_boot, n_years + horizon)) * n_points[:, None, None]).astype(np.intp)
+        noise = np.take_along_axis(pool[:, None, :], draws, axis=2)
+
+        Y_star = np.where(observed[:, None, :], fitted[:, None, :] + noise[..., :n_years], np.nan)
+        coef = fit_polynomials(x, Y_star.reshape(-1, n_years), degree).reshape(len(Yb), n_boot, degree + 1)
+        F = np.vander(future_x[start:start + batch].ravel(), degree + 1, increasing=True).reshape(len(Yb), horizon, -1)
+        preds = np.einsum('sbd,shd->sbh', coef, F) + noise[..., n_years:]
+
+        lo, hi = np.quantile(preds, [alpha, 1 - alpha], axis=1)
+        lower[start:start + batch] = np.maximum(lo, 0)
+        upper[start:start + batch] = np.maximum(hi, 0)
+    return lower, upper
+
+def forecast_matrix(matrix: pd.DataFrame, years_ahead=2, intervals=False, n_boot=N_BOOTSTRAP, level=INTERVAL_LEVEL, seed=None):
+    """
+    Forecasts every series (row) of a series matrix in one vectorized pass per degree.
+    Same rules as train_and_predict: at least MIN_POINTS years, degree 1 below
+    QUADRATIC_MIN_POINTS, predictions clipped at 0. Each series is projected from its own last year.
+    With intervals=True adds bootstrap prediction bounds (seed makes them reproducible).
+    Returns a long DataFrame: index columns of matrix + anio + cantidad_hechos
+    (+ limite_inferior, limite_superior).
+    """
+    years = matrix.columns.to_numpy(dtype=float)
+    Y = matrix.to_numpy(dtype=float)
+    observed = ~np.isnan(Y)
+    n_points = observed.sum(axis=1)
+    # Last observed year of each series
+    last_year = np.where(observed, years, -np.inf).max(axis=1, initial=-np.inf)
+
+    # Center the years so the squared terms stay well conditioned
+    origin = years.mean() if len(years) else 0.0
+    horizon = np.arange(1, years_ahead + 1)
+    preds = np.full((len(Y), years_ahead), np.nan)
+    bounds = np.full((2, len(Y), years_ahead), np.nan)
+    rng = np.random.default_rng(seed)
+
+    for degree, rows in (
+        (1, (n_points >= MIN_POINTS) & (n_points < QUADRATIC_MIN_POINTS)),
+        (2, n_points >= QUADRATIC_MIN_POINTS),
+    ):
+        if not rows.any():
+            continue
+        coef = fit_polynomials(years - origin, Y[rows], degree)
+        fx = last_year[rows, None] + horizon - origin
+        preds[rows] = np.maximum(sum(coef[:, [p]] * fx ** p for p in range(degree + 1)), 0)
+        if intervals:
+            bounds[:, rows] = bootstrap_bounds(years - origin, Y[rows], fx, degree, n_boot, level, rng)
+
+    fitted = ~np.isnan(preds[:, 0])
+    keys = matrix.index.to_frame(index=False)[fitted].reset_index(drop=True)
+    result = keys.loc[keys.index.repeat(years_ahead)].reset_index(drop=True)
+    result['anio'] = (last_year[fitted, None] + horizon).ravel().astype(int)
+    result['cantidad_hechos'] = preds[fitted].ravel()
+    if intervals:
+        result['limite_inferior'] = bounds[0, fitted].ravel()
+        result['limite_superior'] = bounds[1, fitted].ravel()
+    return result
+
+def forecast_all(df, keys=SERIES_KEYS, years_ahead=2, **kwargs):
+    """Forecast table for every keys combination of the row-level (or cube) data."""
+    return forecast_matrix(build_series_matrix(df, list(keys)), years_ahead, **kwargs)
+
+def train_and_predict(ts_data, years_ahead=2, intervals=False, n_boot=N_BOOTSTRAP, level=INTERVAL_LEVEL, seed=None):
     """
     Trains a Polynomial Regression model (Degree 2) on time series data.
+    With intervals=True the prediction rows carry bootstrap bounds (limite_inferior/superior).
     Returns a dataframe with history + prediction and potential error message.
     """
-    if len(ts_data) < 3:
+    if len(ts_data) < MIN_POINTS:
         return None, "Se necesitan al menos 3 años de datos para una proyección avanzada."
         
-    # Prepare X (Years) and y (Counts)
-    X = ts_data['anio'].values.reshape(-1, 1)
-    y = ts_data['cantidad_hechos'].values
+    # Model: Polynomial Regression Degree 2 (Quadratic), linear below QUADRATIC_MIN_POINTS.
+    # A single series is a one-row batch of the vectorized forecaster.
+    matrix = ts_data.set_index('anio')[['cantidad_hechos']].T
+    forecast = forecast_matrix(matrix, years_ahead, intervals, n_boot, level, seed)
     
-    # Model: Polynomial Regression Degree 2 (Quadratic)
-    # This captures accelerated growth or decline better than a straight line.
-    degree = 2
-    if len(ts_data) < 5: # If very few points, stick to linear to avoid overfitting
-        degree = 1
-        
-    model = make_pipeline(PolynomialFeatures(degree), LinearRegression())
-    model.fit(X, y)
-    
-    # Future Years
-    last_year = int(ts_data['anio'].max())
-    future_years = np.array([last_year + i for i in range(1, years_ahead + 1)]).reshape(-1, 1)
-    
-    # Predict
-    future_pred = model.predict(future_years)
-    
-    # Clip negative predictions (crime count can't be negative)
-    future_pred = np.maximum(future_pred, 0)
-    
-    # Create Result DataFrame
+    return with_history(ts_data, forecast), None
+
+def with_history(ts_data, forecast):
+    """History + prediction frame (anio, cantidad_hechos, tipo [, bounds]) as returned by train_and_predict."""
     # 1. History
     hist_df = ts_data.copy()
     hist_df['tipo'] = 'Histórico'
     
     # 2. Prediction
-    pred_df = pd.DataFrame({
-        'anio': future_years.flatten(),
-        'cantidad_hechos': future_pred,
-        'tipo': 'Predicción'
-    })
-    
-    result_df = pd.concat([hist_df, pred_df], ignore_index=True)
+    bounds = [c for c in ('limite_inferior', 'limite_superior') if c in forecast.columns]
+    pred_df = forecast[['anio', 'cantidad_hechos'] + bounds].copy()
+    pred_df['tipo'] = 'Predicción'
     
-    return result_df, None
+    return pd.concat([hist_df, pred_df], ignore_index=True)
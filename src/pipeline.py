@@ -1,30 +1,190 @@
+import argparse
 import logging
-from extract import download_data, DATA_URL, RAW_DATA_PATH
-from transform import transform_data, PROCESSED_DATA_PATH
-from load import load_data, FINAL_DATA_PATH
+import os
+import sys
+import threading
+import pandas as pd
+import cube
+import crimes
+import dataset
+import dimensions
+import forecast_store
+import forecasters
+import geo
+import get_centroids as centroids
+import load
+import model
+import population
+import schema
+import transform
+from extract import download_if_changed, DATA_URL, RAW_DATA_PATH
+from transform import transform_data, transform_to_frame, clean_chunks, PROCESSED_DATA_PATH, CHECKPOINT_PATH, MEMORY_BUDGET_MB
+from load import read_processed, write_local, write_local_chunks, local_files, local_target, upload_files_to_gcs, upload_to_bigquery, FINAL_DATA_PATH, PARTITIONED
+from dataset import read_partitioned
+from cube import write_cube, CUBE_PATH
+from geo import build_geometry, lod_path, LODS
+from forecast_store import write_forecasts, FORECAST_PATH
+from dag import Stage, run_graph, FAILED, BLOCKED, SKIPPED
+from instrument import start_run, finish_run, log_summary
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def run_pipeline():
-    logging.info("Iniciando Pipeline ETL SNIC...")
-    
-    # Step 1: Extract
-    if not download_data(DATA_URL, RAW_DATA_PATH):
-        logging.error("Fallo en el paso de Extracción.")
-        return
-        
-    # Step 2: Transform
-    if not transform_data(RAW_DATA_PATH, PROCESSED_DATA_PATH):
-        logging.error("Fallo en el paso de Transformación.")
-        return
-        
-    # Step 3: Load (Local + Cloud)
-    if not load_data(PROCESSED_DATA_PATH, FINAL_DATA_PATH):
+# In-memory mode hands the DataFrame from transform to load without the intermediate CSV.
+# The chunked transform (SNIC_TRANSFORM_MEMORY_MB) always goes through disk.
+IN_MEMORY = os.getenv("SNIC_PIPELINE_IN_MEMORY", "1") == "1" and not MEMORY_BUDGET_MB
+CHECKPOINT = os.getenv("SNIC_CHECKPOINT", "0") == "1"
+# Local analytics output: the Parquet file or the partitioned dataset
+FINAL_OUTPUT = local_target(FINAL_DATA_PATH, PARTITIONED)
+
+_frame_lock = threading.Lock()
+
+def _frame(context):
+    """
+    The loaded DataFrame: handed over by the transform stage, or read from the final
+    output when transform was cached. Each stage gets its own shallow copy, so columns
+    added by one stage (e.g. surrogate IDs) do not leak into the others running alongside.
+    """
+    with _frame_lock:
+        if context.get('df') is None:
+            context['df'] = pd.read_parquet(FINAL_DATA_PATH) if not PARTITIONED else read_partitioned(FINAL_OUTPUT)
+        return context['df'].copy(deep=False)
+
+def _extract(context):
+    # Conditional download (ETag / SHA-256); falls back to the last file or mock data
+    download_if_changed(DATA_URL, RAW_DATA_PATH)
+    return True
+
+def _geometry(context):
+    return build_geometry(force=True)
+
+def _centroids(context):
+    return centroids.get_centroids(centroids.output_csv)
+
+def _transform(context):
+    """Steps 2+3: Transform -> local Load (cloud uploads are their own stages)."""
+    if MEMORY_BUDGET_MB:
+        # Chunked mode: the chunks go straight into the local output, never all in memory.
+        # Later stages read the output back (see _frame).
+        if not os.path.exists(RAW_DATA_PATH):
+            logging.error(f"Archivo de entrada no encontrado: {RAW_DATA_PATH}")
+            return False
+        if write_local_chunks(clean_chunks(RAW_DATA_PATH, MEMORY_BUDGET_MB), FINAL_DATA_PATH, PARTITIONED) is None:
+            logging.error("Fallo en el paso de Transformación y Carga por lotes.")
+            return False
+        context['df'] = None
+        return True
+
+    if context.get('in_memory', IN_MEMORY):
+        df = transform_to_frame(RAW_DATA_PATH, CHECKPOINT_PATH if context.get('checkpoint', CHECKPOINT) else None)
+        if df is None:
+            logging.error("Fallo en el paso de Transformación.")
+            return False
+    else:
+        if not transform_data(RAW_DATA_PATH, PROCESSED_DATA_PATH):
+            logging.error("Fallo en el paso de Transformación.")
+            return False
+        df = read_processed(PROCESSED_DATA_PATH)
+        if df is None:
+            return False
+
+    if write_local(df, FINAL_DATA_PATH, PARTITIONED) is None:
         logging.error("Fallo en el paso de Carga.")
-        return
-        
+        return False
+    context['df'] = df
+    return True
+
+def _gcs_upload(context):
+    bucket_name = os.getenv("GCS_BUCKET_NAME")
+    if not bucket_name:
+        logging.info("GCS_BUCKET_NAME no configurado. Se omite la subida a GCS.")
+        return SKIPPED
+    counts = upload_files_to_gcs(local_files(FINAL_DATA_PATH, PARTITIONED), bucket_name, os.path.dirname(FINAL_DATA_PATH))
+    return not counts.get(load.FAILED)
+
+def _bigquery(context):
+    bq_dataset = os.getenv("BQ_DATASET_ID")
+    if not bq_dataset:
+        logging.info("BQ_DATASET_ID no configurado. Se omite la carga en BigQuery.")
+        return SKIPPED
+    return upload_to_bigquery(_frame(context), bq_dataset, os.getenv("BQ_TABLE_ID", "snic_analytics"))
+
+def _cube(context):
+    return write_cube(_frame(context), CUBE_PATH)
+
+def _forecasts(context):
+    return write_forecasts(_frame(context), FORECAST_PATH)
+
+# extract always runs (its own conditional download decides); everything else is skipped
+# while its inputs, code and settings match the last successful run. geometry and centroids
+# are optional: the app falls back to the bundled files, so their failure does not fail the ETL.
+STAGES = [
+    Stage('extract', _extract, outputs=(RAW_DATA_PATH,), cache=False),
+    Stage('geometry', _geometry, outputs=tuple(lod_path(lod) for lod in LODS),
+          code=(geo,), params=('SNIC_GEOJSON_URL',), optional=True),
+    Stage('centroids', _centroids, outputs=(centroids.output_csv,), code=(centroids,), optional=True),
+    Stage('transform', _transform, deps=('extract',), inputs=(RAW_DATA_PATH,), outputs=(FINAL_OUTPUT,),
+          code=(transform, schema, crimes, dimensions, load, dataset),
+          params=('SNIC_PIPELINE_IN_MEMORY', 'SNIC_TRANSFORM_MEMORY_MB', 'SNIC_PARTITIONED_OUTPUT',
+                  'SNIC_CHECKPOINT')),
+    Stage('gcs_upload', _gcs_upload, deps=('transform',), inputs=(FINAL_OUTPUT,), code=(load,),
+          params=('GCS_BUCKET_NAME', 'STORAGE_EMULATOR_HOST')),
+    Stage('bigquery', _bigquery, deps=('transform',), inputs=(FINAL_OUTPUT,), code=(load,),
+          params=('BQ_DATASET_ID', 'BQ_TABLE_ID', 'BQ_LOAD_MODE')),
+    Stage('cube', _cube, deps=('transform',), inputs=(FINAL_OUTPUT,), outputs=(CUBE_PATH,),
+          code=(cube, dimensions, crimes, population, schema)),
+    Stage('forecasts', _forecasts, deps=('transform',), inputs=(FINAL_OUTPUT,), outputs=(FORECAST_PATH,),
+          code=(forecast_store, forecasters, model)),
+]
+
+def run_pipeline(force: bool = False, in_memory: bool = IN_MEMORY, checkpoint: bool = CHECKPOINT,
+                 start: str = None, only=None, profile=()):
+    """
+    Runs the ETL stage graph. start: run from that stage on (it is forced, its dependents
+    use the cache); only: run just those stages (forced); profile: stages to run under
+    cProfile ('all' for every stage). Writes a JSON run report with the per-stage and
+    per-step measurements. Returns True if no required stage failed.
+    """
+    logging.info("Iniciando Pipeline ETL SNIC...")
+    context = {'in_memory': in_memory, 'checkpoint': checkpoint}
+    report = start_run(options={'force': force, 'in_memory': in_memory, 'checkpoint': checkpoint,
+                                'from': start, 'only': list(only or []), 'profile': list(profile or [])})
+    try:
+        results = run_graph(STAGES, context, start=start, only=only, force=force, profile=profile)
+    finally:
+        log_summary(report)
+        finish_run()
+
+    optional = {s.name for s in STAGES if s.optional}
+    failed = [name for name, (result, _) in results.items() if result in (FAILED, BLOCKED)]
+    for name in optional.intersection(failed):
+        logging.warning(f"Etapa opcional {name} fallida: se usan los archivos existentes.")
+    failed = [name for name in failed if name not in optional]
+    if failed:
+        logging.error(f"Pipeline ETL SNIC con etapas fallidas u omitidas: {', '.join(failed)}")
+        return False
     logging.info("Pipeline ETL SNIC completado exitosamente.")
+    return True
+
+def parse_args(argv=None):
+    names = [s.name for s in STAGES]
+    parser = argparse.ArgumentParser(description="Pipeline ETL SNIC")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--from', dest='start', choices=names, help="Ejecutar desde esta etapa (y sus dependientes)")
+    group.add_argument('--only', type=lambda v: [n.strip() for n in v.split(',') if n.strip()],
+                       help=f"Ejecutar solo estas etapas, separadas por coma ({', '.join(names)})")
+    parser.add_argument('--profile', type=lambda v: [n.strip() for n in v.split(',') if n.strip()],
+                        default=os.getenv("SNIC_PROFILE", ""),
+                        help="Perfilar estas etapas con cProfile, separadas por coma ('all' para todas)")
+    parser.add_argument('--force', action='store_true', default=os.getenv("SNIC_FORCE_REBUILD") == "1",
+                        help="Ignorar la caché de etapas")
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
-    run_pipeline()
+    args = parse_args()
+    try:
+        ok = run_pipeline(force=args.force, start=args.start, only=args.only, profile=args.profile)
+    except ValueError as e:
+        logging.error(str(e))
+        ok = False
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,126 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Population dimension used to compute rates per 100k inhabitants
+RATE_PER = 100000
+# Count column -> rate column
+RATE_COLUMNS = {'cantidad_hechos': 'tasa_hechos', 'cantidad_victimas': 'tasa_victimas'}
+# Optional department-level population (provincia_nombre, departamento_nombre, poblacion)
+DEPT_POPULATION_PATH = os.getenv("SNIC_DEPT_POPULATION_PATH", "data/departamentos_poblacion.csv")
+DEPT_KEYS = ['provincia_nombre', 'departamento_nombre']
+
+# Población Censo 2022 (para cálculo de tasas provinciales)
+PROVINCIA_POBLACION = {
+    "Buenos Aires": 17569053,
+    "Ciudad Autónoma de Buenos Aires": 3120612,
+    "Catamarca": 429556,
+    "Chaco": 1142963,
+    "Chubut": 603120,
+    "Córdoba": 3978984,
+    "Corrientes": 1197553,
+    "Entre Ríos": 1426426,
+    "Formosa": 606041,
+    "Jujuy": 797955,
+    "La Pampa": 366022,
+    "La Rioja": 384607,
+    "Mendoza": 2014533,
+    "Misiones": 1280960,
+    "Neuquén": 710814,
+    "Río Negro": 762067,
+    "Salta": 1440672,
+    "San Juan": 817218,
+    "San Luis": 540905,
+    "Santa Cruz": 333473,
+    "Santa Fe": 3556522,
+    "Santiago del Estero": 1054028,
+    "Tierra del Fuego": 190641, # Normalizado en ETL? Chequear
+    "Tucumán": 1703186
+}
+# Fallback map for discrepancies
+NORM_PROVS = {
+    "Tierra del Fuego, Antártida e Islas del Atlántico Sur": "Tierra del Fuego"
+}
+
+def province_population():
+    """Province population table (provincia_nombre, poblacion), including the name aliases in NORM_PROVS."""
+    population = dict(PROVINCIA_POBLACION)
+    population.update({alias: PROVINCIA_POBLACION[name] for alias, name in NORM_PROVS.items()})
+    return pd.DataFrame({'provincia_nombre': list(population), 'poblacion': list(population.values())})
+
+def department_population(path: str = DEPT_POPULATION_PATH):
+    """Department population table if available, otherwise None."""
+    if path and os.path.exists(path):
+        return pd.read_csv(path)
+    return None
+
+def population_for(columns, departments: pd.DataFrame = None):
+    """
+    Population units for a frame with these columns: (keys, table). Departments when their
+    population is available and the frame has them, provinces (census) otherwise.
+    """
+    if departments is not None and all(k in columns for k in DEPT_KEYS):
+        return DEPT_KEYS, departments
+    return ['provincia_nombre'], province_population()
+
+def _lookup(frame, keys, population):
+    """Population for every row of frame, joined on keys. Missing entries are NaN."""
+    if len(keys) == 1:
+        lookup = population.set_index(keys[0])['poblacion']
+        col = frame[keys[0]]
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            # Join on the categories only, then expand through the codes
+            per_category = col.cat.categories.map(lookup).to_numpy(dtype=float)
+            codes = col.cat.codes.to_numpy()
+            return np.where(codes >= 0, per_category[codes], np.nan)
+        return col.map(lookup).to_numpy(dtype=float)
+
+    right = population[keys + ['poblacion']].astype({k: str for k in keys})
+    joined = frame[keys].astype(str).merge(right, how='left', on=keys)
+    return joined['poblacion'].to_numpy(dtype=float)
+
+def add_rates(frame: pd.DataFrame, keys=('provincia_nombre',), population: pd.DataFrame = None):
+    """
+    Adds tasa_* columns (per 100k inhabitants) for the count columns of frame, with one
+    vectorized join against the population table on keys (province census by default).
+    Rows without population get 0.
+    """
+    keys = list(keys)
+    if population is None:
+        population = province_population()
+
+    pop = _lookup(frame, keys, population)
+    valid = pop > 0
+    for count_col, rate_col in RATE_COLUMNS.items():
+        if count_col in frame.columns:
+            counts = frame[count_col].to_numpy(dtype=float)
+            frame[rate_col] = np.where(valid, counts / np.where(valid, pop, 1) * RATE_PER, 0.0)
+    return frame
+
+def add_group_rates(result: pd.DataFrame, rows: pd.DataFrame, by, keys=('provincia_nombre',), population: pd.DataFrame = None):
+    """
+    Adds tasa_* columns to result, which holds rows summed by the `by` columns. Rates of
+    different provinces do not add up, so each group's rate is its summed counts over the
+    summed population of the distinct units (keys) in it. Rows without population are left
+    out of both sums; groups without any population get 0.
+    """
+    by, keys = list(by), list(keys)
+    if population is None:
+        population = province_population()
+
+    pop = _lookup(rows, keys, population)
+    valid = pop > 0
+    rows = rows[valid]
+    units = list(dict.fromkeys(by + keys))
+    group_pop = (
+        rows[units].assign(poblacion=pop[valid]).drop_duplicates(subset=units)
+        .groupby(by, observed=True)['poblacion'].sum()
+    )
+    counts = [c for c in RATE_COLUMNS if c in rows.columns]
+    rates = rows.groupby(by, observed=True)[counts].sum().div(group_pop, axis=0) * RATE_PER
+    rates = rates.rename(columns=RATE_COLUMNS).reset_index()
+
+    result = result.drop(columns=list(RATE_COLUMNS.values()), errors='ignore').merge(rates, on=by, how='left')
+    for rate_col in rates.columns.difference(by):
+        result[rate_col] = result[rate_col].fillna(0.0)
+    return result
@@ -0,0 +1,190 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+import numpy as np
+import pandas as pd
+from cube import GRAINS, MEASURES
+from population import add_group_rates, department_population, population_for
+
+# Memory budget of the shared result cache
+CACHE_MAX_MB = int(os.getenv("SNIC_QUERY_CACHE_MB", 256))
+
+# Sidebar dimension -> cube dimension it needs
+FILTER_COLUMNS = {
+    'year': 'anio',
+    'provinces': 'provincia_nombre',
+    'crimes': 'codigo_delito_snic_nombre',
+    'depts': 'departamento_id',
+}
+# Derived columns and the cube dimension they come with
+DERIVED_COLUMNS = {'descripcion_delito': 'codigo_delito_snic_nombre', 'categoria_delito': 'codigo_delito_snic_nombre'}
+# Approximate bytes of one GeoJSON position: a [lon, lat] list of two floats
+POSITION_BYTES = sys.getsizeof([0.0, 0.0]) + 2 * sys.getsizeof(0.0)
+
+@dataclass(frozen=True)
+class SelectionKey:
+    """Normalized sidebar selection: sorted tuples, None meaning "no filter"."""
+    year: int = None
+    provinces: tuple = None
+    crimes: tuple = None
+    depts: tuple = None
+
+    @classmethod
+    def from_selection(cls, year=None, provinces=None, crimes=None, depts=None):
+        def norm(values):
+            return None if values is None else tuple(sorted(set(values)))
+        return cls(
+            year=None if year is None else int(year),
+            provinces=norm(provinces),
+            crimes=norm(crimes),
+            depts=norm(depts) or None,
+        )
+
+    def without_year(self):
+        return replace(self, year=None)
+
+    def with_year(self, year):
+        return replace(self, year=int(year))
+
+def _positions(coords):
+    """Number of positions in GeoJSON coordinates; a ring or line counts by its length."""
+    if not coords:
+        return 0
+    if isinstance(coords[0], (int, float)):
+        return 1
+    if isinstance(coords[0][0], (int, float)):
+        return len(coords)
+    return sum(_positions(c) for c in coords)
+
+def _plotly_size(value):
+    """Approximate size of figure properties: arrays by their buffer, GeoJSON by its positions."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        if 'features' in value:
+            return sum(
+                POSITION_BYTES * _positions((f.get('geometry') or {}).get('coordinates'))
+                + sys.getsizeof(f.get('properties'))
+                for f in value['features']
+            )
+        return sys.getsizeof(value) + sum(_plotly_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_plotly_size(v) for v in value)
+    return sys.getsizeof(value)
+
+def _size_of(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, tuple):
+        return sum(_size_of(v) for v in value)
+    if hasattr(value, 'to_plotly_json'):
+        # Plotly figures: walk the trace and layout properties as stored (the public
+        # accessors deep-copy them), without serializing the figure
+        return _plotly_size(value._data) + _plotly_size(value._layout)
+    return sys.getsizeof(value)
+
+class QueryService:
+    """
+    Answers dashboard queries from the cube (and row-level data) for a SelectionKey.
+    Results are kept in an LRU bounded by memory size and shared by every session.
+    Cached frames are shared: callers must not modify them in place.
+    """
+
+    def __init__(self, frames: dict, indexes: dict, max_bytes: int = CACHE_MAX_MB * 1024 * 1024):
+        self.frames = frames
+        self.indexes = indexes
+        self.departments = department_population()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._bytes = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key][0]
+            self.misses += 1
+
+        value = compute()
+        size = _size_of(value)
+        if size <= self.max_bytes:
+            with self._lock:
+                if key not in self._cache:
+                    self._cache[key] = (value, size)
+                    self._bytes += size
+                while self._bytes > self.max_bytes:
+                    _, (_, evicted_size) = self._cache.popitem(last=False)
+                    self._bytes -= evicted_size
+        return value
+
+    def _grain_for(self, sel: SelectionKey, by):
+        """Coarsest cube grain holding every column the query filters or groups on."""
+        needed = {col for attr, col in FILTER_COLUMNS.items() if getattr(sel, attr) is not None}
+        needed |= {DERIVED_COLUMNS.get(col, col) for col in (by or [])}
+        if by:
+            # Grouped rates need the province of every row (see query)
+            needed.add('provincia_nombre')
+        for name in reversed(list(GRAINS)):
+            if needed.issubset(GRAINS[name]):
+                return name
+        return 'base'
+
+    def _subset(self, sel: SelectionKey, grain: str):
+        frame = self.frames[grain]
+        return frame[self.indexes[grain].mask({
+            'anio': sel.year,
+            'provincia_nombre': sel.provinces,
+            'codigo_delito_snic_nombre': sel.crimes,
+            'departamento_id': sel.depts,
+        })]
+
+    def query(self, sel: SelectionKey, by=None, grain: str = None):
+        """
+        Rows of the selection (by=None) or their measures summed by the `by` columns, with
+        the rates of each group recomputed from its counts and population.
+        grain forces a frame (e.g. 'rows' for row-level data); by default the coarsest
+        cube grain that can answer the query is used.
+        """
+        grain = grain or self._grain_for(sel, by)
+        by = tuple(by) if by else None
+
+        def compute():
+            subset = self._subset(sel, grain)
+            if by is None:
+                return subset
+            measures = [m for m in MEASURES if m in subset.columns]
+            result = subset.groupby(list(by), observed=True)[measures].sum().reset_index()
+            if 'provincia_nombre' not in subset.columns:
+                return result
+            # Rates are not summed: summed counts over the population of the units in each group
+            keys, population = population_for(subset.columns, self.departments)
+            return add_group_rates(result, subset, by, keys, population)
+
+        return self._get_or_compute(('query', sel, by, grain), compute)
+
+    def totals(self, sel: SelectionKey):
+        """Sum of every measure over the selection."""
+        def compute():
+            subset = self.query(sel)
+            return {m: subset[m].sum() for m in MEASURES if m in subset.columns}
+        return self._get_or_compute(('totals', sel), compute)
+
+    def cached(self, key, compute):
+        """
+        Derived result (e.g. a finished figure) cached in the same LRU under key.
+        key must be hashable and include everything compute depends on.
+        """
+        return self._get_or_compute(('derived',) + tuple(key), compute)
+
+    def stats(self):
+        """Cache counters: hits, misses, entries and bytes in use."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._cache), 'bytes': self._bytes}
@@ -0,0 +1,50 @@
+import pandas as pd
+import numpy as np
+
+# Explicit column schema for the SNIC data path (transform -> Parquet -> dashboard).
+# String dimensions are dictionary-encoded and integer columns use the narrowest safe width.
+CATEGORY_COLUMNS = ['provincia_nombre', 'departamento_nombre', 'codigo_delito_snic_nombre', 'descripcion_delito', 'categoria_delito']
+INTEGER_COLUMNS = {
+    'anio': 'int16',
+    'provincia_id': 'int8',
+    'departamento_id': 'int32',
+    'cantidad_hechos': 'int32',
+    'cantidad_victimas': 'int32',
+}
+# Count columns are summed everywhere, so missing values are stored as 0
+COUNT_COLUMNS = ['cantidad_hechos', 'cantidad_victimas']
+
+def apply_schema(df: pd.DataFrame):
+    """
+    Casts the known SNIC columns to the compact schema. Columns not in the schema are left as is.
+    Raises ValueError if a value does not fit its integer width.
+    """
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+
+    for col, dtype in INTEGER_COLUMNS.items():
+        if col not in df.columns or df[col].dtype == dtype:
+            continue
+        values = pd.to_numeric(df[col])
+        if col in COUNT_COLUMNS:
+            values = values.fillna(0)
+        info = np.iinfo(dtype)
+        if len(values) and (values.min() < info.min or values.max() > info.max):
+            raise ValueError(f"La columna {col} excede el rango de {dtype}")
+        df[col] = values.astype(dtype)
+
+    return df
+
+def map_categories(series: pd.Series, mapper):
+    """
+    Maps the categories of a categorical Series instead of every row.
+    Categories that end up with the same label are merged.
+    """
+    series = series.astype('category')
+    labels = series.cat.categories.map(mapper)
+    inverse, uniques = pd.factorize(labels)
+
+    codes = series.cat.codes.to_numpy()
+    new_codes = np.where(codes >= 0, inverse[codes], -1)
+    return pd.Series(pd.Categorical.from_codes(new_codes, categories=uniques), index=series.index, name=series.name)
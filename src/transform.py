@@ -1,48 +1,189 @@
 import pandas as pd
 import logging
 import os
+from schema import apply_schema
+from crimes import resolve_crime_names
+from dimensions import add_geo_ids, surrogate_keys
+from instrument import step
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 RAW_DATA_PATH = "data/raw/snic_data.csv"
 PROCESSED_DATA_PATH = "data/processed/snic_clean.csv"
+# Optional binary checkpoint used by the in-memory pipeline mode
+CHECKPOINT_PATH = "data/processed/snic_clean.parquet"
+# Peak memory budget for the chunked mode (0 = read the whole file at once)
+MEMORY_BUDGET_MB = int(os.getenv("SNIC_TRANSFORM_MEMORY_MB", 0))
+REQUIRED_COLUMNS = ['anio', 'provincia_nombre', 'codigo_delito_snic_nombre', 'cantidad_hechos', 'cantidad_victimas']
 
-def transform_data(input_path: str, output_path: str):
-    """Cleans and transforms raw SNIC data."""
-    logging.info(f"Cargando datos crudos desde {input_path}...")
-    
-    if not os.path.exists(input_path):
-        logging.error(f"Archivo de entrada no encontrado: {input_path}")
-        return False
-        
-    try:
-        df = pd.read_csv(input_path, sep=';', encoding='utf-8')
-    except UnicodeDecodeError as e:
-        logging.error(f"Fallo al leer archivo con codificación UTF-8: {e}")
-        return False
-    
+def clean_data(df: pd.DataFrame, geo_keys: dict = None):
+    """
+    Applies the cleaning steps to a raw DataFrame (or to one chunk of it). geo_keys
+    (see scan_geo_keys) gives every chunk of a file the same surrogate geo IDs.
+    """
     # 1. Basic Cleaning
     # Drop rows with critical missing values if necessary, though mock data should be clean
-    df.dropna(subset=['anio', 'provincia_nombre'], inplace=True)
-    
+    df = df.dropna(subset=['anio', 'provincia_nombre'])
+
     # 2. Type Conversion
     df['anio'] = df['anio'].astype(int)
-    
+
     # 3. Standardization
     # Example: specific text cleaning or category mapping could go here
     # df['provincia_nombre'] = df['provincia_nombre'].str.strip().str.title()
-    
-    # 4. Aggregation (Optional - purely for demonstrative structure)
+
+    # 4. Compact schema (categorical dimensions, narrow integers)
+    df = apply_schema(df)
+
+    # 5. Crime display names, descriptions and categories (crime dimension)
+    df = resolve_crime_names(df)
+
+    # 6. Integer province/department IDs (geographic dimension)
+    return add_geo_ids(df, geo_keys)
+
+def check_columns(df: pd.DataFrame):
+    """Warns if any of the columns required downstream is missing."""
     # Keeping raw granularity for now, but ensure columns are consistent
-    required_columns = ['anio', 'provincia_nombre', 'codigo_delito_snic_nombre', 'cantidad_hechos', 'cantidad_victimas']
-    if not all(col in df.columns for col in required_columns):
+    if not all(col in df.columns for col in REQUIRED_COLUMNS):
          logging.warning(f"Faltan columnas en datos de entrada. Disponibles: {df.columns}")
-    
-    logging.info(f"Datos transformados. Dimensiones: {df.shape}")
-    
+
+def estimate_chunk_rows(input_path: str, memory_budget_mb: int, sample_rows: int = 10000):
+    """
+    Estimates how many rows fit in the memory budget from a sample of the file.
+    Parsing and cleaning hold a few copies of each chunk, hence the safety factor.
+    """
+    sample = pd.read_csv(input_path, sep=';', encoding='utf-8', nrows=sample_rows)
+    bytes_per_row = sample.memory_usage(deep=True).sum() / max(len(sample), 1)
+    safety_factor = 4
+    return max(1000, int(memory_budget_mb * 1024 * 1024 / (bytes_per_row * safety_factor)))
+
+def scan_geo_keys(input_path: str, chunk_rows: int):
+    """
+    Surrogate geo ID tables numbered over the distinct keys of the whole file, read in
+    chunks of the name columns only. Empty if the source carries the IDs.
+    """
+    header = pd.read_csv(input_path, sep=';', encoding='utf-8', nrows=0).columns
+    if {'provincia_id', 'departamento_id'} <= set(header) or not {'anio', 'provincia_nombre'} <= set(header):
+        return {}
+    columns = [c for c in ('anio', 'provincia_nombre', 'departamento_nombre') if c in header]
+    distinct = [
+        # Same rows as clean_data keeps
+        chunk.dropna(subset=['anio', 'provincia_nombre']).drop(columns='anio').drop_duplicates()
+        for chunk in pd.read_csv(input_path, sep=';', encoding='utf-8', usecols=columns, chunksize=chunk_rows)
+    ]
+    if not distinct:
+        return {}
+    return surrogate_keys(pd.concat(distinct).drop_duplicates())
+
+def clean_chunks(input_path: str, memory_budget_mb: int, stats: dict = None):
+    """
+    Yields the cleaned chunks of the raw CSV, each sized to the memory budget. Geo IDs
+    are assigned once over the whole file first, so they agree across chunks. stats
+    (if given) receives rows_in / rows_out / chunk_rows.
+    """
+    chunk_rows = estimate_chunk_rows(input_path, memory_budget_mb)
+    logging.info(f"Modo por lotes: {chunk_rows:,} filas por lote (presupuesto {memory_budget_mb} MB).")
+    stats = {} if stats is None else stats
+    stats.update(rows_in=0, rows_out=0, chunk_rows=chunk_rows)
+
+    geo_keys = scan_geo_keys(input_path, chunk_rows)
+    reader = pd.read_csv(input_path, sep=';', encoding='utf-8', chunksize=chunk_rows)
+    for i, chunk in enumerate(reader):
+        if i == 0:
+            check_columns(chunk)
+        stats['rows_in'] += len(chunk)
+        chunk = clean_data(chunk, geo_keys)
+        stats['rows_out'] += len(chunk)
+        yield chunk
+
+def transform_data_chunked(input_path: str, output_path: str, memory_budget_mb: int):
+    """Streams the raw CSV in bounded batches through clean_data, appending to output_path."""
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    tmp_path = output_path + ".tmp"
+    stats, n_cols = {}, 0
+
+    try:
+        with step('transform.chunked', bytes_read=os.path.getsize(input_path)) as record, \
+                open(tmp_path, 'w', encoding='utf-8-sig', newline='') as out:
+            for i, chunk in enumerate(clean_chunks(input_path, memory_budget_mb, stats)):
+                n_cols = chunk.shape[1]
+                chunk.to_csv(out, index=False, header=(i == 0))
+            out.flush()
+            record.update(stats, bytes_written=os.path.getsize(tmp_path))
+        os.replace(tmp_path, output_path)
+    except UnicodeDecodeError as e:
+        logging.error(f"Fallo al leer archivo con codificación UTF-8: {e}")
+        return False
+    except ValueError as e:
+        logging.error(f"Datos fuera del esquema: {e}")
+        return False
+    finally:
+        # Any failure (not only the ones handled above) leaves no partial output behind
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    rows_in, rows_out = stats['rows_in'], stats['rows_out']
+    logging.info(f"Datos transformados. Dimensiones: {(rows_out, n_cols)} (descartadas {rows_in - rows_out} filas)")
+    logging.info(f"Datos procesados guardados en {output_path}")
+    return True
+
+def transform_to_frame(input_path: str, checkpoint_path: str = None):
+    """
+    Reads and cleans raw SNIC data, returning the DataFrame instead of writing a CSV.
+    Optionally persists a Parquet checkpoint. Returns None on failure.
+    """
+    logging.info(f"Cargando datos crudos desde {input_path}...")
+
+    if not os.path.exists(input_path):
+        logging.error(f"Archivo de entrada no encontrado: {input_path}")
+        return None
+
+    try:
+        with step('transform.read_csv', bytes_read=os.path.getsize(input_path)) as record:
+            df = pd.read_csv(input_path, sep=';', encoding='utf-8')
+            record['rows_out'] = len(df)
+    except UnicodeDecodeError as e:
+        logging.error(f"Fallo al leer archivo con codificación UTF-8: {e}")
+        return None
+
+    try:
+        with step('transform.clean', rows_in=len(df)) as record:
+            df = clean_data(df)
+            record['rows_out'] = len(df)
+    except ValueError as e:
+        logging.error(f"Datos fuera del esquema: {e}")
+        return None
+    check_columns(df)
+
+    logging.info(f"Datos transformados. Dimensiones: {df.shape} ({df.memory_usage(deep=True).sum() / 1024**2:.1f} MB)")
+
+    if checkpoint_path:
+        os.makedirs(os.path.dirname(checkpoint_path), exist_ok=True)
+        with step('transform.checkpoint', rows_in=len(df)) as record:
+            df.to_parquet(checkpoint_path, index=False)
+            record['bytes_written'] = os.path.getsize(checkpoint_path)
+        logging.info(f"Checkpoint guardado en {checkpoint_path}")
+
+    return df
+
+def transform_data(input_path: str, output_path: str, memory_budget_mb: int = MEMORY_BUDGET_MB):
+    """
+    Cleans and transforms raw SNIC data.
+    With memory_budget_mb > 0 the file is processed in bounded-size chunks.
+    """
+    if memory_budget_mb and os.path.exists(input_path):
+        logging.info(f"Cargando datos crudos desde {input_path}...")
+        return transform_data_chunked(input_path, output_path, memory_budget_mb)
+
+    df = transform_to_frame(input_path)
+    if df is None:
+        return False
+
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    df.to_csv(output_path, index=False, encoding='utf-8-sig')
+    with step('transform.write_csv', rows_in=len(df)) as record:
+        df.to_csv(output_path, index=False, encoding='utf-8-sig')
+        record['bytes_written'] = os.path.getsize(output_path)
     logging.info(f"Datos procesados guardados en {output_path}")
     return True
 
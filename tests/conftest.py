@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Modules in src/ import each other by bare name (as when run with `python src/...`
+# or `streamlit run src/app.py`), so src/ must be importable from the tests too.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
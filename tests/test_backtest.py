@@ -0,0 +1,59 @@
+import pytest
+import os
+import shutil
+import pandas as pd
+from src.backtest import run_backtest, evaluate_fold, grain_matrix
+
+TEST_CACHE = "tests/data/.cache/backtest"
+
+@pytest.fixture
+def clean_cache():
+    if os.path.exists(TEST_CACHE):
+        shutil.rmtree(TEST_CACHE)
+    yield
+    if os.path.exists(TEST_CACHE):
+        shutil.rmtree(TEST_CACHE)
+
+def create_sample_df():
+    rows = []
+    for i, year in enumerate(range(2010, 2020)):
+        rows.append({'anio': year, 'provincia_nombre': 'Salta', 'codigo_delito_snic_nombre': 'Robos', 'cantidad_hechos': 100 + 10 * i})
+        rows.append({'anio': year, 'provincia_nombre': 'Jujuy', 'codigo_delito_snic_nombre': 'Robos', 'cantidad_hechos': 200 - 5 * i})
+    return pd.DataFrame(rows)
+
+def test_backtest_scores_models(clean_cache):
+    report, errors, stats = run_backtest(create_sample_df(), horizon=2, workers=2, cache_dir=TEST_CACHE)
+
+    by_model = report[report['grano'] == 'provincia'].set_index('modelo')
+    # Linear series: trend models are exact, the naive baseline is not
+    assert by_model.loc['lineal', 'MAE'] == pytest.approx(0, abs=1e-6)
+    assert by_model.loc['polinomial', 'MAE'] == pytest.approx(0, abs=1e-6)
+    assert by_model.loc['naive', 'MAE'] > 0
+    # Origins 2012..2018, 2 provinces, horizon 2 (1 step for the last origin)
+    assert by_model.loc['naive', 'folds'] == 7
+    assert by_model.loc['naive', 'predicciones'] == 2 * (6 * 2 + 1)
+    assert stats['folds_calculados'] == stats['folds']
+
+    # Second run is served from the fold cache
+    report_cached, _, stats_cached = run_backtest(create_sample_df(), horizon=2, workers=2, cache_dir=TEST_CACHE)
+    assert stats_cached['folds_en_cache'] == stats_cached['folds']
+    pd.testing.assert_frame_equal(report, report_cached)
+
+def test_fold_skips_series_not_observed_at_origin():
+    df = create_sample_df()
+    df = df[~((df['provincia_nombre'] == 'Jujuy') & (df['anio'] == 2014))]
+    matrix = grain_matrix(df, ['provincia_nombre'])
+
+    errors, fitted = evaluate_fold('naive', 'provincia', matrix, origin_idx=4, horizon=1, cache_dir=None)
+    assert fitted == 1
+    assert errors['real'].tolist() == [150]
+
+def test_fold_cache_is_invalidated_by_model_changes(clean_cache, monkeypatch):
+    import src.backtest as backtest
+    matrix = grain_matrix(create_sample_df(), ['provincia_nombre'])
+    evaluate_fold('lineal', 'provincia', matrix, origin_idx=6, horizon=1, cache_dir=TEST_CACHE)
+    assert evaluate_fold('lineal', 'provincia', matrix, origin_idx=6, horizon=1, cache_dir=TEST_CACHE)[1] is None
+
+    # New implementation of the model: its cached folds no longer apply
+    monkeypatch.setattr(backtest, 'forecaster_version', lambda model: "otra-version")
+    assert evaluate_fold('lineal', 'provincia', matrix, origin_idx=6, horizon=1, cache_dir=TEST_CACHE)[1] == 2
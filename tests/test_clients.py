@@ -0,0 +1,65 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from src import clients
+from src.clients import http_session, reset_clients, HTTP_TIMEOUT
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """Answers 503 to the first N requests, then 200."""
+    protocol_version = "HTTP/1.1"
+    failures_remaining = 0
+    requests_seen = 0
+
+    def do_GET(self):
+        FlakyHandler.requests_seen += 1
+        status = 503 if FlakyHandler.failures_remaining > 0 else 200
+        FlakyHandler.failures_remaining -= 1
+        body = b"ok"
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def http_server(monkeypatch):
+    monkeypatch.setattr(clients, 'HTTP_BACKOFF', 0)
+    reset_clients()
+    FlakyHandler.failures_remaining = 0
+    FlakyHandler.requests_seen = 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FlakyHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+    reset_clients()
+
+def test_session_is_shared_until_reset():
+    reset_clients()
+    session = http_session()
+    assert http_session() is session
+    reset_clients()
+    assert http_session() is not session
+
+def test_session_retries_server_errors(http_server):
+    FlakyHandler.failures_remaining = 2
+
+    response = http_session().get(http_server)
+
+    assert response.status_code == 200
+    assert FlakyHandler.requests_seen == 3
+
+def test_session_applies_default_timeout(http_server, monkeypatch):
+    seen = {}
+    original = clients.requests.Session.request
+
+    def spy(self, method, url, **kwargs):
+        seen['timeout'] = kwargs.get('timeout')
+        return original(self, method, url, **kwargs)
+    monkeypatch.setattr(clients.requests.Session, 'request', spy)
+
+    http_session().get(http_server)
+    assert seen['timeout'] == HTTP_TIMEOUT
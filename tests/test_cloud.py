@@ -1,16 +1,19 @@
 import pytest
 import pandas as pd
 from unittest.mock import patch, MagicMock
-from src.load import load_data, upload_to_gcs, upload_to_bigquery
+from src.load import load_data, load_dataframe, upload_to_gcs, upload_to_bigquery, upload_files_to_gcs, file_checksums
+from src.load import GCS_CHUNK_SIZE, UPLOADED, SKIPPED, partition_hashes
+from google.api_core.exceptions import NotFound
 import os
+import shutil
 
 TEST_INPUT = "tests/data/processed/snic_clean.csv"
 TEST_OUTPUT = "tests/data/final/snic_analytics.parquet"
 
 @pytest.fixture
 def mock_clients():
-    with patch('src.load.storage.Client') as mock_storage, \
-         patch('src.load.bigquery.Client') as mock_bq:
+    with patch('src.load.storage_client') as mock_storage, \
+         patch('src.load.bigquery_client') as mock_bq:
         yield mock_storage, mock_bq
 
 @pytest.fixture
@@ -30,13 +33,15 @@ def test_upload_to_gcs_success(mock_clients):
     mock_blob = MagicMock()
     mock_storage.return_value.bucket.return_value = mock_bucket
     mock_bucket.blob.return_value = mock_blob
+    # Blob not in the bucket yet
+    mock_bucket.get_blob.return_value = None
     
     result = upload_to_gcs("dummy_path", "test-bucket", "dest_blob")
     
     assert result is True
     mock_storage.return_value.bucket.assert_called_with("test-bucket")
-    mock_bucket.blob.assert_called_with("dest_blob")
-    mock_blob.upload_from_filename.assert_called_with("dummy_path")
+    mock_bucket.blob.assert_called_with("dest_blob", chunk_size=GCS_CHUNK_SIZE)
+    mock_blob.upload_from_filename.assert_called_with("dummy_path", checksum="crc32c")
 
 def test_upload_to_bigquery_success(mock_clients):
     _, mock_bq = mock_clients
@@ -70,3 +75,157 @@ def test_load_data_with_cloud(mock_getenv, mock_clients, clean_test_files):
     mock_storage, mock_bq = mock_clients
     mock_storage.return_value.bucket.assert_called()
     mock_bq.return_value.load_table_from_dataframe.assert_called()
+
+@patch('os.getenv')
+def test_load_dataframe_partitioned_uploads_each_file(mock_getenv, mock_clients):
+    def getenv_side_effect(key, default=None):
+        if key == "GCS_BUCKET_NAME": return "my-bucket"
+        return default
+    mock_getenv.side_effect = getenv_side_effect
+
+    df = pd.DataFrame({'anio': [2022, 2023], 'provincia_nombre': ['Salta', 'Salta'], 'cantidad_hechos': [1, 2]})
+    result = load_dataframe(df, TEST_OUTPUT, partitioned=True)
+
+    assert result is True
+    mock_storage, _ = mock_clients
+    blob_names = [c.args[0] for c in mock_storage.return_value.bucket.return_value.blob.call_args_list]
+    assert sorted(blob_names) == [
+        "snic_analytics/anio=2022/provincia_nombre=Salta/part-0.parquet",
+        "snic_analytics/anio=2023/provincia_nombre=Salta/part-0.parquet",
+    ]
+    shutil.rmtree(os.path.splitext(TEST_OUTPUT)[0])
+
+def test_upload_files_skips_unchanged_blobs(mock_clients, tmp_path):
+    mock_storage, _ = mock_clients
+    unchanged, changed = tmp_path / "a.parquet", tmp_path / "b.parquet"
+    unchanged.write_bytes(b"same bytes")
+    changed.write_bytes(b"new bytes")
+    md5, crc32c = file_checksums(str(unchanged))
+
+    def get_blob(name):
+        blob = MagicMock(size=len(b"same bytes"), md5_hash=md5, crc32c=crc32c)
+        return blob if name == "a.parquet" else None
+    bucket = mock_storage.return_value.bucket.return_value
+    bucket.get_blob.side_effect = get_blob
+
+    counts = upload_files_to_gcs([str(unchanged), str(changed)], "my-bucket", str(tmp_path), workers=2)
+
+    assert counts[UPLOADED] == 1 and counts[SKIPPED] == 1
+    # One client lookup shared by every upload
+    mock_storage.assert_called_once()
+    assert [c.args[0] for c in bucket.blob.call_args_list] == ["b.parquet"]
+
+def test_partition_hashes_ignore_row_order():
+    df = pd.DataFrame({'anio': [2022, 2022, 2023], 'cantidad_hechos': [1, 2, 3]})
+    reordered = df.iloc[[1, 0, 2]].reset_index(drop=True)
+    changed = df.assign(cantidad_hechos=[1, 2, 4])
+
+    assert partition_hashes(df) == partition_hashes(reordered)
+    assert partition_hashes(df)['2022'] == partition_hashes(changed)['2022']
+    assert partition_hashes(df)['2023'] != partition_hashes(changed)['2023']
+
+def test_incremental_bigquery_load_sends_changed_years(mock_clients, tmp_path):
+    _, mock_bq = mock_clients
+    client = mock_bq.return_value
+    client.project = "test-project"
+    manifest = str(tmp_path / "bq_partitions.json")
+    df = pd.DataFrame({'anio': [2022, 2023, 2024], 'cantidad_hechos': [1, 2, 3]})
+
+    # First load: no table yet, whole frame partitioned by anio
+    client.get_table.side_effect = NotFound("snic")
+    assert upload_to_bigquery(df, "ds", "snic", mode="incremental", manifest_path=manifest) is True
+    args, kwargs = client.load_table_from_dataframe.call_args
+    assert args[1] == "test-project.ds.snic"
+    assert kwargs['job_config'].range_partitioning.field == 'anio'
+    client.get_table.side_effect = None
+    client.get_table.return_value.range_partitioning.field = 'anio'
+
+    # Only 2024 changed; 2022 is gone
+    client.load_table_from_dataframe.reset_mock()
+    df = pd.DataFrame({'anio': [2023, 2024], 'cantidad_hechos': [2, 30]})
+    upload_to_bigquery(df, "ds", "snic", mode="incremental", manifest_path=manifest)
+    destinations = [c.args[1] for c in client.load_table_from_dataframe.call_args_list]
+    assert destinations == ["test-project.ds.snic$2024"]
+    assert "IN (2022)" in client.query.call_args.args[0]
+
+    # Nothing changed: no load jobs
+    client.load_table_from_dataframe.reset_mock()
+    upload_to_bigquery(df, "ds", "snic", mode="incremental", manifest_path=manifest)
+    client.load_table_from_dataframe.assert_not_called()
+
+def test_unpartitioned_table_is_migrated_before_first_load(mock_clients, tmp_path):
+    _, mock_bq = mock_clients
+    client = mock_bq.return_value
+    client.project = "test-project"
+    # Table created by the old full load, no local manifest (fresh machine)
+    client.get_table.return_value.range_partitioning = None
+    df = pd.DataFrame({'anio': [2022, 2023], 'cantidad_hechos': [1, 2]})
+
+    assert upload_to_bigquery(df, "ds", "snic", mode="incremental", manifest_path=str(tmp_path / "m.json")) is True
+    migration = client.query.call_args_list[0].args[0]
+    assert migration.startswith("CREATE OR REPLACE TABLE `test-project.ds.snic`")
+    assert "PARTITION BY RANGE_BUCKET(anio" in migration
+    # Then the whole frame is loaded into the partitioned table
+    args, kwargs = client.load_table_from_dataframe.call_args
+    assert args[1] == "test-project.ds.snic"
+    assert kwargs['job_config'].range_partitioning.field == 'anio'
+
+# --- GCS upload against a local fake GCS server ---
+@pytest.fixture
+def gcs_emulator(monkeypatch):
+    """
+    Storage client on a local fake GCS server: the one in STORAGE_EMULATOR_HOST (e.g.
+    fake-gcs-server), or an in-process gcp-storage-emulator. Skipped if neither is available.
+    """
+    import socket
+    import uuid
+    from urllib.parse import urlparse
+    from google.auth.credentials import AnonymousCredentials
+    from google.cloud import storage
+
+    server = None
+    host = os.getenv("STORAGE_EMULATOR_HOST")
+    if host:
+        url = urlparse(host if "://" in host else f"http://{host}")
+        try:
+            socket.create_connection((url.hostname, url.port or 80), timeout=1).close()
+        except OSError:
+            pytest.skip(f"Servidor GCS local no disponible en {host}")
+    else:
+        emulator = pytest.importorskip("gcp_storage_emulator.server")
+        with socket.socket() as s:
+            s.bind(("localhost", 0))
+            port = s.getsockname()[1]
+        server = emulator.create_server("localhost", port, in_memory=True)
+        server.start()
+        host = f"http://localhost:{port}"
+
+    monkeypatch.setenv("STORAGE_EMULATOR_HOST", host)
+    client = storage.Client(project="snic-test", credentials=AnonymousCredentials())
+    bucket = client.create_bucket(f"snic-test-{uuid.uuid4().hex[:8]}")
+    monkeypatch.setattr('src.load.storage_client', lambda: client)
+    yield bucket
+    if server is not None:
+        server.stop()
+
+def test_gcs_upload_skips_unchanged_files_on_fake_server(gcs_emulator, tmp_path, monkeypatch):
+    # Smallest resumable chunk, so the larger file goes up in several chunks
+    monkeypatch.setattr('src.load.GCS_CHUNK_SIZE', 256 * 1024)
+    final = tmp_path / "final"
+    final.mkdir()
+    small, large = final / "small.parquet", final / "large.parquet"
+    small.write_bytes(b"a" * 1000)
+    large.write_bytes(os.urandom(600 * 1024))
+    files = [str(small), str(large)]
+
+    assert upload_files_to_gcs(files, gcs_emulator.name, str(tmp_path), workers=2) == {UPLOADED: 2, SKIPPED: 0, 'failed': 0}
+    blob = gcs_emulator.get_blob("final/large.parquet")
+    assert blob.size == 600 * 1024
+    assert blob.crc32c == file_checksums(str(large))[1]
+
+    # Unchanged files are recognised by the checksums the server reports
+    assert upload_files_to_gcs(files, gcs_emulator.name, str(tmp_path))[SKIPPED] == 2
+
+    small.write_bytes(b"b" * 1000)
+    assert upload_files_to_gcs(files, gcs_emulator.name, str(tmp_path)) == {UPLOADED: 1, SKIPPED: 1, 'failed': 0}
+    assert gcs_emulator.blob("final/small.parquet").download_as_bytes() == b"b" * 1000
@@ -0,0 +1,34 @@
+import pandas as pd
+from src.crimes import resolve_crime_names, DEFAULT_CATEGORY, DEFAULT_DESCRIPTION
+from src.cube import build_cube
+
+def test_resolve_crime_names_adds_dimension_attributes():
+    df = pd.DataFrame({
+        'codigo_delito_snic_nombre': pd.Categorical(['Homicidios dolosos', 'Ley de fauna', 'Homicidios dolosos', 'Delito nuevo']),
+        'cantidad_hechos': [1, 2, 3, 4],
+    })
+    df = resolve_crime_names(df)
+
+    assert list(df['codigo_delito_snic_nombre']) == ['Homicidios Dolosos', 'Ley Fauna', 'Homicidios Dolosos', 'Delito nuevo']
+    assert df.loc[0, 'descripcion_delito'] == "Muerte causada intencionalmente a otra persona."
+    assert list(df['categoria_delito']) == ['Homicidios', 'Seguridad y Orden Público', 'Homicidios', DEFAULT_CATEGORY]
+    assert df.loc[3, 'descripcion_delito'] == DEFAULT_DESCRIPTION
+    assert isinstance(df['categoria_delito'].dtype, pd.CategoricalDtype)
+
+def test_resolve_crime_names_is_idempotent():
+    df = resolve_crime_names(pd.DataFrame({'codigo_delito_snic_nombre': ['Ley de fauna']}))
+    again = resolve_crime_names(df.copy())
+    pd.testing.assert_frame_equal(df, again)
+
+def test_cube_grains_carry_crime_attributes():
+    df = pd.DataFrame({
+        'anio': [2022, 2023],
+        'provincia_nombre': ['Salta', 'Salta'],
+        'departamento_nombre': ['Capital', 'Capital'],
+        'codigo_delito_snic_nombre': ['Ley de fauna', 'Ley de fauna'],
+        'cantidad_hechos': [1, 2],
+        'cantidad_victimas': [0, 0],
+    })
+    cube = build_cube(resolve_crime_names(df))
+    assert cube['anio_delito']['categoria_delito'].tolist() == ['Seguridad y Orden Público'] * 2
+    assert 'categoria_delito' not in cube['anio_provincia'].columns
@@ -0,0 +1,48 @@
+import pytest
+import pandas as pd
+import os
+import shutil
+from src.cube import build_cube, write_cube, read_cube, GRAINS
+
+TEST_ROOT = "tests/data/final/snic_cube"
+
+@pytest.fixture
+def clean_test_dir():
+    if os.path.exists(TEST_ROOT):
+        shutil.rmtree(TEST_ROOT)
+    yield
+    if os.path.exists(TEST_ROOT):
+        shutil.rmtree(TEST_ROOT)
+
+def create_sample_df():
+    return pd.DataFrame({
+        'anio': [2022, 2022, 2022, 2023],
+        'provincia_nombre': ['Salta', 'Salta', 'Jujuy', 'Salta'],
+        'departamento_nombre': ['Capital', 'Orán', 'Capital', 'Capital'],
+        'codigo_delito_snic_nombre': ['Robos', 'Robos', 'Hurtos', 'Robos'],
+        'cantidad_hechos': [10, 20, 30, 40],
+        'cantidad_victimas': [1, 2, 3, 4]
+    })
+
+def test_build_cube_rollups():
+    cube = build_cube(create_sample_df())
+
+    assert set(cube) == set(GRAINS)
+    assert len(cube['base']) == 4
+    # Every grain preserves the totals
+    for frame in cube.values():
+        assert frame['cantidad_hechos'].sum() == 100
+
+    prov = cube['anio_provincia'].set_index(['anio', 'provincia_nombre'])['cantidad_hechos']
+    assert prov[(2022, 'Salta')] == 30
+    assert cube['anio'].set_index('anio')['cantidad_victimas'].to_dict() == {2022: 6, 2023: 4}
+
+def test_write_and_read_cube(clean_test_dir):
+    assert write_cube(create_sample_df(), TEST_ROOT) is True
+
+    cube = read_cube(TEST_ROOT)
+    assert len(cube['anio_provincia_delito']) == 3
+    assert isinstance(cube['base']['provincia_nombre'].dtype, pd.CategoricalDtype)
+
+def test_read_cube_missing(clean_test_dir):
+    assert read_cube(TEST_ROOT) is None
@@ -0,0 +1,105 @@
+import threading
+import pytest
+from src.dag import Stage, run_graph, select_stages, DONE, CACHED, FAILED, BLOCKED
+
+def create_graph(tmp_path, calls, fail=()):
+    """raw -> clean -> (cube, report) with files under tmp_path."""
+    raw, clean, cube = (str(tmp_path / name) for name in ('raw.csv', 'clean.csv', 'cube.csv'))
+
+    def step(name, source, target):
+        def fn(context):
+            calls.append(name)
+            if name in fail:
+                return False
+            with open(source) as f, open(target, 'w') as out:
+                out.write(f.read().upper())
+            return True
+        return fn
+
+    with open(raw, 'w') as f:
+        f.write("a,b\n")
+    return [
+        Stage('clean', step('clean', raw, clean), inputs=(raw,), outputs=(clean,)),
+        Stage('cube', step('cube', clean, cube), deps=('clean',), inputs=(clean,), outputs=(cube,)),
+        Stage('report', lambda ctx: calls.append('report') or True, deps=('clean',), cache=False),
+    ], raw
+
+def test_unchanged_stages_are_cached(tmp_path):
+    calls = []
+    stages, raw = create_graph(tmp_path, calls)
+    state = str(tmp_path / 'state.json')
+
+    assert set(r for r, _ in run_graph(stages, state_path=state).values()) == {DONE}
+    calls.clear()
+    results = run_graph(stages, state_path=state)
+    assert results['clean'][0] == CACHED and results['cube'][0] == CACHED
+    # Uncached stages always run
+    assert calls == ['report']
+
+    # New input content invalidates the stage; its dependents rerun only if their input changed
+    with open(raw, 'w') as f:
+        f.write("a,c\n")
+    calls.clear()
+    run_graph(stages, state_path=state)
+    assert sorted(calls) == ['clean', 'cube', 'report']
+
+def test_missing_output_reruns_stage(tmp_path):
+    calls = []
+    stages, _ = create_graph(tmp_path, calls)
+    state = str(tmp_path / 'state.json')
+    run_graph(stages, state_path=state)
+    (tmp_path / 'cube.csv').unlink()
+    calls.clear()
+    run_graph(stages, state_path=state)
+    assert sorted(calls) == ['cube', 'report']
+
+def test_failure_blocks_dependents_only(tmp_path):
+    calls = []
+    stages, _ = create_graph(tmp_path, calls, fail=('clean',))
+    stages.append(Stage('geometry', lambda ctx: True, cache=False))
+    results = run_graph(stages, state_path=str(tmp_path / 'state.json'))
+    assert results['clean'][0] == FAILED
+    assert results['cube'][0] == BLOCKED and results['report'][0] == BLOCKED
+    assert results['geometry'][0] == DONE
+
+def test_independent_stages_run_concurrently(tmp_path):
+    barrier = threading.Barrier(2, timeout=5)
+    # Each stage waits for the other: only passes if both run at the same time
+    stages = [Stage(name, lambda ctx: barrier.wait() is not None, cache=False) for name in ('gcs', 'bigquery')]
+    results = run_graph(stages, workers=2, state_path=str(tmp_path / 'state.json'))
+    assert {r for r, _ in results.values()} == {DONE}
+
+def test_from_and_only_selection(tmp_path):
+    calls = []
+    stages, _ = create_graph(tmp_path, calls)
+    assert select_stages(stages, start='clean') == ({'clean', 'cube', 'report'}, {'clean'})
+    assert select_stages(stages, only=['cube']) == ({'cube'}, {'cube'})
+    with pytest.raises(ValueError):
+        select_stages(stages, only=['unknown'])
+
+    state = str(tmp_path / 'state.json')
+    run_graph(stages, state_path=state)
+    calls.clear()
+    # --only forces the stage even if it is up to date; upstream is not run
+    run_graph(stages, only=['cube'], state_path=state)
+    assert calls == ['cube']
+
+def test_pipeline_cache_keys_cover_stage_code_and_settings():
+    from src.pipeline import STAGES
+    stages = {s.name: s for s in STAGES}
+    code = {name: {m.__name__ for m in s.code} for name, s in stages.items()}
+    # transform resolves geo IDs (dimensions) and writes through load/dataset
+    assert {'transform', 'dimensions', 'load', 'dataset'} <= code['transform']
+    assert 'SNIC_CHECKPOINT' in stages['transform'].params
+    assert 'load' in code['gcs_upload'] and 'load' in code['bigquery']
+
+def test_optional_stage_failure_does_not_fail_pipeline(monkeypatch):
+    import src.pipeline as pipeline
+    results = {s.name: (DONE, 0.0) for s in pipeline.STAGES}
+    monkeypatch.setattr(pipeline, 'finish_run', lambda: None)
+    monkeypatch.setattr(pipeline, 'run_graph', lambda *a, **k: dict(results))
+
+    results.update(geometry=(FAILED, 0.0), centroids=(FAILED, 0.0))
+    assert pipeline.run_pipeline() is True
+    results.update(cube=(FAILED, 0.0))
+    assert pipeline.run_pipeline() is False
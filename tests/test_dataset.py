@@ -0,0 +1,69 @@
+import pytest
+import pandas as pd
+import os
+import shutil
+from src.dataset import write_partitioned, read_partitioned, newest_output
+
+TEST_ROOT = "tests/data/final/snic_analytics"
+
+@pytest.fixture
+def clean_test_dir():
+    if os.path.exists(TEST_ROOT):
+        shutil.rmtree(TEST_ROOT)
+    yield
+    if os.path.exists(TEST_ROOT):
+        shutil.rmtree(TEST_ROOT)
+
+def create_sample_df():
+    return pd.DataFrame({
+        'anio': [2022, 2022, 2023, 2023],
+        'provincia_nombre': ['Córdoba', 'Salta', 'Córdoba', 'Salta'],
+        'codigo_delito_snic_nombre': ['Robos', 'Hurtos', 'Robos', 'Robos'],
+        'cantidad_hechos': [10, 20, 30, 40],
+        'cantidad_victimas': [1, 2, 3, 4]
+    })
+
+def test_write_partitioned_layout(clean_test_dir):
+    files = write_partitioned(create_sample_df(), TEST_ROOT)
+
+    assert len(files) == 4
+    assert all(os.path.exists(f) for f in files)
+    assert os.path.isdir(os.path.join(TEST_ROOT, "anio=2022"))
+    assert not os.path.exists(TEST_ROOT + ".tmp")
+
+def test_read_partitioned_prunes_and_keeps_schema(clean_test_dir):
+    write_partitioned(create_sample_df(), TEST_ROOT)
+
+    df_all = read_partitioned(TEST_ROOT)
+    assert len(df_all) == 4
+    assert df_all['anio'].dtype == 'int16'
+    assert isinstance(df_all['provincia_nombre'].dtype, pd.CategoricalDtype)
+
+    df = read_partitioned(TEST_ROOT, years=[2023], provinces=['Córdoba'])
+    assert df['cantidad_hechos'].tolist() == [30]
+
+    df = read_partitioned(TEST_ROOT, crimes=['Robos'], columns=['anio', 'cantidad_hechos'])
+    assert sorted(df['cantidad_hechos'].tolist()) == [10, 30, 40]
+    assert list(df.columns) == ['anio', 'cantidad_hechos']
+
+def test_write_partitioned_replaces_previous_dataset(clean_test_dir):
+    write_partitioned(create_sample_df(), TEST_ROOT)
+    write_partitioned(create_sample_df().query("anio == 2023"), TEST_ROOT)
+
+    assert read_partitioned(TEST_ROOT)['anio'].unique().tolist() == [2023]
+    # The previous dataset was moved aside during the swap and removed afterwards
+    assert not os.path.exists(TEST_ROOT + ".old")
+
+
+def test_newest_output_prefers_latest_write(tmp_path):
+    dataset, single = str(tmp_path / "snic_analytics"), str(tmp_path / "snic_analytics.parquet")
+    assert newest_output(dataset, single) is None
+
+    write_partitioned(create_sample_df(), dataset)
+    assert newest_output(dataset, single) == dataset
+
+    # A later single-file run wins over the partitioned dataset it left behind
+    create_sample_df().to_parquet(single, index=False)
+    later = max(os.path.getmtime(os.path.join(r, n)) for r, _, ns in os.walk(dataset) for n in ns) + 10
+    os.utime(single, (later, later))
+    assert newest_output(dataset, single) == single
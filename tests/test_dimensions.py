@@ -0,0 +1,26 @@
+import pandas as pd
+from src.dimensions import add_geo_ids, build_departments
+
+def test_add_geo_ids_keeps_source_codes():
+    df = pd.DataFrame({'provincia_id': [6], 'provincia_nombre': ['Buenos Aires'], 'departamento_id': [6028], 'departamento_nombre': ['Almirante Brown']})
+    assert add_geo_ids(df.copy())['departamento_id'].tolist() == [6028]
+
+def test_add_geo_ids_surrogates_distinguish_homonyms():
+    df = pd.DataFrame({
+        'provincia_nombre': ['Salta', 'Jujuy', 'Salta', 'Salta'],
+        'departamento_nombre': ['Capital', 'Capital', 'Orán', 'Capital'],
+    })
+    df = add_geo_ids(df)
+    ids = df['departamento_id'].tolist()
+    assert ids[0] == ids[3]
+    assert len(set(ids)) == 3
+    assert df['provincia_id'].nunique() == 2
+
+def test_build_departments_labels():
+    df = add_geo_ids(pd.DataFrame({
+        'provincia_nombre': pd.Categorical(['Salta', 'Jujuy', 'Salta']),
+        'departamento_nombre': pd.Categorical(['Capital', 'Capital', 'Capital']),
+    }))
+    departments = build_departments(df)
+    assert departments['etiqueta'].tolist() == ['Capital (Jujuy)', 'Capital (Salta)']
+    assert departments['departamento_id'].is_unique
@@ -0,0 +1,22 @@
+import io
+import pandas as pd
+from src.export import export_bytes, iter_csv_chunks
+
+def create_sample_df():
+    return pd.DataFrame({
+        'provincia_nombre': pd.Categorical(['Salta', 'Jujuy', 'Salta'] * 5),
+        'cantidad_hechos': range(15),
+    })
+
+def test_csv_export_in_chunks_matches_to_csv():
+    df = create_sample_df()
+    assert len(list(iter_csv_chunks(df, chunk_rows=4))) == 4
+    assert export_bytes(df, 'csv', chunk_rows=4) == df.to_csv(index=False).encode('utf-8')
+
+def test_parquet_export_round_trip():
+    df = create_sample_df()
+    restored = pd.read_parquet(io.BytesIO(export_bytes(df, 'parquet', chunk_rows=4)))
+    pd.testing.assert_frame_equal(restored, df, check_categorical=False)
+
+def test_empty_export_keeps_header():
+    assert export_bytes(create_sample_df().iloc[:0], 'csv') == b"provincia_nombre,cantidad_hechos\n"
@@ -1,7 +1,13 @@
 import pytest
 from unittest.mock import patch, mock_open
 import os
-from src.extract import download_data, generate_mock_data
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from src.extract import (
+    download_data, generate_mock_data, stream_download, download_if_changed,
+    DOWNLOAD_UPDATED, DOWNLOAD_NOT_MODIFIED, MANIFEST_SUFFIX
+)
 
 # Test data
 TEST_URL = "http://example.com/data.csv"
@@ -15,8 +21,9 @@ def clean_test_file():
     if os.path.exists(TEST_OUTPUT):
         os.remove(TEST_OUTPUT)
 
-@patch('requests.get')
-def test_download_data_success(mock_get, clean_test_file):
+@patch('src.extract.http_session')
+def test_download_data_success(mock_session, clean_test_file):
+    mock_get = mock_session.return_value.get
     # Mock successful response
     mock_get.return_value.status_code = 200
     mock_get.return_value.content = b"anio,province\n2022,Buenos Aires"
@@ -30,10 +37,11 @@ def test_download_data_success(mock_get, clean_test_file):
     assert "2022,Buenos Aires" in content
 
 @patch('src.extract.generate_mock_data')
-@patch('requests.get')
-def test_download_data_failure_fallback(mock_get, mock_generate_data, clean_test_file):
+@patch('src.extract.http_session')
+def test_download_data_failure_fallback(mock_session, mock_generate_data, clean_test_file):
     # Mock failed response
     import requests
+    mock_get = mock_session.return_value.get
     mock_get.side_effect = requests.exceptions.RequestException("Connection error")
     
     result = download_data(TEST_URL, TEST_OUTPUT)
@@ -41,3 +49,185 @@ def test_download_data_failure_fallback(mock_get, mock_generate_data, clean_test
     assert result is True
     # Verify fallback was called
     mock_generate_data.assert_called_once_with(TEST_OUTPUT)
+
+# --- Streaming download against a local HTTP server ---
+PAYLOAD = b"anio;provincia_nombre;cantidad_hechos\n" + b"2022;Buenos Aires;100\n" * 5000
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Serves PAYLOAD with Range and ETag support. Drops the first N connections halfway."""
+    drops_remaining = 0
+    ranges_seen = []
+    etag = '"v1"'
+
+    def do_GET(self):
+        range_header = self.headers.get('Range')
+        RangeHandler.ranges_seen.append(range_header)
+
+        if RangeHandler.etag and self.headers.get('If-None-Match') == RangeHandler.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        # If-Range with another version: the Range is ignored and the full body is sent
+        if range_header and self.headers.get('If-Range') not in (None, RangeHandler.etag):
+            range_header = None
+        start = int(range_header.split('=')[1].split('-')[0]) if range_header else 0
+        if start >= len(PAYLOAD):
+            self.send_response(416)
+            self.send_header('Content-Range', f"bytes */{len(PAYLOAD)}")
+            if RangeHandler.etag:
+                self.send_header('ETag', RangeHandler.etag)
+            self.end_headers()
+            return
+        body = PAYLOAD[start:]
+
+        self.send_response(206 if range_header else 200)
+        if range_header:
+            self.send_header('Content-Range', f"bytes {start}-{len(PAYLOAD) - 1}/{len(PAYLOAD)}")
+        self.send_header('Content-Length', str(len(body)))
+        if RangeHandler.etag:
+            self.send_header('ETag', RangeHandler.etag)
+        self.end_headers()
+
+        if RangeHandler.drops_remaining > 0:
+            RangeHandler.drops_remaining -= 1
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.connection.close()
+            return
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def http_server():
+    RangeHandler.drops_remaining = 0
+    RangeHandler.ranges_seen = []
+    RangeHandler.etag = '"v1"'
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/snic.csv"
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def clean_stream_files():
+    paths = (TEST_OUTPUT, TEST_OUTPUT + ".part", TEST_OUTPUT + ".part.json", TEST_OUTPUT + MANIFEST_SUFFIX)
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+    yield
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+def test_stream_download_writes_file_atomically(http_server, clean_stream_files):
+    stats = stream_download(http_server, TEST_OUTPUT, chunk_size=4096)
+
+    with open(TEST_OUTPUT, 'rb') as f:
+        assert f.read() == PAYLOAD
+    assert not os.path.exists(TEST_OUTPUT + ".part")
+    assert stats['bytes_transferred'] == len(PAYLOAD)
+    assert stats['throughput_mb_s'] >= 0
+
+def write_part(content, etag='"v1"'):
+    """A partial transfer left by an earlier run, with the validators it started from."""
+    os.makedirs(os.path.dirname(TEST_OUTPUT), exist_ok=True)
+    with open(TEST_OUTPUT + ".part", 'wb') as f:
+        f.write(content)
+    with open(TEST_OUTPUT + ".part.json", 'w') as f:
+        json.dump({'etag': etag, 'last_modified': None}, f)
+
+def test_stream_download_resumes_partial_file(http_server, clean_stream_files):
+    write_part(PAYLOAD[:1000])
+
+    stats = stream_download(http_server, TEST_OUTPUT)
+
+    with open(TEST_OUTPUT, 'rb') as f:
+        assert f.read() == PAYLOAD
+    assert RangeHandler.ranges_seen == ["bytes=1000-"]
+    assert stats['resumed_from'] == 1000 and stats['validated']
+    assert stats['bytes_transferred'] == len(PAYLOAD) - 1000
+    assert not os.path.exists(TEST_OUTPUT + ".part.json")
+
+def test_stream_download_restarts_when_source_changed(http_server, clean_stream_files):
+    # The partial file belongs to an older version: If-Range makes the server send it all
+    write_part(b"old content " * 100, etag='"v0"')
+
+    stats = stream_download(http_server, TEST_OUTPUT)
+
+    with open(TEST_OUTPUT, 'rb') as f:
+        assert f.read() == PAYLOAD
+    assert stats['resumed_from'] == 0 and stats['etag'] == '"v1"'
+
+def test_stream_download_without_part_validators_restarts(http_server, clean_stream_files):
+    os.makedirs(os.path.dirname(TEST_OUTPUT), exist_ok=True)
+    with open(TEST_OUTPUT + ".part", 'wb') as f:
+        f.write(b"unknown version")
+
+    stream_download(http_server, TEST_OUTPUT)
+
+    with open(TEST_OUTPUT, 'rb') as f:
+        assert f.read() == PAYLOAD
+    assert RangeHandler.ranges_seen == [None]
+
+def test_stream_download_complete_part_keeps_validators(http_server, clean_stream_files):
+    # 416 "already complete": the validators of the partial transfer are reported
+    write_part(PAYLOAD)
+
+    stats = stream_download(http_server, TEST_OUTPUT)
+
+    with open(TEST_OUTPUT, 'rb') as f:
+        assert f.read() == PAYLOAD
+    assert stats['etag'] == '"v1"' and stats['validated']
+
+def test_stream_download_retries_dropped_connection(http_server, clean_stream_files):
+    RangeHandler.drops_remaining = 1
+
+    stream_download(http_server, TEST_OUTPUT, chunk_size=1024, max_retries=2)
+
+    with open(TEST_OUTPUT, 'rb') as f:
+        assert f.read() == PAYLOAD
+    assert RangeHandler.ranges_seen[0] is None
+    assert RangeHandler.ranges_seen[1].startswith("bytes=")
+
+def test_download_if_changed_uses_etag(http_server, clean_stream_files):
+    assert download_if_changed(http_server, TEST_OUTPUT) == DOWNLOAD_UPDATED
+
+    with open(TEST_OUTPUT + MANIFEST_SUFFIX) as f:
+        manifest = json.load(f)
+    assert manifest['etag'] == '"v1"'
+    assert manifest['size'] == len(PAYLOAD)
+
+    # Second run: server answers 304 to the conditional request
+    assert download_if_changed(http_server, TEST_OUTPUT) == DOWNLOAD_NOT_MODIFIED
+    with open(TEST_OUTPUT, 'rb') as f:
+        assert f.read() == PAYLOAD
+
+def test_download_if_changed_falls_back_to_hash(http_server, clean_stream_files):
+    # Server without validators: unchanged content is detected by SHA-256
+    RangeHandler.etag = None
+
+    assert download_if_changed(http_server, TEST_OUTPUT) == DOWNLOAD_UPDATED
+    assert download_if_changed(http_server, TEST_OUTPUT) == DOWNLOAD_NOT_MODIFIED
+
+@pytest.mark.parametrize("expected_bytes, validated", [(len(PAYLOAD) + 10, True), (len(PAYLOAD), False)])
+def test_unverified_download_does_not_store_validators(clean_stream_files, expected_bytes, validated):
+    # Truncated file, or a resume that could not be matched to the original version
+    def fake_download(url, output_path, headers=None):
+        with open(output_path, 'wb') as f:
+            f.write(PAYLOAD)
+        return {'not_modified': False, 'etag': '"v1"', 'last_modified': None, 'validated': validated,
+                'bytes_transferred': len(PAYLOAD), 'total_bytes': len(PAYLOAD), 'expected_bytes': expected_bytes,
+                'elapsed_seconds': 1.0, 'throughput_mb_s': 0.0}
+
+    os.makedirs(os.path.dirname(TEST_OUTPUT), exist_ok=True)
+    with patch('src.extract.stream_download', side_effect=fake_download):
+        assert download_if_changed(TEST_URL, TEST_OUTPUT) == DOWNLOAD_UPDATED
+
+    with open(TEST_OUTPUT + MANIFEST_SUFFIX) as f:
+        manifest = json.load(f)
+    # Next run sends no conditional headers, so the file is fetched again in full
+    assert manifest['etag'] is None and manifest['last_modified'] is None
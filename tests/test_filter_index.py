@@ -0,0 +1,41 @@
+import pandas as pd
+import numpy as np
+from unittest.mock import patch
+from src.filter_index import FilterIndex
+
+def create_sample_df():
+    return pd.DataFrame({
+        'anio': [2022, 2022, 2023, 2023, 2023],
+        'provincia_nombre': pd.Categorical(['Salta', 'Jujuy', 'Salta', 'Jujuy', 'Salta']),
+        'codigo_delito_snic_nombre': ['Robos', 'Hurtos', 'Hurtos', 'Robos', 'Robos'],
+    })
+
+def expected_mask(df, year, provinces, crimes):
+    return ((df['anio'] == year) & df['provincia_nombre'].isin(provinces) & df['codigo_delito_snic_nombre'].isin(crimes)).to_numpy()
+
+def test_mask_matches_isin():
+    df = create_sample_df()
+    index = FilterIndex(df, ['anio', 'provincia_nombre', 'codigo_delito_snic_nombre'])
+
+    mask = index.mask({'anio': 2023, 'provincia_nombre': ['Salta'], 'codigo_delito_snic_nombre': ['Robos', 'Hurtos']})
+
+    np.testing.assert_array_equal(mask, expected_mask(df, 2023, ['Salta'], ['Robos', 'Hurtos']))
+
+def test_mask_full_and_empty_selection():
+    df = create_sample_df()
+    index = FilterIndex(df, ['provincia_nombre', 'codigo_delito_snic_nombre'])
+
+    # Selecting every value (or passing None) does not filter
+    assert index.mask({'provincia_nombre': ['Salta', 'Jujuy'], 'codigo_delito_snic_nombre': None}).all()
+    # Selecting nothing matches nothing, as isin([]) does
+    assert not index.mask({'codigo_delito_snic_nombre': []}).any()
+
+def test_high_cardinality_dimension_uses_row_ids():
+    df = create_sample_df()
+    with patch('src.filter_index.BITMAP_MAX_CARDINALITY', 1):
+        index = FilterIndex(df, ['anio', 'provincia_nombre'])
+
+    mask = index.mask({'anio': [2022], 'provincia_nombre': ['Jujuy']})
+
+    assert mask.tolist() == [False, True, False, False, False]
+    assert sorted(index.values('provincia_nombre')) == ['Jujuy', 'Salta']
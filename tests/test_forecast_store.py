@@ -0,0 +1,64 @@
+import pytest
+import os
+import shutil
+import pandas as pd
+from src.forecast_store import (
+    write_forecasts, read_forecasts, lookup_forecast, series_key, ALL
+)
+from src.model import train_and_predict
+
+TEST_ROOT = "tests/data/final/snic_forecasts"
+
+@pytest.fixture
+def clean_test_dir():
+    if os.path.exists(TEST_ROOT):
+        shutil.rmtree(TEST_ROOT)
+    yield
+    if os.path.exists(TEST_ROOT):
+        shutil.rmtree(TEST_ROOT)
+
+def create_sample_df():
+    rows = []
+    for i, year in enumerate(range(2016, 2024)):
+        rows.append({'anio': year, 'provincia_nombre': 'Salta', 'codigo_delito_snic_nombre': 'Robos', 'cantidad_hechos': 100 + 10 * i})
+        rows.append({'anio': year, 'provincia_nombre': 'Salta', 'codigo_delito_snic_nombre': 'Hurtos', 'cantidad_hechos': 50 + i * i})
+        rows.append({'anio': year, 'provincia_nombre': 'Jujuy', 'codigo_delito_snic_nombre': 'Robos', 'cantidad_hechos': 80 - i})
+    return pd.DataFrame(rows)
+
+def test_write_and_read_forecasts(clean_test_dir):
+    df = create_sample_df()
+    assert write_forecasts(df, TEST_ROOT, years_ahead=3)
+
+    forecasts, metadata = read_forecasts(TEST_ROOT)
+    assert metadata['horizonte_max'] == 3
+    # total + 2 provinces + 2 crimes + 3 province x crime series
+    assert metadata['series'] == 8
+    assert set(forecasts['horizonte']) == {1, 2, 3}
+    assert (forecasts['limite_inferior'] <= forecasts['limite_superior']).all()
+
+    # Stored forecasts match the live fit of the same series
+    for province, crime, mask in [
+        (ALL, ALL, slice(None)),
+        ('Salta', ALL, df['provincia_nombre'] == 'Salta'),
+        ('Jujuy', 'Robos', (df['provincia_nombre'] == 'Jujuy') & (df['codigo_delito_snic_nombre'] == 'Robos')),
+    ]:
+        ts = df[mask].groupby('anio')['cantidad_hechos'].sum().reset_index()
+        live, _ = train_and_predict(ts, 2)
+        stored = lookup_forecast(forecasts, province, crime, 2)
+        assert stored['anio'].tolist() == [2024, 2025]
+        assert stored['cantidad_hechos'].to_numpy() == pytest.approx(live['cantidad_hechos'].tail(2).to_numpy())
+
+def test_lookup_falls_back_for_uncovered_selections(clean_test_dir):
+    write_forecasts(create_sample_df(), TEST_ROOT, years_ahead=2)
+    forecasts, _ = read_forecasts(TEST_ROOT)
+
+    assert series_key(['Salta', 'Jujuy'], ['Salta', 'Jujuy']) == ALL
+    assert series_key(None, ['Salta', 'Jujuy']) == ALL
+    assert series_key(['Salta'], ['Salta', 'Jujuy', 'Chaco']) == 'Salta'
+    assert series_key(['Salta', 'Jujuy'], ['Salta', 'Jujuy', 'Chaco']) is None
+
+    assert lookup_forecast(forecasts, None, ALL, 2) is None
+    assert lookup_forecast(forecasts, 'Chaco', ALL, 2) is None
+    # Horizon beyond the precomputed one
+    assert lookup_forecast(forecasts, ALL, ALL, 3) is None
+    assert read_forecasts("tests/data/final/missing") is None
@@ -0,0 +1,65 @@
+import subprocess
+import sys
+import pytest
+import numpy as np
+import pandas as pd
+from src.forecasters import get_forecaster, available_forecasters, forecast_series, FORECASTERS
+from src.model import train_and_predict
+
+X = np.arange(10, dtype=float) - 4.5
+FUTURE = np.array([5.5, 6.5, 7.5])
+
+def test_registry_declares_cost_and_requirements():
+    for forecaster in FORECASTERS.values():
+        assert forecaster.cost > 0
+        assert forecaster.min_points >= 1
+    cheap = available_forecasters(max_cost=1)
+    assert [f.cost for f in cheap] == sorted(f.cost for f in cheap)
+    assert 'huber' not in [f.name for f in cheap]
+    assert 'cuadratico' not in [f.name for f in available_forecasters(n_points=4)]
+
+def test_models_with_missing_packages_are_not_offered(monkeypatch):
+    import dataclasses
+    huber = dataclasses.replace(FORECASTERS['huber'], requires=('paquete_inexistente',))
+    monkeypatch.setitem(FORECASTERS, 'huber', huber)
+    assert not huber.installed
+    assert 'huber' not in [f.name for f in available_forecasters()]
+    assert 'lineal' in [f.name for f in available_forecasters()]
+
+def test_trend_models_on_linear_series():
+    Y = np.vstack([100 + 10 * np.arange(10), 300 - 5 * np.arange(10)]).astype(float)
+    expected = np.array([[200, 210, 220], [250, 245, 240]])
+
+    for name in ('lineal', 'cuadratico', 'polinomial', 'holt'):
+        assert get_forecaster(name).predict(X, Y, FUTURE) == pytest.approx(expected), name
+    assert get_forecaster('naive').predict(X, Y, FUTURE)[:, 0].tolist() == [190, 255]
+
+    # The damped trend flattens the projection
+    damped = get_forecaster('holt_amortiguado').predict(X, Y, FUTURE)
+    assert np.all(np.diff(damped[0]) < 10) and np.all(damped[0] > 190)
+
+def test_missing_years_and_min_points():
+    Y = np.array([
+        [1, 2, np.nan, 4, 5, 6, 7, 8, 9, 10],
+        [np.nan] * 8 + [5, 6],
+    ], dtype=float)
+    preds = get_forecaster('holt').predict(X, Y, FUTURE)
+
+    assert preds[0] == pytest.approx([11, 12, 13])
+    assert np.isnan(preds[1]).all()
+
+def test_forecast_series_matches_default_model():
+    ts = pd.DataFrame({'anio': range(2015, 2024), 'cantidad_hechos': [5, 9, 14, 20, 22, 30, 31, 40, 41]})
+
+    default, error = forecast_series(ts, 2)
+    legacy, _ = train_and_predict(ts, 2)
+    assert error is None
+    pd.testing.assert_frame_equal(default, legacy)
+
+    naive, _ = forecast_series(ts, 2, 'naive')
+    assert naive['cantidad_hechos'].tail(2).tolist() == [41, 41]
+
+def test_sklearn_is_imported_lazily():
+    code = "import sys; sys.path.insert(0, 'src'); import forecasters; print('sklearn' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False"
@@ -0,0 +1,68 @@
+import pytest
+import os
+import json
+import shutil
+import numpy as np
+from src.geo import simplify_line, simplify_geojson, build_geometry, read_lod, lod_for_zoom, view_for, LODS, SOURCE_FILE
+
+TEST_ROOT = "tests/data/geo"
+
+@pytest.fixture
+def clean_test_dir():
+    if os.path.exists(TEST_ROOT):
+        shutil.rmtree(TEST_ROOT)
+    yield
+    if os.path.exists(TEST_ROOT):
+        shutil.rmtree(TEST_ROOT)
+
+def circle(lon, lat, radius, n=500):
+    t = np.linspace(0, 2 * np.pi, n)
+    ring = np.column_stack([lon + radius * np.cos(t), lat + radius * np.sin(t)]).tolist()
+    ring[-1] = ring[0]
+    return ring
+
+def create_sample_geojson():
+    return {'type': 'FeatureCollection', 'features': [
+        {'type': 'Feature', 'properties': {'id': '66', 'nombre': 'Salta', 'fuente': 'IGN'},
+         'geometry': {'type': 'MultiPolygon', 'coordinates': [[circle(-65, -25, 2)], [circle(-60, -25, 0.001, 20)]]}},
+        {'type': 'Feature', 'properties': {'id': '38', 'nombre': 'Jujuy'},
+         'geometry': {'type': 'Polygon', 'coordinates': [circle(-65.5, -23, 1)]}},
+    ]}
+
+def test_simplify_line_drops_collinear_points():
+    points = np.array([[0, 0], [1, 0.001], [2, 0], [3, 1]], dtype=float)
+    assert simplify_line(points, 0.01).tolist() == [[0, 0], [2, 0], [3, 1]]
+
+def test_simplify_geojson_reduces_and_quantizes():
+    out = simplify_geojson(create_sample_geojson(), tolerance=0.05, digits=2)
+    salta, jujuy = out['features']
+
+    # Tiny island collapses, properties are trimmed
+    assert len(salta['geometry']['coordinates']) == 1
+    assert salta['properties'] == {'id': '66', 'nombre': 'Salta'}
+    ring = jujuy['geometry']['coordinates'][0]
+    assert jujuy['geometry']['type'] == 'Polygon'
+    assert 4 <= len(ring) < 100
+    assert ring[0] == ring[-1]
+    assert all(round(x, 2) == x for x, _ in ring)
+
+def test_build_geometry_from_vendored_source(clean_test_dir):
+    os.makedirs(TEST_ROOT)
+    with open(os.path.join(TEST_ROOT, SOURCE_FILE), 'w') as f:
+        json.dump(create_sample_geojson(), f)
+
+    # The vendored file is used: no network access
+    assert build_geometry(url="http://invalid.localhost/none", root=TEST_ROOT)
+    sizes = [os.path.getsize(os.path.join(TEST_ROOT, f"provincias_{lod}.geojson")) for lod in LODS]
+    assert sizes == sorted(sizes)
+    assert [f['properties']['nombre'] for f in read_lod('low', TEST_ROOT)['features']] == ['Salta', 'Jujuy']
+
+def test_lod_and_view_selection():
+    assert lod_for_zoom(3) == 'low'
+    assert lod_for_zoom(7) == 'medium'
+    assert lod_for_zoom(10) == 'high'
+
+    center, zoom = view_for(create_sample_geojson(), {'Jujuy'})
+    assert center == pytest.approx({'lat': -23, 'lon': -65.5}, abs=0.01)
+    assert zoom > 5
+    assert view_for(create_sample_geojson(), {'Chaco'}) == (None, None)
@@ -0,0 +1,79 @@
+import json
+import pstats
+import pytest
+from src.instrument import step, profiled, start_run, finish_run
+from src.dag import Stage, run_graph, SKIPPED
+
+def test_steps_are_recorded_with_counters_and_parent(tmp_path):
+    report = start_run(options={'force': False})
+    with step('transform', bytes_read=100) as outer:
+        with step('transform.clean', rows_in=10) as inner:
+            inner['rows_out'] = 8
+        outer['rows_out'] = 8
+    path = finish_run(str(tmp_path))
+
+    data = json.loads(open(path, encoding='utf-8').read())
+    assert data['run_id'] == report.run_id and data['options'] == {'force': False}
+    steps = {s['name']: s for s in data['steps']}
+    assert steps['transform.clean']['parent'] == 'transform'
+    assert steps['transform.clean']['rows_in'] == 10 and steps['transform.clean']['rows_out'] == 8
+    assert steps['transform']['bytes_read'] == 100 and steps['transform']['bytes_written'] is None
+    for s in steps.values():
+        assert s['status'] == 'ok' and s['wall_seconds'] >= 0 and s['cpu_seconds'] >= 0
+        assert s['process_peak_rss_mb'] > 0
+
+def test_failed_step_is_marked_as_error(tmp_path):
+    start_run()
+    with pytest.raises(ValueError):
+        with step('load.write_parquet'):
+            raise ValueError("boom")
+    data = json.loads(open(finish_run(str(tmp_path)), encoding='utf-8').read())
+    assert data['steps'][0]['status'] == 'error'
+
+def test_step_cpu_time_excludes_other_threads(tmp_path):
+    import threading, time
+    stop = threading.Event()
+
+    def busy():
+        while not stop.is_set():
+            pass
+
+    start_run()
+    worker = threading.Thread(target=busy)
+    worker.start()
+    try:
+        with step('idle') as record:
+            time.sleep(0.3)
+    finally:
+        stop.set()
+        worker.join()
+    finish_run(str(tmp_path))
+    # A stage running alongside does not count as this step's CPU
+    assert record['cpu_seconds'] < 0.1
+
+def test_profiled_dumps_stats(tmp_path):
+    with profiled('cube', root=str(tmp_path)) as path:
+        sum(range(1000))
+    assert pstats.Stats(path).total_calls > 0
+
+def test_graph_stages_are_instrumented_and_profiled(tmp_path, monkeypatch):
+    # src.dag imports instrument by bare name: record into the same module as the report
+    monkeypatch.setattr('src.dag.step', step)
+    monkeypatch.setattr('src.dag.profiled', profiled)
+    monkeypatch.setattr('src.instrument.PROFILE_DIR', str(tmp_path / 'profiles'))
+    output = tmp_path / 'out.csv'
+    stages = [
+        Stage('write', lambda ctx: output.write_text("a,b\n") > 0, outputs=(str(output),)),
+        Stage('broken', lambda ctx: False, cache=False),
+        Stage('upload', lambda ctx: SKIPPED, deps=('write',), inputs=(str(output),), cache=False),
+    ]
+    report = start_run()
+    run_graph(stages, state_path=str(tmp_path / 'state.json'), profile=['write'])
+    data = json.loads(open(finish_run(str(tmp_path)), encoding='utf-8').read())
+
+    steps = {s['name']: s for s in data['steps']}
+    assert steps['write']['result'] == 'ok' and steps['write']['bytes_written'] == 4
+    assert steps['broken']['status'] == 'error'
+    # A stage with nothing to do reads nothing, even with existing inputs
+    assert steps['upload']['result'] == SKIPPED and steps['upload']['bytes_read'] == 0
+    assert (tmp_path / 'profiles' / report.run_id / 'write.prof').exists()
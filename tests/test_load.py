@@ -1,7 +1,8 @@
 import pytest
 import pandas as pd
 import os
-from src.load import load_data
+from src.load import load_data, load_dataframe, write_local_chunks, local_target
+from src.dataset import read_partitioned
 
 # Test data
 TEST_INPUT = "tests/data/processed/snic_clean.csv"
@@ -45,3 +46,32 @@ def test_load_data_success(clean_test_files):
 def test_load_data_missing_input(clean_test_files):
     result = load_data("non_existent_file.csv", TEST_OUTPUT)
     assert result is False
+
+def test_load_dataframe_in_memory(clean_test_files):
+    df = pd.DataFrame({'anio': [2022, 2023], 'provincia_nombre': ['Salta', 'Jujuy'], 'cantidad_hechos': [1, 2]})
+
+    result = load_dataframe(df, TEST_OUTPUT)
+
+    assert result is True
+    df_out = pd.read_parquet(TEST_OUTPUT)
+    assert df_out['cantidad_hechos'].tolist() == [1, 2]
+    # Compact schema survives the Parquet round trip
+    assert df_out['anio'].dtype == 'int16'
+    assert isinstance(df_out['provincia_nombre'].dtype, pd.CategoricalDtype)
+
+@pytest.mark.parametrize("partitioned", [False, True])
+def test_write_local_chunks_streams_all_chunks(tmp_path, partitioned):
+    # Chunks with different category sets (and dictionary index widths) share one output
+    chunks = [
+        pd.DataFrame({'anio': [2022, 2022], 'provincia_nombre': ['Salta', 'Jujuy'], 'cantidad_hechos': [1, 2]}),
+        pd.DataFrame({'anio': [2023] * 200, 'provincia_nombre': [f"P{i}" for i in range(200)], 'cantidad_hechos': [3] * 200}),
+    ]
+    output = str(tmp_path / "snic_analytics.parquet")
+
+    files = write_local_chunks(iter(chunks), output, partitioned)
+
+    assert files and not os.path.exists(output + ".tmp")
+    target = local_target(output, partitioned)
+    df = read_partitioned(target) if partitioned else pd.read_parquet(target)
+    assert len(df) == 202 and df['cantidad_hechos'].sum() == 603
+    assert {'Salta', 'Jujuy', 'P199'} <= set(df['provincia_nombre'].astype(str))
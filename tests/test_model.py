@@ -0,0 +1,75 @@
+import pytest
+import numpy as np
+import pandas as pd
+from src.model import forecast_matrix, forecast_all, train_and_predict
+
+def reference_forecast(years, values, years_ahead):
+    degree = 2 if len(years) >= 5 else 1
+    coef = np.polyfit(np.array(years, dtype=float) - 2000, values, degree)
+    future = np.arange(max(years) + 1, max(years) + years_ahead + 1) - 2000
+    return np.maximum(np.polyval(coef, future), 0)
+
+def test_forecast_matrix_matches_per_series_fits():
+    rng = np.random.default_rng(0)
+    years = list(range(2010, 2024))
+    matrix = pd.DataFrame(rng.integers(0, 1000, (50, len(years))).astype(float), columns=years)
+    matrix.index.name = 'serie'
+    # Gaps, short series (linear) and too-short series (skipped)
+    matrix.iloc[0, [1, 4, 7]] = np.nan
+    matrix.iloc[1, 4:] = np.nan
+    matrix.iloc[2, 2:] = np.nan
+
+    result = forecast_matrix(matrix, years_ahead=3)
+
+    assert 2 not in set(result['serie'])
+    for serie in (0, 1, 10):
+        row = matrix.loc[serie].dropna()
+        expected = reference_forecast(list(row.index), row.values, 3)
+        got = result[result['serie'] == serie]
+        assert got['anio'].tolist() == [row.index.max() + h for h in (1, 2, 3)]
+        assert got['cantidad_hechos'].to_numpy() == pytest.approx(expected, rel=1e-6, abs=1e-6)
+
+def test_forecast_all_clips_at_zero():
+    df = pd.DataFrame({
+        'provincia_nombre': ['Salta'] * 5 + ['Jujuy'] * 5,
+        'codigo_delito_snic_nombre': ['Robos'] * 10,
+        'anio': list(range(2019, 2024)) * 2,
+        'cantidad_hechos': [100, 80, 60, 40, 20, 10, 20, 30, 40, 50],
+    })
+    result = forecast_all(df, years_ahead=2)
+
+    salta = result[result['provincia_nombre'] == 'Salta']['cantidad_hechos'].tolist()
+    jujuy = result[result['provincia_nombre'] == 'Jujuy']['cantidad_hechos'].tolist()
+    assert salta == [pytest.approx(0.0), pytest.approx(0.0)]
+    assert jujuy == pytest.approx([60, 70])
+
+def test_train_and_predict_single_series():
+    ts = pd.DataFrame({'anio': [2020, 2021, 2022, 2023], 'cantidad_hechos': [10, 20, 30, 40]})
+    result, error = train_and_predict(ts, years_ahead=2)
+
+    assert error is None
+    pred = result[result['tipo'] == 'Predicción']
+    assert pred['anio'].tolist() == [2024, 2025]
+    assert pred['cantidad_hechos'].tolist() == pytest.approx([50, 60])
+
+    _, error = train_and_predict(ts.head(2))
+    assert error is not None
+
+def test_bootstrap_intervals_reproducible_and_bracketing():
+    rng = np.random.default_rng(1)
+    ts = pd.DataFrame({'anio': range(2004, 2024), 'cantidad_hechos': 500 + 10 * np.arange(20) + rng.normal(0, 30, 20)})
+
+    first, _ = train_and_predict(ts, years_ahead=3, intervals=True, n_boot=500, seed=42)
+    second, _ = train_and_predict(ts, years_ahead=3, intervals=True, n_boot=500, seed=42)
+    pred = first[first['tipo'] == 'Predicción']
+
+    pd.testing.assert_frame_equal(first, second)
+    assert (pred['limite_inferior'] < pred['cantidad_hechos']).all()
+    assert (pred['cantidad_hechos'] < pred['limite_superior']).all()
+    # Roughly +-1.645 residual standard deviations for a 90% interval
+    width = (pred['limite_superior'] - pred['limite_inferior']).iloc[0]
+    assert 60 < width < 200
+
+    point_only, _ = train_and_predict(ts, years_ahead=3)
+    assert 'limite_inferior' not in point_only.columns
+    assert point_only['cantidad_hechos'].tail(3).to_numpy() == pytest.approx(pred['cantidad_hechos'].to_numpy())
@@ -0,0 +1,72 @@
+import pandas as pd
+import pytest
+from src.population import add_rates, add_group_rates, province_population, PROVINCIA_POBLACION
+from src.cube import build_cube
+
+def test_add_rates_categorical_and_aliases():
+    df = pd.DataFrame({
+        'provincia_nombre': pd.Categorical(['Salta', 'Tierra del Fuego, Antártida e Islas del Atlántico Sur', 'Desconocida', 'Salta']),
+        'cantidad_hechos': [100, 50, 10, 0],
+        'cantidad_victimas': [10, 5, 1, 0],
+    })
+    add_rates(df)
+
+    assert df['tasa_hechos'].iloc[0] == pytest.approx(100 / PROVINCIA_POBLACION['Salta'] * 100000)
+    assert df['tasa_hechos'].iloc[1] == pytest.approx(50 / PROVINCIA_POBLACION['Tierra del Fuego'] * 100000)
+    # Missing population gives a 0 rate
+    assert df['tasa_hechos'].iloc[2] == 0
+    assert df['tasa_victimas'].iloc[3] == 0
+
+def test_add_rates_multiple_keys():
+    df = pd.DataFrame({
+        'provincia_nombre': ['Salta', 'Salta'],
+        'departamento_nombre': ['Capital', 'Orán'],
+        'cantidad_hechos': [10, 20],
+    })
+    population = pd.DataFrame({'provincia_nombre': ['Salta'], 'departamento_nombre': ['Orán'], 'poblacion': [200000]})
+    add_rates(df, keys=['provincia_nombre', 'departamento_nombre'], population=population)
+
+    assert df['tasa_hechos'].tolist() == [0, 10]
+
+def test_cube_rates_sum_to_province_rate():
+    df = pd.DataFrame({
+        'anio': [2022, 2022, 2022],
+        'provincia_nombre': ['Salta', 'Salta', 'Jujuy'],
+        'departamento_nombre': ['Capital', 'Orán', 'Capital'],
+        'codigo_delito_snic_nombre': ['Robos', 'Hurtos', 'Robos'],
+        'cantidad_hechos': [10, 20, 30],
+        'cantidad_victimas': [1, 2, 3],
+    })
+    cube = build_cube(df)
+
+    # Per-crime rates add up to the province rate (population is constant within a province)
+    by_crime = cube['anio_provincia_delito'].groupby('provincia_nombre', observed=True)['tasa_hechos'].sum()
+    by_prov = cube['anio_provincia'].set_index('provincia_nombre')['tasa_hechos']
+    assert by_crime['Salta'] == pytest.approx(by_prov['Salta'])
+    assert by_prov['Salta'] == pytest.approx(30 / PROVINCIA_POBLACION['Salta'] * 100000)
+    assert cube['base']['tasa_hechos'].sum() == pytest.approx(cube['anio_provincia']['tasa_hechos'].sum())
+    assert 'tasa_hechos' not in cube['anio']
+
+def test_province_population_table():
+    table = province_population()
+    assert table['provincia_nombre'].is_unique
+    assert len(table) == len(PROVINCIA_POBLACION) + 1
+
+def test_group_rates_with_department_population():
+    rows = pd.DataFrame({
+        'anio': [2022, 2022, 2022],
+        'provincia_nombre': ['Salta', 'Salta', 'Salta'],
+        'departamento_nombre': ['Capital', 'Orán', 'Cafayate'],
+        'cantidad_hechos': [10, 20, 5],
+    })
+    population = pd.DataFrame({
+        'provincia_nombre': ['Salta', 'Salta'],
+        'departamento_nombre': ['Capital', 'Orán'],
+        'poblacion': [600000, 200000],
+    })
+    result = rows.groupby('anio')[['cantidad_hechos']].sum().reset_index()
+    result = add_group_rates(result, rows, ['anio'], keys=['provincia_nombre', 'departamento_nombre'], population=population)
+
+    # Cafayate has no population: left out of counts and population
+    assert result['tasa_hechos'].iloc[0] == pytest.approx(30 / 800000 * 100000)
+    assert result['cantidad_hechos'].iloc[0] == 35
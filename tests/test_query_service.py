@@ -0,0 +1,108 @@
+import pandas as pd
+import pytest
+from src.cube import build_cube
+from src.population import PROVINCIA_POBLACION
+from src.filter_index import FilterIndex
+from src.query_service import QueryService, SelectionKey, _size_of
+
+def create_service(max_bytes=10 * 1024 * 1024):
+    df = pd.DataFrame({
+        'anio': [2022, 2022, 2023, 2023],
+        'provincia_nombre': ['Salta', 'Jujuy', 'Salta', 'Salta'],
+        'departamento_nombre': ['Capital', 'Capital', 'Orán', 'Capital'],
+        'codigo_delito_snic_nombre': ['Robos', 'Robos', 'Hurtos', 'Robos'],
+        'cantidad_hechos': [10, 20, 30, 40],
+        'cantidad_victimas': [1, 2, 3, 4]
+    })
+    frames = build_cube(df)
+    indexes = {name: FilterIndex(frame, [d for d in ['anio', 'provincia_nombre', 'codigo_delito_snic_nombre', 'departamento_id'] if d in frame.columns])
+               for name, frame in frames.items()}
+    return QueryService(frames, indexes, max_bytes=max_bytes)
+
+def test_selection_key_is_normalized():
+    a = SelectionKey.from_selection(2023, ['Salta', 'Jujuy'], ['Robos'], [])
+    b = SelectionKey.from_selection(2023, ['Jujuy', 'Salta', 'Salta'], ['Robos'], None)
+    assert a == b
+    assert a.without_year().year is None
+
+def test_query_aggregates_and_counts_hits():
+    qs = create_service()
+    sel = SelectionKey.from_selection(2023, ['Salta'], ['Robos', 'Hurtos'])
+
+    by_crime = qs.query(sel, by=['codigo_delito_snic_nombre']).set_index('codigo_delito_snic_nombre')['cantidad_hechos']
+    assert by_crime.to_dict() == {'Hurtos': 30, 'Robos': 40}
+    assert qs.totals(sel)['cantidad_victimas'] == 7
+
+    qs.query(sel, by=['codigo_delito_snic_nombre'])
+    stats = qs.stats()
+    assert stats['hits'] >= 1
+    assert stats['misses'] >= 2
+
+def test_query_uses_coarsest_grain():
+    qs = create_service()
+    assert qs._grain_for(SelectionKey.from_selection(2023), None) == 'anio'
+    # Grouped queries keep the province to compute their rates
+    assert qs._grain_for(SelectionKey.from_selection(2023), ['anio']) == 'anio_provincia'
+    assert qs._grain_for(SelectionKey.from_selection(None, ['Salta']), ['anio']) == 'anio_provincia'
+    assert qs._grain_for(SelectionKey.from_selection(None, ['Salta'], ['Robos']), None) == 'anio_provincia_delito'
+
+def test_cache_evicts_by_size():
+    qs = create_service(max_bytes=600)
+    for year in (2022, 2023):
+        for prov in ('Salta', 'Jujuy'):
+            qs.query(SelectionKey.from_selection(year, [prov]), by=['provincia_nombre'])
+
+    stats = qs.stats()
+    assert stats['bytes'] <= 600
+    assert stats['entries'] < 4
+
+def test_cached_computes_once_per_key():
+    qs = create_service()
+    sel = SelectionKey.from_selection(2023, ['Salta'])
+    calls = []
+
+    def build():
+        calls.append(1)
+        return {'figura': len(calls)}
+
+    assert qs.cached(('bar', sel, 'Cantidad Total'), build) == {'figura': 1}
+    assert qs.cached(('bar', sel, 'Cantidad Total'), build) == {'figura': 1}
+    assert qs.cached(('bar', sel, 'Tasa c/100k hab'), build) == {'figura': 2}
+    assert len(calls) == 2
+
+def test_figure_size_is_estimated_without_serializing(monkeypatch):
+    go = pytest.importorskip('plotly.graph_objects')
+    square = {'type': 'Polygon', 'coordinates': [[[0, 0], [1, 0], [1, 1], [0, 0]]]}
+    geojson = {'type': 'FeatureCollection',
+               'features': [{'type': 'Feature', 'properties': {'nombre': 'Salta'}, 'geometry': square}] * 100}
+    small = go.Figure(go.Choroplethmapbox(geojson=geojson, locations=['Salta'], z=[1.0], featureidkey='properties.nombre'))
+    large = go.Figure(go.Scatter(x=list(range(10000)), y=list(range(10000))))
+    monkeypatch.setattr(go.Figure, 'to_json', lambda self, *a, **k: pytest.fail("figure serialized"))
+
+    # 100 features of 4 positions each, and two arrays of 10k numbers
+    assert _size_of(small) > 100 * 4 * 16
+    assert _size_of(large) > 2 * 10000 * 8 > _size_of(small)
+
+def test_department_filter_uses_ids():
+    qs = create_service()
+    base = qs.frames['base']
+    capital_salta = base.loc[(base['provincia_nombre'] == 'Salta') & (base['departamento_nombre'] == 'Capital'), 'departamento_id'].iloc[0]
+
+    sel = SelectionKey.from_selection(None, depts=[capital_salta])
+    assert qs._grain_for(sel, ['anio']) == 'base'
+    assert qs.totals(sel)['cantidad_hechos'] == 50
+
+def test_grouped_rates_use_summed_population():
+    qs = create_service()
+    sel = SelectionKey.from_selection(2022)
+
+    # Salta and Jujuy: combined counts over combined population, not the sum of their rates
+    by_year = qs.query(sel, by=['anio']).set_index('anio')['tasa_hechos']
+    assert by_year[2022] == pytest.approx(30 / (PROVINCIA_POBLACION['Salta'] + PROVINCIA_POBLACION['Jujuy']) * 100000)
+
+    by_prov = qs.query(sel, by=['provincia_nombre']).set_index('provincia_nombre')['tasa_hechos']
+    assert by_prov['Jujuy'] == pytest.approx(20 / PROVINCIA_POBLACION['Jujuy'] * 100000)
+
+    # A crime present in one province only: that province's population
+    by_crime = qs.query(SelectionKey.from_selection(2023), by=['codigo_delito_snic_nombre']).set_index('codigo_delito_snic_nombre')
+    assert by_crime.loc['Hurtos', 'tasa_hechos'] == pytest.approx(30 / PROVINCIA_POBLACION['Salta'] * 100000)
@@ -0,0 +1,34 @@
+import pytest
+import pandas as pd
+from src.schema import apply_schema, map_categories
+
+def test_apply_schema_compacts_types():
+    df = pd.DataFrame({
+        'anio': [2022, 2023],
+        'provincia_nombre': ['Salta', 'Salta'],
+        'codigo_delito_snic_nombre': ['Robo', 'Hurto'],
+        'cantidad_hechos': [10.0, None],
+        'otra_columna': ['x', 'y']
+    })
+
+    df = apply_schema(df)
+
+    assert df['anio'].dtype == 'int16'
+    assert df['cantidad_hechos'].dtype == 'int32'
+    assert df['cantidad_hechos'].tolist() == [10, 0]
+    assert isinstance(df['provincia_nombre'].dtype, pd.CategoricalDtype)
+    assert not isinstance(df['otra_columna'].dtype, pd.CategoricalDtype)
+
+def test_apply_schema_rejects_overflow():
+    df = pd.DataFrame({'cantidad_hechos': [2**40]})
+    with pytest.raises(ValueError):
+        apply_schema(df)
+
+def test_map_categories_merges_labels():
+    s = pd.Series(['Robos', 'Hurtos', 'Robos', None], dtype='category')
+
+    mapped = map_categories(s, {'Robos': 'Propiedad', 'Hurtos': 'Propiedad'}.get)
+
+    assert mapped.tolist()[:3] == ['Propiedad'] * 3
+    assert pd.isna(mapped.iloc[3])
+    assert list(mapped.cat.categories) == ['Propiedad']
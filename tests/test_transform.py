@@ -1,11 +1,14 @@
 import pytest
 import pandas as pd
 import os
-from src.transform import transform_data
+from unittest.mock import patch
+from src.transform import transform_data, transform_to_frame
+from src.dimensions import SURROGATE_KEYS
 
 # Test data
 TEST_INPUT = "tests/data/raw/snic_data.csv"
 TEST_OUTPUT = "tests/data/processed/snic_clean.csv"
+TEST_CHECKPOINT = "tests/data/processed/snic_clean.parquet"
 
 @pytest.fixture
 def clean_test_files():
@@ -52,3 +55,75 @@ def test_transform_data_success(clean_test_files):
 def test_transform_data_missing_input(clean_test_files):
     result = transform_data("non_existent_file.csv", TEST_OUTPUT)
     assert result is False
+
+def test_transform_data_chunked_matches_full(clean_test_files):
+    # Enough rows to span several chunks at the minimum chunk size
+    n = 3500
+    data = {
+        'anio': [2020 + i % 4 if i % 7 else None for i in range(n)],
+        'provincia_nombre': ['Buenos Aires', 'Córdoba', 'Santa Fe', 'Mendoza', 'Salta'] * (n // 5),
+        'codigo_delito_snic_nombre': ['Robo', 'Hurto'] * (n // 2),
+        'cantidad_hechos': list(range(n)),
+        'cantidad_victimas': list(range(n))
+    }
+    os.makedirs(os.path.dirname(TEST_INPUT), exist_ok=True)
+    pd.DataFrame(data).to_csv(TEST_INPUT, sep=';', index=False, encoding='utf-8')
+
+    assert transform_data(TEST_INPUT, TEST_OUTPUT) is True
+    df_full = pd.read_csv(TEST_OUTPUT, encoding='utf-8-sig')
+
+    with patch('src.transform.estimate_chunk_rows', return_value=1000):
+        assert transform_data(TEST_INPUT, TEST_OUTPUT, memory_budget_mb=64) is True
+    df_chunked = pd.read_csv(TEST_OUTPUT, encoding='utf-8-sig')
+
+    assert len(df_chunked) == n - len(range(0, n, 7))
+    pd.testing.assert_frame_equal(df_chunked, df_full)
+
+def test_transform_to_frame_with_checkpoint(clean_test_files):
+    create_sample_csv(TEST_INPUT)
+
+    df = transform_to_frame(TEST_INPUT, TEST_CHECKPOINT)
+
+    assert len(df) == 2
+    # Compact schema: categorical dimensions and narrow integers
+    assert df['anio'].dtype == 'int16'
+    assert df['cantidad_hechos'].dtype == 'int32'
+    assert isinstance(df['provincia_nombre'].dtype, pd.CategoricalDtype)
+    # Checkpoint keeps the same typed frame in a binary columnar format
+    pd.testing.assert_frame_equal(pd.read_parquet(TEST_CHECKPOINT), df.reset_index(drop=True))
+    os.remove(TEST_CHECKPOINT)
+
+def test_transform_to_frame_missing_input(clean_test_files):
+    assert transform_to_frame("non_existent_file.csv") is None
+
+def test_chunked_surrogate_ids_agree_across_chunks(clean_test_files):
+    # Each chunk holds different provinces: IDs must still be numbered over the whole file
+    n = 3000
+    data = {
+        'anio': [2022] * n,
+        'provincia_nombre': ['Salta'] * 1000 + ['Buenos Aires'] * 1000 + ['Córdoba'] * 1000,
+        'departamento_nombre': ['Capital', 'Orán'] * 500 + ['La Plata'] * 1000 + ['Capital'] * 1000,
+        'codigo_delito_snic_nombre': ['Robo'] * n,
+        'cantidad_hechos': [1] * n,
+        'cantidad_victimas': [0] * n
+    }
+    os.makedirs(os.path.dirname(TEST_INPUT), exist_ok=True)
+    pd.DataFrame(data).to_csv(TEST_INPUT, sep=';', index=False, encoding='utf-8')
+
+    assert transform_data(TEST_INPUT, TEST_OUTPUT) is True
+    df_full = pd.read_csv(TEST_OUTPUT, encoding='utf-8-sig')
+    with patch('src.transform.estimate_chunk_rows', return_value=1000):
+        assert transform_data(TEST_INPUT, TEST_OUTPUT, memory_budget_mb=64) is True
+    df_chunked = pd.read_csv(TEST_OUTPUT, encoding='utf-8-sig')
+
+    for id_col in SURROGATE_KEYS:
+        pd.testing.assert_series_equal(df_chunked[id_col], df_full[id_col])
+    assert df_chunked.groupby('provincia_nombre')['provincia_id'].nunique().eq(1).all()
+    assert df_chunked['provincia_id'].nunique() == 3 and df_chunked['departamento_id'].nunique() == 4
+
+def test_chunked_transform_removes_tmp_on_any_error(clean_test_files):
+    create_sample_csv(TEST_INPUT)
+    with patch('src.transform.clean_data', side_effect=RuntimeError("boom")):
+        with pytest.raises(RuntimeError):
+            transform_data(TEST_INPUT, TEST_OUTPUT, memory_budget_mb=64)
+    assert not os.path.exists(TEST_OUTPUT + ".tmp")